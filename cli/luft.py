@@ -1,13 +1,19 @@
 # -*- coding: utf-8 -*-
 """Luft cli."""
+import hashlib
 from datetime import date, datetime, timedelta
+from functools import partial
 from pathlib import Path
 from typing import List, Optional, Union
 
 import click
 
-from luft.common.config import TASKS_FOLDER
-from luft.common.task_list import TaskList
+from luft.common.config import PROFILE_DIR, SERVER_SOCKET, TASKS_FOLDER, TASK_TYPE_MAPPER
+from luft.common.executor import run_backfill, run_tasks
+from luft.common.metrics import write_metrics
+from luft.common.processes import install_signal_handlers
+from luft.common.profiling import enable_profiling, profile, profiling_enabled
+from luft.common.state import state_store
 
 task_list_options = [
     click.option('--yml-path', '-y',
@@ -37,6 +43,25 @@ task_list_options = [
     click.option('--glob-filter', '-g'),
 ]
 
+parallel_options = [
+    click.option('--parallelism', '-p', type=int, default=1, show_default=True,
+                 help='Number of threads (lanes) running at the same time. Tasks are spread into'
+                 ' lanes same way as in Airflow (by thread_name) and every lane runs its tasks'
+                 ' sequentially.'),
+    click.option('--backfill', is_flag=True, help='Backfill mode. Instead of lanes every task and'
+                 ' date is an independent unit running in pool of --parallelism workers. Dates of'
+                 ' order sensitive tasks (e.g. bq-load) are always run in order.'),
+    click.option('--keep-date-order', is_flag=True, help='In backfill mode run dates in order for'
+                 ' every task, even for date independent task types (e.g. embulk-jdbc-load).'),
+]
+
+run_options = [
+    click.option('--run-id', help='Identifier of run used for checkpoints. Default is derived from'
+                 ' list of tasks and dates, so the same command gets the same run id.'),
+    click.option('--resume', is_flag=True, help='Skip tasks and dates already finished in previous'
+                 ' attempt of the same run (see --run-id).'),
+]
+
 
 def add_options(options):
     """Add option to click function."""
@@ -54,39 +79,75 @@ def _daterange(start_date, end_date):
         yield date_valid.strftime('%Y-%m-%d')
 
 
-def _loop_tasks(task_list, start_date=None, end_date=None):
+def _get_run_id(task_list, dates: List[str]) -> str:
+    """Get run id from task ids and dates."""
+    run_def = '\n'.join(sorted(task.get_task_id() for task in task_list) + dates)
+    return hashlib.sha1(run_def.encode('utf-8')).hexdigest()[:12]
+
+
+def _task_done(run_id: str, task, date_valid: str, duration: float):
+    state_store().mark_done(run_id, task.get_task_id(), date_valid)
+    click.secho(f'Task `{task.get_task_id()}` for {date_valid} is done! '
+                f'It took {duration:.1f} sec.', fg='green')
+
+
+def _loop_tasks(task_list, start_date=None, end_date=None, parallelism: int = 1,
+                backfill: bool = False, keep_date_order: bool = False,
+                run_id: Optional[str] = None, resume: bool = False):
     start = datetime.strptime(start_date, '%Y-%m-%d') if start_date \
         else date.today() - timedelta(1)
     end = datetime.strptime(end_date, '%Y-%m-%d') if end_date \
         else start + timedelta(days=1)
-    for date_valid in _daterange(start, end):
-        for task in task_list:
-            task(ts=date_valid)
-            click.secho(f'Task `{task.get_task_id()}` is done!', fg='green')
+    dates = list(_daterange(start, end))
+    run_id = run_id or _get_run_id(task_list, dates)
+    skip = state_store().get_done(run_id) if resume else None
+    click.secho(f'Run id: {run_id}' + (f' (resuming, {len(skip)} units done)' if resume else ''))
+    on_done = partial(_task_done, run_id)
+    try:
+        if backfill:
+            run_backfill(task_list, dates, parallelism=parallelism,
+                         keep_date_order=keep_date_order, on_done=on_done, skip=skip)
+        else:
+            run_tasks(task_list, dates, parallelism=parallelism, on_done=on_done, skip=skip)
+    finally:
+        write_metrics()
 
 
 def _create_tasks(task_type: str, yml_path: str, source_system: Optional[str],
                   source_subsystem: Optional[str], blacklist: Optional[List[str]],
-                  whitelist: Optional[List[str]], glob_filter: Optional[str]):
+                  whitelist: Optional[List[str]], glob_filter: Optional[str],
+                  thread_cnt: int = 1):
     """Create task list."""
+    # Imported here so commands not reading tasks (e.g. --help) do not load yaml and task types
+    from luft.common.task_list import TaskList
     yml_path = TASKS_FOLDER / yml_path
-    task_list = TaskList().read_yml_path(
-        yml_path=yml_path,
-        task_type=task_type,
-        source_system=source_system,
-        source_subsystem=source_subsystem,
-        blacklist=blacklist,
-        whitelist=whitelist,
-        glob_filter=glob_filter
-    )
+    with profile(f'task_list_{task_type}_{yml_path.name}'):
+        task_list = TaskList().read_yml_path(
+            yml_path=yml_path,
+            task_type=task_type,
+            source_system=source_system,
+            source_subsystem=source_subsystem,
+            thread_cnt=thread_cnt,
+            blacklist=blacklist,
+            whitelist=whitelist,
+            glob_filter=glob_filter
+        )
     return task_list
 
 
 @click.group()
+@click.option('--profile', 'profile_runs', is_flag=True,
+              help='Profile every task run by cProfile and tracemalloc (or set LUFT_PROFILE=true).'
+              ' Profiles are written into `[core] profile_dir`.')
+@click.option('--profile-dir', default=PROFILE_DIR, show_default=True,
+              help='Folder of profiles written with --profile.')
 @click.pass_context
-def luft(_ctx: click.core.Context):
+def luft(_ctx: click.core.Context, profile_runs: bool, profile_dir: str):
     """Luft client."""
-    pass
+    if profile_runs or profiling_enabled():
+        enable_profiling(profile_dir)
+    # SIGTERM from Airflow or Kubernetes must not leave Embulk JVMs running
+    install_signal_handlers()
 
 
 @luft.group(help='Tools for working with JDBC sources.')
@@ -98,15 +159,20 @@ def jdbc(_ctx: click.core.Context):
 
 @jdbc.command(help='Load data from jdbc source into blob storage.')
 @add_options(task_list_options)
+@add_options(parallel_options)
+@add_options(run_options)
 @click.pass_context
 def load(ctx: click.core.Context, yml_path: str, start_date: str,  # start_time: str,
          end_date: str, source_system: str, source_subsystem: str, blacklist: List[str],
-         whitelist: List[str], glob_filter: str):
+         whitelist: List[str], glob_filter: str, parallelism: int,
+         backfill: bool, keep_date_order: bool, run_id: str, resume: bool):
     """Load data from jdbc source into blob storage."""
     task_list = _create_tasks(task_type='embulk-jdbc-load', yml_path=yml_path,
                               source_system=source_system, source_subsystem=source_subsystem,
-                              blacklist=blacklist, whitelist=whitelist, glob_filter=glob_filter)
-    _loop_tasks(task_list, start_date, end_date)
+                              blacklist=blacklist, whitelist=whitelist, glob_filter=glob_filter,
+                              thread_cnt=parallelism)
+    _loop_tasks(task_list, start_date, end_date, parallelism, backfill, keep_date_order,
+                run_id, resume)
 
 
 @luft.group(help='Tools for working with BigQuery.')
@@ -118,36 +184,46 @@ def bq(_ctx):
 
 @bq.command(help='Execute commands in BigQuery.')
 @add_options(task_list_options)
+@add_options(parallel_options)
+@add_options(run_options)
 @click.option('--script-blacklist', '-sb', multiple=True)
 @click.option('--script-whitelist', '-sw', multiple=True)
 @click.pass_context
 def exec(ctx: click.core.Context, yml_path: str, start_date: str,  # start_time: str,
          end_date: str, source_system: str, source_subsystem: str, blacklist: List[str],
-         whitelist: List[str], glob_filter: str, script_whitelist: Union[List[str], None],
-         script_blacklist: Union[List[str], None]):
+         whitelist: List[str], glob_filter: str, parallelism: int,
+         backfill: bool, keep_date_order: bool, run_id: str, resume: bool,
+         script_whitelist: Union[List[str], None], script_blacklist: Union[List[str], None]):
     """Execute commands in BigQuery."""
     task_list = _create_tasks(task_type='bq-exec', yml_path=yml_path,
                               source_system=source_system, source_subsystem=source_subsystem,
-                              blacklist=blacklist, whitelist=whitelist, glob_filter=glob_filter)
+                              blacklist=blacklist, whitelist=whitelist, glob_filter=glob_filter,
+                              thread_cnt=parallelism)
     task_list = filter_script_list(
         task_list, script_whitelist, script_blacklist)
-    _loop_tasks(task_list, start_date, end_date)
+    _loop_tasks(task_list, start_date, end_date, parallelism, backfill, keep_date_order,
+                run_id, resume)
 
 
 @bq.command(help='Load data from GCS and historize them in BigQuery.')
 @add_options(task_list_options)
+@add_options(parallel_options)
+@add_options(run_options)
 @click.option('--script-blacklist', '-sb', multiple=True)
 @click.option('--script-whitelist', '-sw', multiple=True)
 @click.pass_context
 def load(ctx: click.core.Context, yml_path: str, start_date: str,  # start_time: str,
          end_date: str, source_system: str, source_subsystem: str, blacklist: List[str],
-         whitelist: List[str], glob_filter: str, script_whitelist: Union[List[str], None],
-         script_blacklist: Union[List[str], None]):
+         whitelist: List[str], glob_filter: str, parallelism: int,
+         backfill: bool, keep_date_order: bool, run_id: str, resume: bool,
+         script_whitelist: Union[List[str], None], script_blacklist: Union[List[str], None]):
     """Load data from GCS and historize them in BigQuery."""
     task_list = _create_tasks(task_type='bq-load', yml_path=yml_path,
                               source_system=source_system, source_subsystem=source_subsystem,
-                              blacklist=blacklist, whitelist=whitelist, glob_filter=glob_filter)
-    _loop_tasks(task_list, start_date, end_date)
+                              blacklist=blacklist, whitelist=whitelist, glob_filter=glob_filter,
+                              thread_cnt=parallelism)
+    _loop_tasks(task_list, start_date, end_date, parallelism, backfill, keep_date_order,
+                run_id, resume)
 
 
 @luft.group(help='Tools for working with Qlik Metrics.')
@@ -159,15 +235,20 @@ def qlik_metric(_ctx):
 
 @qlik_metric.command(help='Load Qlik Sense Metric to blob storage.')
 @add_options(task_list_options)
+@add_options(parallel_options)
+@add_options(run_options)
 @click.pass_context
 def load(ctx: click.core.Context, yml_path: str, start_date: str,  # start_time: str,
          end_date: str, source_system: str, source_subsystem: str, blacklist: List[str],
-         whitelist: List[str], glob_filter: str):
+         whitelist: List[str], glob_filter: str, parallelism: int,
+         backfill: bool, keep_date_order: bool, run_id: str, resume: bool):
     """Load Qlik Sense Metric to blob storage."""
     task_list = _create_tasks(task_type='qlik-metric-load', yml_path=yml_path,
                               source_system=source_system, source_subsystem=source_subsystem,
-                              blacklist=blacklist, whitelist=whitelist, glob_filter=glob_filter)
-    _loop_tasks(task_list, start_date, end_date)
+                              blacklist=blacklist, whitelist=whitelist, glob_filter=glob_filter,
+                              thread_cnt=parallelism)
+    _loop_tasks(task_list, start_date, end_date, parallelism, backfill, keep_date_order,
+                run_id, resume)
 
 
 @luft.group(help='Tools for working with Qlik Sense Cloud.')
@@ -179,15 +260,195 @@ def qlik_cloud(_ctx):
 
 @qlik_cloud.command(help='Export app from QSE, upload it and publish it into Qlik Sense Cloud.')
 @add_options(task_list_options)
+@add_options(run_options)
 @click.pass_context
 def upload(ctx: click.core.Context, yml_path: str, start_date: str,  # start_time: str,
            end_date: str, source_system: str, source_subsystem: str, blacklist: List[str],
-           whitelist: List[str], glob_filter: str):
+           whitelist: List[str], glob_filter: str, run_id: str, resume: bool):
     """Upload app to Qlik Sense Cloud."""
     task_list = _create_tasks(task_type='qlik-cloud-upload', yml_path=yml_path,
                               source_system=source_system, source_subsystem=source_subsystem,
                               blacklist=blacklist, whitelist=whitelist, glob_filter=glob_filter)
-    _loop_tasks(task_list, start_date, end_date)
+    _loop_tasks(task_list, start_date, end_date, run_id=run_id, resume=resume)
+
+
+@luft.command(help='Run worker executing jobs sent by `luft submit`.')
+@click.option('--socket', 'socket_path', default=SERVER_SOCKET, show_default=True,
+              help='Path to unix socket of worker.')
+def serve(socket_path: str):
+    """Run worker executing jobs sent by `luft submit`."""
+    from cli.server import serve as serve_
+    serve_(socket_path)
+
+
+@luft.command(help='Submit task list to running worker (see `luft serve`) and print its logs.')
+@click.option('--task-type', '-t', required=True, type=click.Choice(list(TASK_TYPE_MAPPER.keys())),
+              help='Type of tasks.')
+@add_options(task_list_options)
+@add_options(parallel_options)
+@add_options(run_options)
+@click.option('--socket', 'socket_path', default=SERVER_SOCKET, show_default=True,
+              help='Path to unix socket of worker.')
+@click.pass_context
+def submit(ctx: click.core.Context, task_type: str, yml_path: str, start_date: str,
+           end_date: str, source_system: str, source_subsystem: str, blacklist: List[str],
+           whitelist: List[str], glob_filter: str, parallelism: int,
+           backfill: bool, keep_date_order: bool, run_id: str, resume: bool, socket_path: str):
+    """Submit task list to running worker."""
+    from cli.server import submit as submit_
+    job = {
+        'task_type': task_type,
+        'yml_path': yml_path,
+        'start_date': start_date,
+        'end_date': end_date,
+        'source_system': source_system,
+        'source_subsystem': source_subsystem,
+        'blacklist': list(blacklist),
+        'whitelist': list(whitelist),
+        'glob_filter': glob_filter,
+        'parallelism': parallelism,
+        'backfill': backfill,
+        'keep_date_order': keep_date_order,
+        'run_id': run_id,
+        'resume': resume
+    }
+    if not submit_(job, socket_path, echo=click.echo):
+        ctx.exit(1)
+
+
+@luft.command(help='Parse changed yml task files into catalog, so loading of task lists (e.g. in'
+              ' Airflow) does not parse them again.')
+@click.option('--yml-path', '-y', default='.', show_default=True,
+              help='Path or YML file inside default task folder')
+@click.option('--glob-filter', '-g')
+def compile(yml_path: str, glob_filter: str):
+    """Compile yml task files into catalog."""
+    from luft.common.catalog import yaml_catalog
+    from luft.common.task_list import TaskList
+    yml_files = TaskList.get_yml_files(TASKS_FOLDER / yml_path, glob_filter)
+    stats = yaml_catalog().compile(yml_files)
+    click.secho(f'Catalog has {stats["files"]} files, {stats["parsed"]} parsed, '
+                f'{stats["removed"]} removed.', fg='green')
+
+
+@luft.command(help='Report durations of task runs recorded in run ledger - the slowest tasks,'
+              ' daily trend and regressions.')
+@click.option('--days', '-d', default=30, show_default=True, help='Report runs of last N days.')
+@click.option('--task-type', '-t', help='Report only tasks of this type.')
+@click.option('--source-system', '-sys', help='Report only tasks of this source system.')
+@click.option('--limit', '-l', default=10, show_default=True, help='Number of the slowest tasks.')
+@click.option('--recent', default=5, show_default=True,
+              help='Number of last runs of task compared with the older ones.')
+@click.option('--threshold', default=1.5, show_default=True,
+              help='Ratio of median durations of recent and older runs reported as regression.')
+def stats(days: int, task_type: str, source_system: str, limit: int, recent: int,
+          threshold: float):
+    """Report statistics of task runs."""
+    import time
+    from luft.common.run_stats import daily_trend, find_regressions, format_table, task_stats
+    runs = state_store().get_runs(since=time.time() - days * 86400, task_type=task_type,
+                                  source_system=source_system)
+    if not runs:
+        click.secho(f'No runs recorded in last {days} days.', fg='yellow')
+        return
+    click.secho(f'{len(runs)} runs in last {days} days. Durations in seconds.', fg='green')
+    click.echo('\nSlowest tasks:')
+    click.echo(format_table(task_stats(runs)[:limit],
+                            ['task_id', 'runs', 'failed', 'p50', 'p95', 'max', 'rows', 'bytes',
+                             'bq_bytes_processed']))
+    click.echo('\nDaily trend:')
+    click.echo(format_table(daily_trend(runs), ['day', 'runs', 'failed', 'total', 'p50', 'p95',
+                                                'bq_bytes_processed']))
+    regressions = find_regressions(runs, recent=recent, threshold=threshold)
+    click.echo('\nRegressions:')
+    if regressions:
+        click.secho(format_table(regressions, ['task_id', 'before', 'recent', 'ratio']), fg='red')
+    else:
+        click.echo('None.')
+
+
+def _int_list(_ctx, _param, value: str) -> List[int]:
+    """Parse comma separated integers."""
+    try:
+        return [int(item) for item in value.split(',') if item.strip()]
+    except ValueError:
+        raise click.BadParameter(f'`{value}` is not comma separated list of integers.')
+
+
+@luft.command(help='Run generated task lists against local stand-ins of Embulk, BigQuery, S3 and'
+              ' Qlik engine and report overhead of Luft, scaling with parallelism and memory.')
+@click.option('--task-type', '-t', 'task_types', multiple=True,
+              type=click.Choice(['embulk-jdbc-load', 'bq-load', 'bq-exec', 'qlik-metric-load']),
+              help='Task types to benchmark. Default all.')
+@click.option('--tasks', '-n', default='10,100', show_default=True, callback=_int_list,
+              help='Comma separated numbers of tasks.')
+@click.option('--parallelism', '-p', default='1,4', show_default=True, callback=_int_list,
+              help='Comma separated parallelisms.')
+@click.option('--backfill', is_flag=True, help='Run in backfill mode instead of lanes.')
+@click.option('--columns', default=20, show_default=True, help='Columns of every table.')
+@click.option('--embulk-rows', default=100000, show_default=True,
+              help='Rows extracted by every Embulk run.')
+@click.option('--embulk-rate', default=1000000.0, show_default=True,
+              help='Rows per second of Embulk stand-in.')
+@click.option('--embulk-startup', default=0.1, show_default=True,
+              help='Seconds of Embulk (JVM) startup.')
+@click.option('--bq-query-latency', default=0.05, show_default=True,
+              help='Seconds of every BigQuery query job.')
+@click.option('--bq-load-latency', default=0.2, show_default=True,
+              help='Seconds of every BigQuery load job.')
+@click.option('--qix-rows', default=500, show_default=True, help='Rows of every Qlik hypercube.')
+@click.option('--qix-latency', default=0.005, show_default=True,
+              help='Seconds of every call of Qlik engine.')
+@click.option('--memory', is_flag=True,
+              help='Measure peak of Python allocations by tracemalloc (slows runs down).')
+@click.option('--output', '-o', help='Write settings and results as json into file.')
+def bench(task_types: List[str], tasks: List[int], parallelism: List[int], backfill: bool,
+          columns: int, embulk_rows: int, embulk_rate: float, embulk_startup: float,
+          bq_query_latency: float, bq_load_latency: float, qix_rows: int, qix_latency: float,
+          memory: bool, output: str):
+    """Benchmark task lists against local fakes."""
+    import json
+    from luft.bench.harness import (TASK_TYPES, BenchSettings, add_speedup, measure_embulk_stub,
+                                    run_scenario)
+    from luft.bench.qix_server import QixServerProcess
+    from luft.common.run_stats import format_table
+    settings = BenchSettings(columns=columns, embulk_rows=embulk_rows, embulk_rate=embulk_rate,
+                             embulk_startup=embulk_startup, bq_query_latency=bq_query_latency,
+                             bq_load_latency=bq_load_latency, qix_rows=qix_rows,
+                             qix_latency=qix_latency)
+    task_types = list(task_types) or TASK_TYPES
+    embulk_stub_seconds = measure_embulk_stub() if 'embulk-jdbc-load' in task_types else 0
+    qix_server = QixServerProcess(rows=qix_rows, measures=settings.qix_measures,
+                                  latency=qix_latency)
+    if 'qlik-metric-load' in task_types:
+        qix_server.start()
+    results = []
+    try:
+        for task_type in task_types:
+            for task_count in tasks:
+                for scenario_parallelism in parallelism:
+                    results.append(run_scenario(
+                        task_type, task_count, scenario_parallelism, settings, _create_tasks,
+                        _loop_tasks, qix_port=qix_server.port,
+                        embulk_stub_seconds=embulk_stub_seconds, backfill=backfill,
+                        trace_memory=memory))
+    finally:
+        qix_server.stop()
+    add_speedup(results)
+    click.echo('\nBenchmark results (seconds, overhead_ms per task, memory in MiB):')
+    click.echo(format_table(results, ['task_type', 'tasks', 'parallelism', 'load_s', 'run_s',
+                                      'external_s', 'ideal_s', 'overhead_ms', 'efficiency',
+                                      'speedup', 'peak_mb', 'max_rss_mb', 'failed']))
+    for result in results:
+        if result['status'] != 'ok':
+            click.secho(f'{result["task_type"]} x {result["tasks"]} (parallelism '
+                        f'{result["parallelism"]}) {result["status"]}', fg='red')
+    if output:
+        with open(output, 'w') as output_file:
+            json.dump({'settings': vars(settings), 'backfill': backfill,
+                       'embulk_stub_s': embulk_stub_seconds, 'results': results},
+                      output_file, indent=2)
+        click.secho(f'Results written to {output}.', fg='green')
 
 
 def filter_script_list(task_list, whitelist, blacklist):
@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+"""Luft worker.
+
+Long running process (`luft serve`) executing task lists sent by `luft submit`. Configuration,
+imported SDKs and task lists (together with their clients) stay in memory between jobs, so
+a job does not pay for starting Python and loading everything again.
+
+Client and worker talk over local unix socket. Client sends one json line with the job and the
+worker streams back json lines with logs of the job and finally its status.
+"""
+import json
+import logging
+import os
+import socket
+import socketserver
+import threading
+import uuid
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Tuple
+
+from luft.common.config import SERVER_SOCKET, TASKS_FOLDER
+from luft.common.constants import LOG_FORMAT
+from luft.common.logger import ContextFilter, log_context, setup_logger
+
+# Setup logger
+logger = setup_logger('common', 'INFO')
+
+TASK_LOGGERS = ['common', 'util']
+
+
+class _JobLogHandler(logging.Handler):
+    """Send log records of one job to client.
+
+    Job runs in the thread of request, lane threads, executor threads of tasks and Embulk
+    partitions, so records are matched by `job_id` of logging context, not by thread.
+
+    """
+
+    def __init__(self, wfile, job_id: str):
+        super().__init__()
+        self.wfile = wfile
+        self.job_id = job_id
+        self.setFormatter(logging.Formatter(LOG_FORMAT))
+        self.addFilter(ContextFilter())
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return super().filter(record) and record.job_id == self.job_id  # type: ignore
+
+    def emit(self, record: logging.LogRecord):
+        try:
+            _send(self.wfile, {'log': self.format(record), 'level': record.levelname})
+        except Exception:
+            self.handleError(record)
+
+
+def _send(wfile, message: Dict[str, Any]):
+    """Send one json line."""
+    wfile.write((json.dumps(message) + '\n').encode('utf-8'))
+    wfile.flush()
+
+
+def _yml_signature(yml_path: Path, glob_filter: str = None) -> Tuple:
+    """Return paths, modification times and sizes of yml files to detect changes."""
+    if yml_path.is_dir():
+        yml_files = sorted(yml_path.glob(glob_filter or '**/*.yml'))
+    else:
+        yml_files = [yml_path]
+    return tuple((str(f), f.stat().st_mtime_ns, f.stat().st_size) for f in yml_files)
+
+
+class TaskCatalog:
+    """Task lists created by worker.
+
+    Task list is created again only when any of its yml files changes.
+
+    """
+
+    def __init__(self):
+        """Create empty catalog."""
+        self._lock = threading.Lock()
+        self._task_lists: Dict[Tuple, Tuple[Tuple, List[Any], threading.Lock]] = {}
+
+    def get(self, job: Dict[str, Any]) -> Tuple[List[Any], threading.Lock]:
+        """Get task list of job and lock that has to be held while running it.
+
+        Tasks keep state of run (date of valid etc.) so one task list can run only once
+        at the same time.
+
+        """
+        from cli.luft import _create_tasks
+        key = (job['task_type'], job['yml_path'], job.get('source_system'),
+               job.get('source_subsystem'), tuple(job.get('blacklist') or ()),
+               tuple(job.get('whitelist') or ()), job.get('glob_filter'),
+               job.get('parallelism', 1))
+        signature = _yml_signature(TASKS_FOLDER / job['yml_path'], job.get('glob_filter'))
+        with self._lock:
+            cached = self._task_lists.get(key)
+            if cached is None or cached[0] != signature:
+                logger.info(f'Creating task list for {key}.')
+                task_list = _create_tasks(task_type=job['task_type'], yml_path=job['yml_path'],
+                                          source_system=job.get('source_system'),
+                                          source_subsystem=job.get('source_subsystem'),
+                                          blacklist=job.get('blacklist'),
+                                          whitelist=job.get('whitelist'),
+                                          glob_filter=job.get('glob_filter'),
+                                          thread_cnt=job.get('parallelism', 1))
+                cached = (signature, task_list, threading.Lock())
+                self._task_lists[key] = cached
+            return cached[1], cached[2]
+
+
+class _JobRequestHandler(socketserver.StreamRequestHandler):
+    """Run one job and stream its logs."""
+
+    def handle(self):
+        from cli.luft import _loop_tasks
+        job = json.loads(self.rfile.readline().decode('utf-8'))
+        job_id = uuid.uuid4().hex
+        log_handler = _JobLogHandler(self.wfile, job_id)
+        for name in TASK_LOGGERS:
+            logging.getLogger(name).addHandler(log_handler)
+        try:
+            task_list, lock = self.server.catalog.get(job)
+            with lock, log_context(job_id=job_id):
+                _loop_tasks(task_list, job.get('start_date'), job.get('end_date'),
+                            parallelism=job.get('parallelism', 1),
+                            backfill=job.get('backfill', False),
+                            keep_date_order=job.get('keep_date_order', False),
+                            run_id=job.get('run_id'), resume=job.get('resume', False))
+            status = {'status': 'ok'}
+        except Exception as e:
+            logger.exception('Job failed.')
+            status = {'status': 'error', 'error': repr(e)}
+        finally:
+            for name in TASK_LOGGERS:
+                logging.getLogger(name).removeHandler(log_handler)
+        try:
+            _send(self.wfile, status)
+        except OSError:
+            logger.error('Client disconnected before job finished.')
+
+
+class LuftServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Luft worker listening on unix socket."""
+
+    daemon_threads = True
+
+    def __init__(self, socket_path: str = SERVER_SOCKET):
+        """Create worker.
+
+        Parameters:
+            socket_path (str): path to unix socket. Stale socket file is removed.
+
+        """
+        self.catalog = TaskCatalog()
+        path = Path(socket_path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if path.exists():
+            path.unlink()
+        super().__init__(str(path), _JobRequestHandler)
+
+
+def serve(socket_path: str = SERVER_SOCKET):
+    """Run worker until interrupted."""
+    server = LuftServer(socket_path)
+    logger.info(f'Luft worker is listening on {socket_path}.')
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+
+
+def submit(job: Dict[str, Any], socket_path: str = SERVER_SOCKET,
+           echo: Callable[[str], None] = print) -> bool:
+    """Submit job to worker and print its logs.
+
+    Parameters:
+        job (Dict[str, Any]): job definition - task_type, yml_path and options of task list
+            commands (start_date, end_date, parallelism, ...).
+        socket_path (str): path to unix socket of worker.
+        echo (Callable): function printing log lines.
+
+    Returns:
+        bool: whether job succeed.
+
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(socket_path)
+        sock.sendall((json.dumps(job) + '\n').encode('utf-8'))
+        with sock.makefile('rb') as rfile:
+            for line in rfile:
+                message = json.loads(line.decode('utf-8'))
+                if 'log' in message:
+                    echo(message['log'])
+                elif message.get('status') == 'ok':
+                    return True
+                else:
+                    echo(f'Job failed: {message.get("error")}')
+                    return False
+    echo('Worker closed connection without status.')
+    return False
@@ -0,0 +1,2 @@
+# -*- coding: utf-8 -*-
+"""End-to-end benchmark of Luft against local stand-ins of external systems (see `luft bench`)."""
@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+"""Stand-in of Embulk command printing realistic Embulk log at configured throughput.
+
+It is run as a script (without importing Luft) instead of `[embulk] embulk_command`, so Luft
+starts, streams and parses it exactly as real Embulk. Arguments added by Luft (`run <config>
+-l <level>`) are ignored.
+"""
+import argparse
+import sys
+import time
+from datetime import datetime, timezone
+
+
+def _log(thread: str, message: str):
+    """Print line in format of Embulk log."""
+    now = datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]
+    print(f'{now} +0000 [INFO] ({thread}): {message}', flush=True)
+
+
+def main(argv=None):
+    """Simulate Embulk run."""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--rows', type=int, default=100000, help='Rows read and written.')
+    parser.add_argument('--rate', type=float, default=1000000, help='Rows per second.')
+    parser.add_argument('--startup', type=float, default=0, help='Seconds of JVM startup.')
+    parser.add_argument('--row-bytes', type=int, default=100, help='Size of written row.')
+    parser.add_argument('--log-every', type=int, default=10000,
+                        help='Rows between `Fetched` lines.')
+    args, _embulk_args = parser.parse_known_args(argv)
+
+    time.sleep(args.startup)
+    _log('main', 'Loaded plugin embulk-input-postgresql (0.10.1)')
+    _log('main', 'Loaded plugin embulk-output-s3 (1.5.0)')
+    _log('0001:transaction', '{done:  0 / 1, running: 1}')
+    start = time.monotonic()
+    fetched = 0
+    while fetched < args.rows:
+        fetched = min(fetched + args.log_every, args.rows)
+        delay = start + fetched / args.rate - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        _log('0014:task-0000', f'Fetched {fetched:,} rows.')
+    _log('0014:task-0000', f'{args.rows:,} records uploaded, {args.rows * args.row_bytes:,} bytes')
+    _log('0001:transaction', '{done:  1 / 1, running: 0}')
+    _log('main', 'Committed.')
+    _log('main', 'Next config diff: {"in":{},"out":{}}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,270 @@
+# -*- coding: utf-8 -*-
+"""Local stand-ins of BigQuery, S3, Qlik engine and Embulk used by `luft bench`.
+
+Fakes are installed by `install_fakes` at the same places where tasks get their clients, so
+task classes, executor and everything `_loop_tasks` does run unchanged. Every fake records time
+it spent waiting for simulated external system, so harness can subtract it from wall time.
+"""
+import contextlib
+import datetime
+import shlex
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+from unittest import mock
+
+from luft.bench import embulk_stub
+
+
+class ExternalTime:
+    """Thread safe sum of seconds spent in simulated external systems."""
+
+    def __init__(self):
+        """Create zero counter."""
+        self.seconds = 0.0
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def add(self, seconds: float):
+        """Add one call."""
+        with self._lock:
+            self.seconds += seconds
+            self.calls += 1
+
+
+class FakeJob:
+    """BigQuery query or load job finishing latency seconds after it has been started."""
+
+    def __init__(self, client: 'FakeBigQueryClient', job_type: str, query: str = '',
+                 latency: float = 0, total_bytes_processed: int = 0):
+        """Create job."""
+        self.client = client
+        self.job_type = job_type
+        self.job_id = f'{client.job_id_prefix}{job_type}_{len(client.jobs)}'
+        self.query = query
+        self.latency = latency
+        self.total_bytes_processed = total_bytes_processed
+        self.state = 'RUNNING'
+        self.errors = None
+        self.started = datetime.datetime.now(datetime.timezone.utc)
+        self.ended: Optional[datetime.datetime] = None
+        self._finishes_at = time.monotonic() + latency
+        self._lock = threading.Lock()
+
+    def done(self) -> bool:
+        """Check whether job has finished."""
+        with self._lock:
+            if self.ended is None and time.monotonic() >= self._finishes_at:
+                self.client.external.add(self.latency)
+                self.ended = datetime.datetime.now(datetime.timezone.utc)
+                self.state = 'DONE'
+            return self.ended is not None
+
+    def result(self):
+        """Wait for job."""
+        time.sleep(max(self._finishes_at - time.monotonic(), 0))
+        self.done()
+        return self
+
+    def cancel(self) -> bool:
+        """Cancel job, it finishes immediately."""
+        with self._lock:
+            self._finishes_at = time.monotonic()
+        return True
+
+
+class FakeTable:
+    """Loaded table."""
+
+    def __init__(self, num_rows: int):
+        """Create table."""
+        self.num_rows = num_rows
+        self.schema: List[Any] = []
+
+
+class FakeBigQueryClient:
+    """BigQuery client recording jobs, datasets are kept in memory."""
+
+    def __init__(self, project: str = 'bench', query_latency: float = 0.05,
+                 load_latency: float = 0.2, bytes_processed: int = 10 * 2 ** 20,
+                 rows_loaded: int = 1000):
+        """Create client.
+
+        Parameters:
+            project (str): project of client.
+            query_latency (float): seconds of every query job.
+            load_latency (float): seconds of every load job.
+            bytes_processed (int): bytes processed reported by every query job.
+            rows_loaded (int): rows of every loaded table.
+
+        """
+        self.project = project
+        self.query_latency = query_latency
+        self.load_latency = load_latency
+        self.bytes_processed = bytes_processed
+        self.rows_loaded = rows_loaded
+        self.job_id_prefix = 'bench-'
+        self.jobs: List[FakeJob] = []
+        self.datasets = set()
+        self.external = ExternalTime()
+        self._lock = threading.Lock()
+
+    def _add_job(self, job: FakeJob) -> FakeJob:
+        with self._lock:
+            self.jobs.append(job)
+        return job
+
+    def get_dataset(self, dataset_id: str):
+        """Get dataset, raise NotFound for unknown one."""
+        from google.cloud.exceptions import NotFound
+        if dataset_id not in self.datasets:
+            raise NotFound(f'Dataset {dataset_id} not found.')
+        return dataset_id
+
+    def create_dataset(self, dataset):
+        """Create dataset."""
+        from google.cloud.exceptions import Conflict
+        with self._lock:
+            if dataset.dataset_id in self.datasets:
+                raise Conflict(f'Dataset {dataset.dataset_id} already exists.')
+            self.datasets.add(dataset.dataset_id)
+        return dataset
+
+    def query(self, query: str, job_id_prefix: Optional[str] = None, **kwargs) -> FakeJob:
+        """Start query job."""
+        return self._add_job(FakeJob(self, 'query', query, self.query_latency,
+                                     self.bytes_processed))
+
+    def load_table_from_uri(self, uri: str, destination, job_config=None) -> FakeJob:
+        """Start load job."""
+        return self._add_job(FakeJob(self, 'load', uri, self.load_latency))
+
+    def get_table(self, table) -> FakeTable:
+        """Get loaded table."""
+        return FakeTable(self.rows_loaded)
+
+
+class _Paginator:
+    """Paginator of `list_objects_v2`."""
+
+    def __init__(self, s3: 'FilesystemS3'):
+        self.s3 = s3
+
+    def paginate(self, Bucket: str, Prefix: str) -> Iterator[Dict[str, Any]]:  # noqa: N803
+        """List objects with prefix in one page."""
+        root = self.s3.bucket_path(Bucket)
+        contents = [{'Key': str(path.relative_to(root)), 'Size': path.stat().st_size}
+                    for path in sorted(root.rglob('*'))
+                    if path.is_file() and str(path.relative_to(root)).startswith(Prefix)]
+        yield {'Contents': contents}
+
+
+class FilesystemS3:
+    """S3 client storing objects as files in local folder."""
+
+    def __init__(self, root: Path):
+        """Create client storing buckets in root folder."""
+        self.root = Path(root)
+        self.bytes_written = 0
+        self._lock = threading.Lock()
+
+    def bucket_path(self, bucket: Optional[str]) -> Path:
+        """Get folder of bucket."""
+        return self.root / (bucket or 'bench')
+
+    def put_object(self, Body, Bucket: str, Key: str):  # noqa: N803 - boto3 argument names
+        """Write object."""
+        path = self.bucket_path(Bucket) / Key
+        path.parent.mkdir(parents=True, exist_ok=True)
+        data = Body.encode('utf-8') if isinstance(Body, str) else Body
+        path.write_bytes(data)
+        with self._lock:
+            self.bytes_written += len(data)
+
+    def get_paginator(self, operation: str) -> _Paginator:
+        """Get paginator, only `list_objects_v2` is supported."""
+        if operation != 'list_objects_v2':
+            raise NotImplementedError(f'Operation {operation} is not supported.')
+        return _Paginator(self)
+
+
+def local_engine_communicator(port: int, external: ExternalTime, latency: float):
+    """Get communicator class connecting QixEngine to canned server on localhost.
+
+    Latency is waited by server, it is recorded here for every call.
+
+    """
+    from luft.vendor.pyqlikengine.engine_communicator import EngineCommunicator
+
+    class LocalEngineCommunicator(EngineCommunicator):
+        """Plain websocket connection to canned QIX server."""
+
+        def __init__(self, url, user_directory, user_id, ca_certs, certfile, keyfile,
+                     app_id=None):
+            super().__init__(f'ws://127.0.0.1:{port}/app/{app_id}')
+
+        @staticmethod
+        def send_call(self, call_msg):
+            external.add(latency)
+            return EngineCommunicator.send_call(self, call_msg)
+
+    return LocalEngineCommunicator
+
+
+def embulk_stub_command(rows: int, rate: float, startup: float) -> List[str]:
+    """Get command running Embulk stand-in (`luft.bench.embulk_stub`)."""
+    return [shlex.quote(sys.executable), shlex.quote(embulk_stub.__file__), '--rows', str(rows),
+            '--rate', str(rate), '--startup', str(startup)]
+
+
+@contextlib.contextmanager
+def install_fakes(workdir: Path, bq_client: FakeBigQueryClient, s3: FilesystemS3,
+                  embulk_command: List[str], jdbc_config: str, qix_port: int,
+                  qix_external: ExternalTime, qix_latency: float = 0) -> Iterator[None]:
+    """Make tasks use fakes and keep state of run in workdir.
+
+    Parameters:
+        workdir (Path): folder of state database (with run ledger) and catalog of benchmark.
+        bq_client (FakeBigQueryClient): client used by all BigQuery tasks.
+        s3 (FilesystemS3): client used by Qlik metric task and blob listing.
+        embulk_command (List[str]): command run instead of Embulk.
+        jdbc_config (str): jdbc config with sections of generated source systems.
+        qix_port (int): port of canned QIX server.
+        qix_external (ExternalTime): counter of QIX calls.
+        qix_latency (float): latency of QIX server.
+
+    """
+    from luft.common import bq_utils, catalog, s3_utils, state
+    from luft.common.catalog import YamlCatalog
+    from luft.common.state import StateStore
+    from luft.tasks import bq_exec_task, embulk_jdbc_task, generic_task, qlik_metric_task
+    from luft.tasks.generic_embulk_task import GenericEmbulkTask
+    from luft.vendor.pyqlikengine import engine_communicator
+
+    bq_utils.metadata_cache.clear()
+    with contextlib.ExitStack() as stack:
+        patches = [
+            mock.patch.object(bq_exec_task, 'get_bq_client', lambda *args, **kwargs: bq_client),
+            mock.patch.object(qlik_metric_task, 'get_s3', lambda *args, **kwargs: s3),
+            mock.patch.object(s3_utils, 'get_s3', lambda *args, **kwargs: s3),
+            mock.patch.object(engine_communicator, 'SecureEngineCommunicator',
+                              local_engine_communicator(qix_port, qix_external, qix_latency)),
+            mock.patch.object(embulk_jdbc_task, 'EMBULK_COMMAND', embulk_command),
+            mock.patch.object(embulk_jdbc_task, 'EMBULK_BATCH_COMMAND', []),
+            mock.patch.object(embulk_jdbc_task, 'JDBC_CONFIG', jdbc_config),
+            # Embulk stand-in gets bucket of filesystem S3, never credentials of real storage
+            mock.patch.object(GenericEmbulkTask, '_get_blob_storage_params', lambda self: {
+                'AWS_BUCKET': 'bench', 'AWS_ENDPOINT': s3.bucket_path('bench').as_uri(),
+                'AWS_ACCESS_KEY_ID': 'bench', 'AWS_SECRET_ACCESS_KEY': 'bench'}),
+            mock.patch.object(state._StateStore, 'instance', StateStore(str(workdir / 'state.db'))),
+            # Harness counts runs and failures from run ledger of benchmark state database
+            mock.patch.object(generic_task, 'RUN_LEDGER', True),
+            mock.patch.object(catalog._YamlCatalog, 'instance',
+                              YamlCatalog(str(workdir / 'catalog.json')))
+        ]
+        for patch in patches:
+            stack.enter_context(patch)
+        yield
+    bq_utils.metadata_cache.clear()
@@ -0,0 +1,217 @@
+# -*- coding: utf-8 -*-
+"""Benchmark of task lists run against local stand-ins of external systems.
+
+For every task type, number of tasks and parallelism a synthetic task folder is generated, loaded
+and run by the same functions as `luft <task type> load` (`_create_tasks` and `_loop_tasks`).
+External systems only wait for configured latency (see `luft.bench.fakes`), so wall time above
+the ideal (time spent in external systems divided by parallelism) is overhead of Luft itself -
+task loading, planning, subprocess handling, logging, metrics, state database and scheduling.
+"""
+import resource
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from luft.bench.fakes import (ExternalTime, FakeBigQueryClient, FilesystemS3,
+                              embulk_stub_command, install_fakes)
+from luft.bench.qix_server import measure_names
+
+TASK_TYPES = ['embulk-jdbc-load', 'bq-load', 'bq-exec', 'qlik-metric-load']
+BENCH_DATE = '2019-09-22'
+SOURCE_SYSTEM = 'bench'
+SOURCE_SUBSYSTEM = 'public'
+
+JDBC_CONFIG = """[BENCH]
+type = postgresql
+uri = localhost
+port = 5432
+database = bench
+user = bench
+password = bench
+"""
+
+BQ_EXEC_SQL = """CREATE TABLE IF NOT EXISTS {{ SOURCE_SYSTEM }}.{{ NAME }} (id INT64, value STRING);
+DELETE FROM {{ SOURCE_SYSTEM }}.{{ NAME }} WHERE load_date = '{{ DATE_VALID }}';
+INSERT INTO {{ SOURCE_SYSTEM }}.{{ NAME }} SELECT id, value FROM stage.{{ NAME }};
+"""
+
+
+class BenchSettings:
+    """Sizes of generated tasks and behaviour of fakes."""
+
+    def __init__(self, columns: int = 20, embulk_rows: int = 100000,
+                 embulk_rate: float = 1000000, embulk_startup: float = 0.1,
+                 bq_query_latency: float = 0.05, bq_load_latency: float = 0.2,
+                 qix_rows: int = 500, qix_measures: int = 4, qix_latency: float = 0.005):
+        """Create settings.
+
+        Parameters:
+            columns (int): columns of every embulk-jdbc-load and bq-load task.
+            embulk_rows (int): rows extracted by every Embulk run.
+            embulk_rate (float): rows per second of Embulk stand-in.
+            embulk_startup (float): seconds before Embulk stand-in starts extracting (JVM).
+            bq_query_latency (float): seconds of every BigQuery query job.
+            bq_load_latency (float): seconds of every BigQuery load job.
+            qix_rows (int): rows of every Qlik hypercube.
+            qix_measures (int): measures exported by every qlik-metric-load task.
+            qix_latency (float): seconds of every call of Qlik engine.
+
+        """
+        self.columns = columns
+        self.embulk_rows = embulk_rows
+        self.embulk_rate = embulk_rate
+        self.embulk_startup = embulk_startup
+        self.bq_query_latency = bq_query_latency
+        self.bq_load_latency = bq_load_latency
+        self.qix_rows = qix_rows
+        self.qix_measures = qix_measures
+        self.qix_latency = qix_latency
+
+
+def _columns_yml(columns: int) -> str:
+    """Get yaml definition of columns, the first one is primary key."""
+    primary_key = '    pk: true\n    mandatory: true\n'
+    return ''.join(f'  - name: COLUMN_{c}\n    type: {"numeric" if c % 3 == 0 else "string"}\n'
+                   f'{primary_key if c == 0 else ""}' for c in range(columns))
+
+
+def generate_task_folder(folder: Path, task_type: str, tasks: int,
+                         settings: BenchSettings) -> Path:
+    """Generate task files of task type into `folder/bench/public`.
+
+    Returns:
+        Path: folder of source system.
+
+    """
+    tasks_folder = folder / SOURCE_SYSTEM / SOURCE_SUBSYSTEM
+    tasks_folder.mkdir(parents=True)
+    if task_type in ('embulk-jdbc-load', 'bq-load'):
+        body = 'columns:\n' + _columns_yml(settings.columns)
+        if task_type == 'bq-load':
+            body = 'project_id: bench\nlocation: US\n' + body
+    elif task_type == 'bq-exec':
+        sql_folder = folder / 'sql'
+        sql_folder.mkdir()
+        (sql_folder / 'bench.sql').write_text(BQ_EXEC_SQL)
+        body = f'sql_folder: {sql_folder}\nsql_files:\n  - bench.sql\nproject_id: bench\n' \
+               'location: US\n'
+    elif task_type == 'qlik-metric-load':
+        measures = ''.join(f"  - '{name}'\n" for name in measure_names(settings.qix_measures))
+        body = (f'app_id: bench-app\ndimensions:\n  - D.Date\nmeasures:\n{measures}'
+                "selections:\n  - D.Date:\n    - '{date_valid}'\n")
+    else:
+        raise ValueError(f'Task type `{task_type}` is not supported by benchmark.')
+    for i in range(tasks):
+        (tasks_folder / f'TABLE_{i}.yml').write_text(f'name: TABLE_{i}\n{body}')
+    return folder / SOURCE_SYSTEM
+
+
+def measure_embulk_stub() -> float:
+    """Measure seconds of Embulk stand-in run without rows and startup (Python startup)."""
+    start = time.perf_counter()
+    subprocess.run(' '.join(embulk_stub_command(0, 1, 0)), shell=True, check=True,
+                   stdout=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+
+def _max_rss_mb() -> float:
+    """Get maximal resident memory of process so far in MiB (Linux reports KiB)."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_scenario(task_type: str, tasks: int, parallelism: int, settings: BenchSettings,
+                 create_tasks: Callable, loop_tasks: Callable, qix_port: Optional[int] = None,
+                 embulk_stub_seconds: float = 0, backfill: bool = False,
+                 trace_memory: bool = False) -> Dict[str, Any]:
+    """Generate, load and run task list against fakes and measure it.
+
+    Parameters:
+        task_type (str): type of tasks.
+        tasks (int): number of tasks.
+        parallelism (int): parallelism of run (`--parallelism`).
+        settings (BenchSettings): sizes of tasks and behaviour of fakes.
+        create_tasks (Callable): function loading task list (`_create_tasks` of cli).
+        loop_tasks (Callable): function running task list (`_loop_tasks` of cli).
+        qix_port (int): port of canned QIX server, needed by qlik-metric-load.
+        embulk_stub_seconds (float): seconds of empty Embulk stand-in run (see
+            `measure_embulk_stub`), counted as external time of every Embulk run.
+        backfill (bool): run in backfill mode.
+        trace_memory (bool): measure peak of Python allocations by tracemalloc.
+
+    Returns:
+        Dict[str, Any]: measured times (seconds), memory (MiB) and counters of scenario.
+
+    """
+    from luft.common.metrics import metrics
+    from luft.common.state import state_store
+    metrics().clear()
+    with tempfile.TemporaryDirectory(prefix='luft_bench_') as tmp_dir:
+        workdir = Path(tmp_dir)
+        folder = generate_task_folder(workdir / 'tasks', task_type, tasks, settings)
+        jdbc_config = workdir / 'jdbc.cfg'
+        jdbc_config.write_text(JDBC_CONFIG)
+        bq_client = FakeBigQueryClient(query_latency=settings.bq_query_latency,
+                                       load_latency=settings.bq_load_latency)
+        s3 = FilesystemS3(workdir / 's3')
+        qix_external = ExternalTime()
+        embulk_command = embulk_stub_command(settings.embulk_rows, settings.embulk_rate,
+                                             settings.embulk_startup)
+        with install_fakes(workdir, bq_client, s3, embulk_command, str(jdbc_config),
+                           qix_port or 0, qix_external, settings.qix_latency):
+            if trace_memory:
+                tracemalloc.start()
+            start = time.perf_counter()
+            task_list = create_tasks(task_type=task_type, yml_path=str(folder),
+                                     source_system=None, source_subsystem=None, blacklist=None,
+                                     whitelist=None, glob_filter=None, thread_cnt=parallelism)
+            loaded = time.perf_counter()
+            error = None
+            try:
+                loop_tasks(task_list, BENCH_DATE, None, parallelism, backfill,
+                           run_id=f'bench_{task_type}_{tasks}_{parallelism}')
+            except Exception as e:  # failed scenario is reported, others still run
+                error = e
+            finished = time.perf_counter()
+            peak_mb = None
+            if trace_memory:
+                peak_mb = tracemalloc.get_traced_memory()[1] / 2 ** 20
+                tracemalloc.stop()
+            runs = state_store().get_runs()
+    units = len(task_list)
+    embulk_runs = len(runs) if task_type == 'embulk-jdbc-load' else 0
+    embulk_seconds = embulk_stub_seconds + settings.embulk_startup
+    embulk_seconds += settings.embulk_rows / settings.embulk_rate
+    external = bq_client.external.seconds + qix_external.seconds + embulk_runs * embulk_seconds
+    ideal = external / max(min(parallelism, units), 1)
+    run_seconds = finished - loaded
+    return {
+        'task_type': task_type,
+        'tasks': units,
+        'parallelism': parallelism,
+        'status': 'ok' if error is None else f'failed: {error!r}',
+        'failed': sum(1 for run in runs if run['status'] != 'ok'),
+        'load_s': loaded - start,
+        'run_s': run_seconds,
+        'external_s': external,
+        'ideal_s': ideal,
+        'overhead_s': run_seconds - ideal,
+        'overhead_ms': (run_seconds - ideal) / units * 1000 if units else None,
+        'efficiency': ideal / run_seconds if run_seconds > 0 else None,
+        'peak_mb': peak_mb,
+        'max_rss_mb': _max_rss_mb(),
+        'bq_jobs': len(bq_client.jobs),
+        'qix_calls': qix_external.calls,
+        's3_bytes': s3.bytes_written
+    }
+
+
+def add_speedup(results: List[Dict[str, Any]]):
+    """Add speedup of every scenario over the same tasks run with the lowest parallelism."""
+    baselines: Dict[tuple, float] = {}
+    for result in sorted(results, key=lambda result: result['parallelism']):
+        key = (result['task_type'], result['tasks'])
+        baselines.setdefault(key, result['run_s'])
+        result['speedup'] = baselines[key] / result['run_s'] if result['run_s'] > 0 else None
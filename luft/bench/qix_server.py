@@ -0,0 +1,254 @@
+# -*- coding: utf-8 -*-
+"""Canned Qlik engine (QIX) websocket server.
+
+Answers JSON-RPC calls used by `qlik-metric-load` (OpenDoc, master measures, hypercube pages,
+selections) with generated data after configured latency. It runs in its own process
+(`python -m luft.bench.qix_server`), so its work does not compete with measured Luft threads for
+GIL. Only plain `ws://` websocket protocol needed by websocket-client is implemented.
+"""
+import argparse
+import base64
+import hashlib
+import json
+import socketserver
+import struct
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+WEBSOCKET_GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+OPCODE_TEXT = 0x1
+OPCODE_CLOSE = 0x8
+OPCODE_PING = 0x9
+OPCODE_PONG = 0xA
+
+DOC_HANDLE = 1
+MEASURE_LIST_HANDLE = 2
+HYPERCUBE_HANDLE = 3
+FIELD_HANDLE = 4
+
+
+def measure_names(measures: int) -> List[str]:
+    """Get titles of master measures of canned app."""
+    return [f'# Measure {i}' for i in range(measures)]
+
+
+class CannedApp:
+    """Answers of engine API calls."""
+
+    def __init__(self, rows: int = 500, measures: int = 4):
+        """Create app.
+
+        Parameters:
+            rows (int): rows of every hypercube.
+            measures (int): number of master measures.
+
+        """
+        self.rows = rows
+        self.measures = measures
+        self._pages: Dict[tuple, str] = {}
+
+    def _page(self, top: int, height: int, width: int) -> str:
+        """Get serialized page of hypercube data, every distinct page is generated once."""
+        key = (top, height, width)
+        if key not in self._pages:
+            matrix = [[{'qText': str(row * (col + 1)), 'qNum': row * (col + 1),
+                        'qElemNumber': row} for col in range(width)]
+                      for row in range(top, min(top + height, self.rows))]
+            self._pages[key] = json.dumps({'qDataPages': [{'qMatrix': matrix}]})
+        return self._pages[key]
+
+    def answer(self, method: str, handle: int, params: Any) -> str:
+        """Get serialized result of call.
+
+        Pages are serialized only once, so server is not bottleneck of concurrent tasks.
+
+        """
+        if method == 'GetHyperCubeData':
+            page = params[1][0]
+            return self._page(page['qTop'], page['qHeight'], page['qWidth'])
+        return json.dumps(self._answer(method, handle))
+
+    def _answer(self, method: str, handle: int) -> Dict[str, Any]:
+        """Get result of call other than hypercube data."""
+        if method == 'OpenDoc':
+            return {'qReturn': {'qType': 'Doc', 'qHandle': DOC_HANDLE}}
+        if method == 'CreateSessionObject':
+            return {'qReturn': {'qType': 'GenericObject', 'qHandle': MEASURE_LIST_HANDLE}}
+        if method == 'GetLayout' and handle == MEASURE_LIST_HANDLE:
+            items = [{'qInfo': {'qId': f'measure_{i}'}, 'qMeta': {'title': title}}
+                     for i, title in enumerate(measure_names(self.measures))]
+            return {'qLayout': {'qMeasureList': {'qItems': items}}}
+        if method == 'GetAppLayout':
+            return {'qLayout': {'qFileName': 'bench-app', 'qTitle': 'Bench',
+                                'stream': {'id': 'bench-stream', 'name': 'Bench'}}}
+        if method == 'CreateObject':
+            return {'qReturn': {'qType': 'GenericObject', 'qHandle': HYPERCUBE_HANDLE}}
+        if method == 'GetField':
+            return {'qReturn': {'qType': 'Field', 'qHandle': FIELD_HANDLE}}
+        return {'qReturn': True}
+
+
+def _read_exact(rfile, size: int) -> bytes:
+    """Read exactly size bytes, empty bytes when connection is closed."""
+    data = rfile.read(size)
+    return data if len(data) == size else b''
+
+
+def read_frame(rfile):
+    """Read one websocket frame of client. Return opcode and payload or None when closed."""
+    header = _read_exact(rfile, 2)
+    if not header:
+        return None
+    opcode = header[0] & 0x0F
+    length = header[1] & 0x7F
+    if length == 126:
+        length = struct.unpack('!H', _read_exact(rfile, 2))[0]
+    elif length == 127:
+        length = struct.unpack('!Q', _read_exact(rfile, 8))[0]
+    mask = _read_exact(rfile, 4) if header[1] & 0x80 else b''
+    payload = _read_exact(rfile, length) if length else b''
+    if mask:
+        payload = bytes(byte ^ mask[i % 4] for i, byte in enumerate(payload))
+    return opcode, payload
+
+
+def write_frame(wfile, payload: bytes, opcode: int = OPCODE_TEXT):
+    """Write unmasked websocket frame."""
+    length = len(payload)
+    if length < 126:
+        header = struct.pack('!BB', 0x80 | opcode, length)
+    elif length < 2 ** 16:
+        header = struct.pack('!BBH', 0x80 | opcode, 126, length)
+    else:
+        header = struct.pack('!BBQ', 0x80 | opcode, 127, length)
+    wfile.write(header + payload)
+    wfile.flush()
+
+
+class QixHandler(socketserver.StreamRequestHandler):
+    """Websocket connection of one engine session."""
+
+    def _handshake(self) -> bool:
+        """Upgrade HTTP connection to websocket."""
+        key = None
+        while True:
+            line = self.rfile.readline().decode('latin-1').strip()
+            if not line:
+                break
+            name, _, value = line.partition(':')
+            if name.strip().lower() == 'sec-websocket-key':
+                key = value.strip()
+        if key is None:
+            return False
+        accept = base64.b64encode(
+            hashlib.sha1((key + WEBSOCKET_GUID).encode('ascii')).digest()).decode('ascii')
+        self.wfile.write(('HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\n'
+                          f'Connection: Upgrade\r\nSec-WebSocket-Accept: {accept}\r\n\r\n'
+                          ).encode('ascii'))
+        self.wfile.flush()
+        return True
+
+    def handle(self):
+        """Answer calls until client closes connection."""
+        if not self._handshake():
+            return
+        server: 'QixServer' = self.server  # type: ignore
+        # Engine sends session notification first, communicator reads it after connecting
+        write_frame(self.wfile, json.dumps({'jsonrpc': '2.0', 'method': 'OnConnected',
+                                            'params': {'qSessionState': 'SESSION_CREATED'}}
+                                           ).encode('utf-8'))
+        while True:
+            frame = read_frame(self.rfile)
+            if frame is None:
+                return
+            opcode, payload = frame
+            if opcode == OPCODE_CLOSE:
+                write_frame(self.wfile, payload[:2], OPCODE_CLOSE)
+                return
+            if opcode == OPCODE_PING:
+                write_frame(self.wfile, payload, OPCODE_PONG)
+                continue
+            call = json.loads(payload.decode('utf-8'))
+            if server.latency:
+                time.sleep(server.latency)
+            result = server.app.answer(call['method'], call.get('handle'), call.get('params'))
+            write_frame(self.wfile, f'{{"jsonrpc": "2.0", "id": {json.dumps(call.get("id"))}, '
+                                    f'"result": {result}}}'.encode('utf-8'))
+
+
+class QixServer(socketserver.ThreadingTCPServer):
+    """Threaded server of canned app."""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, app: CannedApp, latency: float = 0):
+        """Create server listening on address."""
+        super().__init__(address, QixHandler)
+        self.app = app
+        self.latency = latency
+
+
+def main(argv=None):
+    """Run server and print its port."""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--port', type=int, default=0, help='Port, 0 means any free port.')
+    parser.add_argument('--rows', type=int, default=500, help='Rows of every hypercube.')
+    parser.add_argument('--measures', type=int, default=4, help='Number of master measures.')
+    parser.add_argument('--latency', type=float, default=0, help='Seconds before every answer.')
+    args = parser.parse_args(argv)
+    server = QixServer(('127.0.0.1', args.port), CannedApp(args.rows, args.measures),
+                       args.latency)
+    print(server.server_address[1], flush=True)
+    server.serve_forever()
+
+
+class QixServerProcess:
+    """Canned QIX server running in child process."""
+
+    def __init__(self, rows: int = 500, measures: int = 4, latency: float = 0):
+        """Configure server.
+
+        Parameters:
+            rows (int): rows of every hypercube.
+            measures (int): number of master measures of app.
+            latency (float): seconds waited before every answer.
+
+        """
+        self.rows = rows
+        self.measures = measures
+        self.latency = latency
+        self.port: Optional[int] = None
+        self._process = None
+
+    def start(self) -> int:
+        """Start server and return its port."""
+        self._process = subprocess.Popen(
+            [sys.executable, '-m', 'luft.bench.qix_server', '--rows', str(self.rows),
+             '--measures', str(self.measures), '--latency', str(self.latency)],
+            stdout=subprocess.PIPE)
+        self.port = int(self._process.stdout.readline())
+        return self.port
+
+    def stop(self):
+        """Stop server."""
+        if self._process is not None:
+            self._process.terminate()
+            self._process.wait()
+            self._process.stdout.close()
+            self._process = None
+
+    def __enter__(self) -> 'QixServerProcess':
+        """Start server."""
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        """Stop server."""
+        self.stop()
+
+
+if __name__ == '__main__':
+    main()
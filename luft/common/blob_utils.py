@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+"""Blob storage utils."""
+from typing import List, Tuple
+
+from luft.common.config import (AWS_ACCESS_KEY_ID, AWS_BUCKET, AWS_SECRET_ACCESS_KEY,
+                                BLOB_STORAGE, GCS_BUCKET, GCS_JSON_KEYFILE)
+
+
+def list_blob_files(prefix: str) -> List[Tuple[str, int]]:
+    """List files on blob storage (`[core] blob_storage`).
+
+    Parameters:
+        prefix (str): path prefix of files.
+
+    Returns:
+        List[Tuple[str, int]]: uri and size in bytes of every file.
+
+    """
+    blob_storage = BLOB_STORAGE.lower()
+    if blob_storage == 'aws':
+        from luft.common.s3_utils import get_s3, list_s3_objects
+        s3 = get_s3(AWS_ACCESS_KEY_ID, AWS_SECRET_ACCESS_KEY)
+        return [(f's3://{AWS_BUCKET}/{key}', size)
+                for key, size in list_s3_objects(s3, AWS_BUCKET, prefix)]
+    elif blob_storage == 'gcs':
+        from google.cloud import storage
+        client = (storage.Client.from_service_account_json(GCS_JSON_KEYFILE)
+                  if GCS_JSON_KEYFILE else storage.Client())
+        return [(f'gs://{GCS_BUCKET}/{blob.name}', blob.size)
+                for blob in client.list_blobs(GCS_BUCKET, prefix=prefix)]
+    raise KeyError('Blob storage %s you specified is not supported!' % blob_storage)
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+"""BigQuery utils."""
+import threading
+import time
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+from luft.common.config import BQ_CREDENTIALS_FILE, BQ_METADATA_CACHE_TTL
+from luft.common.logger import setup_logger
+
+# Setup logger
+logger = setup_logger('common', 'INFO')
+
+_bq_clients: Dict[Tuple[str, str, str], Any] = {}
+_bq_lock = threading.Lock()
+
+
+class MetadataCache:
+    """Thread safe cache of BigQuery metadata (existing datasets).
+
+    Every item expires after `ttl` seconds so changes made outside of Luft are noticed.
+
+    """
+
+    def __init__(self, ttl: float = BQ_METADATA_CACHE_TTL):
+        """Create empty cache.
+
+        Parameters:
+            ttl (float): seconds after which item expires. 0 disables the cache.
+
+        """
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._items: Dict[Hashable, Tuple[float, Any]] = {}
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Get item or None if it is missing or expired."""
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            if item[0] < time.monotonic():
+                del self._items[key]
+                return None
+            return item[1]
+
+    def set(self, key: Hashable, value: Any):
+        """Set item."""
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            self._items[key] = (time.monotonic() + self.ttl, value)
+
+    def invalidate(self, key: Hashable):
+        """Remove item."""
+        with self._lock:
+            self._items.pop(key, None)
+
+    def clear(self):
+        """Remove all items."""
+        with self._lock:
+            self._items.clear()
+
+
+metadata_cache = MetadataCache()
+
+
+def get_bq_client(project_id: str, location: str,
+                  credentials_file: str = BQ_CREDENTIALS_FILE):
+    """Get BigQuery client.
+
+    Client is created only once for every project, location and credentials and then shared by
+    all tasks of process (BigQuery clients are thread safe, loading of credentials is slow).
+
+    """
+    with _bq_lock:
+        key = (project_id, location, credentials_file)
+        if key not in _bq_clients:
+            from google.cloud import bigquery
+            from google.oauth2.service_account import Credentials
+            bq_cred = Credentials.from_service_account_file(credentials_file)
+            _bq_clients[key] = bigquery.Client(project=project_id, credentials=bq_cred,
+                                               location=location)
+        return _bq_clients[key]
+
+
+def dataset_exists(bq_client, dataset_id: str) -> bool:
+    """Check if dataset exists. Only existing datasets are cached.
+
+    Parameters:
+        bq_client (bigquery.Client): BigQuery client.
+        dataset_id (str): identifier of dataset.
+
+    """
+    from google.cloud.exceptions import NotFound
+    key = ('dataset', bq_client.project, dataset_id)
+    if metadata_cache.get(key):
+        return True
+    try:
+        bq_client.get_dataset(dataset_id)
+    except NotFound:
+        return False
+    metadata_cache.set(key, True)
+    return True
+
+
+def create_dataset(bq_client, dataset_id: str, location: str) -> bool:
+    """Create dataset if it does not exist.
+
+    Parameters:
+        bq_client (bigquery.Client): BigQuery client.
+        dataset_id (str): identifier of dataset.
+        location (str): location of dataset.
+
+    Returns:
+        bool: whether dataset has been created.
+
+    """
+    from google.cloud import bigquery
+    from google.cloud.exceptions import Conflict
+    if dataset_exists(bq_client, dataset_id):
+        return False
+    dataset = bigquery.Dataset(f'{bq_client.project}.{dataset_id}')
+    dataset.location = location
+    try:
+        bq_client.create_dataset(dataset)
+    except Conflict:  # created meanwhile by other thread or process
+        created = False
+    else:
+        created = True
+    metadata_cache.set(('dataset', bq_client.project, dataset_id), True)
+    return created
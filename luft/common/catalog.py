@@ -0,0 +1,265 @@
+# -*- coding: utf-8 -*-
+"""Catalog of parsed yaml task definitions.
+
+Parsing of yaml files is the slowest part of loading large task folders. Catalog keeps parsed
+definitions on disk keyed by file path, modification time and size, so every file is parsed
+again only when it changes. Names of tasks in every file are indexed so whitelisted task lists
+skip unrelated files entirely.
+
+Catalog file is JSON, so reading it never executes code even when somebody else can write into
+its folder.
+"""
+import copy
+import datetime
+import json
+import os
+import tempfile
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from luft.common.config import CATALOG_FILE, CATALOG_PARSE_PROCESSES, CATALOG_PARSE_THRESHOLD
+from luft.common.logger import setup_logger
+from luft.common.utils import get_file_signature
+
+# Setup logger
+logger = setup_logger('common', 'INFO')
+
+CATALOG_VERSION = 2
+
+
+def _encode(value: Any) -> Any:
+    """Convert parsed yaml value into JSON value, dates are tagged.
+
+    Raises:
+        TypeError: value JSON cannot keep (e.g. tuple of python specific tag).
+
+    """
+    if value is None or isinstance(value, (str, bool, int, float)):
+        return value
+    if isinstance(value, list):
+        return [_encode(item) for item in value]
+    if isinstance(value, dict) and all(isinstance(key, str) for key in value):
+        return {key: _encode(item) for key, item in value.items()}
+    if isinstance(value, datetime.datetime):
+        return {'__datetime__': value.isoformat()}
+    if isinstance(value, datetime.date):
+        return {'__date__': value.isoformat()}
+    raise TypeError(f'{type(value).__name__} cannot be stored in catalog.')
+
+
+def _decode(obj: Dict[str, Any]) -> Any:
+    """Decode values encoded by `_encode`."""
+    if len(obj) == 1:
+        if '__datetime__' in obj:
+            return datetime.datetime.fromisoformat(obj['__datetime__'])
+        if '__date__' in obj:
+            return datetime.date.fromisoformat(obj['__date__'])
+    return obj
+
+
+def _task_names(content: Any) -> Set[str]:
+    """Return names of tasks defined in parsed yaml file."""
+    tasks = content if isinstance(content, list) else [content]
+    return {task.get('name') for task in tasks if isinstance(task, dict) and task.get('name')}
+
+
+def parse_yml(text: str) -> Any:
+    """Parse yaml string.
+
+    libyaml based safe loader is used when available. Files using python specific tags are
+    parsed again by pure python loader.
+
+    """
+    from ruamel import yaml
+    if getattr(yaml, '__with_libyaml__', False):
+        try:
+            return yaml.load(text, Loader=yaml.CSafeLoader)
+        except yaml.constructor.ConstructorError:
+            pass
+    return yaml.load(text, Loader=yaml.Loader)
+
+
+def _parse_file(path: str) -> Tuple[str, Tuple[int, int], Any]:
+    """Parse yaml file. Used in worker processes."""
+    yml_file = Path(path)
+    return path, get_file_signature(yml_file), parse_yml(yml_file.read_text())
+
+
+def parse_files(yml_files: List[Path], processes: int = CATALOG_PARSE_PROCESSES,
+                threshold: int = CATALOG_PARSE_THRESHOLD) -> List[Tuple[str, Tuple[int, int], Any]]:
+    """Parse yaml files, in process pool when there are at least `threshold` files.
+
+    Parameters:
+        yml_files (List[Path]): files to parse.
+        processes (int): number of worker processes.
+        threshold (int): minimal number of files parsed in process pool.
+
+    Returns:
+        List[Tuple[str, Tuple[int, int], Any]]: path, signature and content of files in the same
+            order as `yml_files`.
+
+    """
+    paths = [str(yml_file) for yml_file in yml_files]
+    if processes <= 1 or len(paths) < max(threshold, 2):
+        return [_parse_file(path) for path in paths]
+    from concurrent.futures import ProcessPoolExecutor
+    chunksize = len(paths) // (processes * 4) + 1
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        return list(pool.map(_parse_file, paths, chunksize=chunksize))
+
+
+class YamlCatalog:
+    """Catalog of parsed yaml files.
+
+    Entries are stored in JSON file (`[state] catalog_file`). Empty path disables storing and
+    catalog works only in memory. Files with values JSON cannot keep (python specific yaml tags)
+    are parsed again by every process.
+
+    """
+
+    def __init__(self, path: Optional[str] = CATALOG_FILE):
+        """Create catalog.
+
+        Parameters:
+            path (str): path to catalog file. It is created with its folder if missing.
+
+        """
+        self.path = Path(path) if path else None
+        self._lock = threading.Lock()
+        self._entries: Optional[Dict[str, Dict[str, Any]]] = None
+        self._dirty = False
+
+    def _get_entries(self) -> Dict[str, Dict[str, Any]]:
+        """Read catalog file on first use."""
+        if self._entries is None:
+            self._entries = {}
+            if self.path and self.path.exists():
+                try:
+                    with open(self.path, encoding='utf-8') as catalog_file:
+                        data = json.load(catalog_file, object_hook=_decode)
+                    if data.get('version') == CATALOG_VERSION:
+                        self._entries = {
+                            key: {'signature': tuple(entry['signature']),
+                                  'content': entry['content'], 'names': set(entry['names'])}
+                            for key, entry in data['files'].items()}
+                except Exception as e:  # broken catalog is just parsed again
+                    logger.warning(f'Catalog {self.path} cannot be read: {e!r}')
+        return self._entries
+
+    def _get_entry(self, yml_file: Path) -> Dict[str, Any]:
+        """Get fresh entry of file, parse the file if it changed."""
+        entries = self._get_entries()
+        key = str(yml_file)
+        signature = get_file_signature(yml_file)
+        entry = entries.get(key)
+        if entry is None or entry['signature'] != signature:
+            content = parse_yml(yml_file.read_text())
+            entry = {'signature': signature, 'content': content, 'names': _task_names(content)}
+            entries[key] = entry
+            self._dirty = True
+        return entry
+
+    def _is_fresh(self, yml_file: Path) -> bool:
+        """Check whether file has entry with current signature."""
+        entry = self._get_entries().get(str(yml_file))
+        return entry is not None and entry['signature'] == get_file_signature(yml_file)
+
+    def refresh(self, yml_files: List[Path]) -> int:
+        """Parse all changed files at once (see `parse_files`).
+
+        Parameters:
+            yml_files (List[Path]): files that will be loaded.
+
+        Returns:
+            int: number of parsed files.
+
+        """
+        with self._lock:
+            entries = self._get_entries()
+            stale = [yml_file for yml_file in yml_files if not self._is_fresh(yml_file)]
+            for key, signature, content in parse_files(stale):
+                entries[key] = {'signature': signature, 'content': content,
+                                'names': _task_names(content)}
+            self._dirty = self._dirty or bool(stale)
+        return len(stale)
+
+    def load(self, yml_file: Path) -> Any:
+        """Get parsed content of yaml file.
+
+        Returned content is a copy that can be modified by caller.
+
+        """
+        with self._lock:
+            return copy.deepcopy(self._get_entry(yml_file)['content'])
+
+    def get_names(self, yml_file: Path) -> Set[str]:
+        """Get names of tasks defined in yaml file."""
+        with self._lock:
+            return set(self._get_entry(yml_file)['names'])
+
+    def compile(self, yml_files: List[Path]) -> Dict[str, int]:
+        """Parse changed files and remove entries of missing files.
+
+        Parameters:
+            yml_files (List[Path]): files that should be in catalog.
+
+        Returns:
+            Dict[str, int]: number of `files`, `parsed` files and `removed` entries.
+
+        """
+        parsed = self.refresh(yml_files)
+        with self._lock:
+            entries = self._get_entries()
+            removed = [key for key in entries if not Path(key).exists()]
+            for key in removed:
+                del entries[key]
+            self._dirty = self._dirty or bool(removed)
+        self.save()
+        return {'files': len(yml_files), 'parsed': parsed, 'removed': len(removed)}
+
+    def save(self):
+        """Write catalog file if anything changed.
+
+        File is replaced atomically, so concurrent processes read either old or new catalog.
+
+        """
+        with self._lock:
+            if not self._dirty or not self.path:
+                return
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            files = []
+            for key, entry in self._entries.items():
+                try:
+                    files.append(f'{json.dumps(key)}: ' + json.dumps(
+                        {'signature': entry['signature'], 'content': _encode(entry['content']),
+                         'names': sorted(entry['names'])}))
+                except (TypeError, ValueError) as e:
+                    logger.debug(f'{key} is not stored in catalog: {e}')
+            fd, tmp_path = tempfile.mkstemp(dir=str(self.path.parent), suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'w', encoding='utf-8') as tmp_file:
+                    tmp_file.write(f'{{"version": {CATALOG_VERSION}, "files": {{')
+                    tmp_file.write(', '.join(files))
+                    tmp_file.write('}}')
+                os.replace(tmp_path, str(self.path))
+            except Exception:
+                if os.path.exists(tmp_path):
+                    os.unlink(tmp_path)
+                raise
+            self._dirty = False
+
+
+class _YamlCatalog:
+    """Yaml catalog singleton."""
+
+    instance: Optional[YamlCatalog] = None
+    lock = threading.Lock()
+
+
+def yaml_catalog() -> YamlCatalog:
+    """Yaml catalog singleton."""
+    with _YamlCatalog.lock:
+        if _YamlCatalog.instance is None:
+            _YamlCatalog.instance = YamlCatalog(CATALOG_FILE)
+        return _YamlCatalog.instance
@@ -1,6 +1,6 @@
 # -*- coding: utf-8 -*-
 """Column."""
-from typing import List, Optional, Union
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
 
 from luft.common.config import EMBULK_TYPE_MAPPER
 from luft.common.logger import setup_logger
@@ -8,6 +8,26 @@ from luft.common.logger import setup_logger
 # Setup logger
 logger = setup_logger('common', 'INFO')
 
+# Avro and BigQuery types of values Embulk writes. Embulk type is the part of `[embulk_type_map]`
+# before the first comma, e.g. date formatted by `string, timestamp_format: ...` is written as
+# string. Timestamps are written as microseconds since epoch.
+AVRO_TYPES = {
+    'string': 'string',
+    'long': 'long',
+    'double': 'double',
+    'boolean': 'boolean',
+    'timestamp': {'type': 'long', 'logicalType': 'timestamp-micros'},
+    'json': 'string'
+}
+BQ_TYPES = {
+    'string': 'STRING',
+    'long': 'INT64',
+    'double': 'FLOAT64',
+    'boolean': 'BOOL',
+    'timestamp': 'TIMESTAMP',
+    'json': 'STRING'
+}
+
 
 class Column:
     """Column."""
@@ -231,6 +251,77 @@ class Column:
             return f'{self.get_name()}: {{value_type: {self._embulk_column_mapper()}}}'
         return None
 
+    def get_avro_field(self, col_type: str = 'all', filter_ignored: bool = True,
+                       include_tech: bool = True) -> Optional[Dict[str, Any]]:
+        """Get field of Avro schema.
+
+        E.g. `{'name': 'col_name', 'type': ['null', 'string']}`.
+
+        Parameters:
+            col_type (str): what type of columns should be returned. Default `all`.
+            filter_ignored (bool): wheter ignored column should be filtered out from result.
+            include_tech (bool): wheter technical columns should be included in result.
+
+        Returns:
+            (Dict[str, Any]): avro field
+
+        """
+        if self._should_return(col_type, filter_ignored, include_tech):
+            avro_type = AVRO_TYPES[self._get_embulk_value_type()]
+            return {'name': self.get_name(),
+                    'type': avro_type if self.mandatory else ['null', avro_type]}
+        return None
+
+    def get_bq_schema_field(self, col_type: str = 'all', filter_ignored: bool = True,
+                            include_tech: bool = True,
+                            supported_types: Union[List[str], None] = None
+                            ) -> Optional[Tuple[str, str, str]]:
+        """Get BigQuery schema field of value Embulk writes into Parquet or Avro file.
+
+        E.g. `('col_name', 'STRING', 'REQUIRED')`. Type follows Embulk type, so date column
+        written as formatted string is `STRING`. See `get_stage_value`.
+
+        Parameters:
+            col_type (str): what type of columns should be returned. Default `all`.
+            filter_ignored (bool): wheter ignored column should be filtered out from result.
+            include_tech (bool): wheter technical columns should be included in result.
+            supported_types (List[str]): supported data types.
+
+        Returns:
+            (Tuple[str, str, str]): name, type and mode
+
+        """
+        if self._should_return(col_type, filter_ignored, include_tech):
+            # Column type must be supported even though file contains Embulk type
+            self._get_type(supported_types=supported_types)
+            return (self.get_name(), BQ_TYPES[self._get_embulk_value_type()],
+                    'REQUIRED' if self.mandatory else 'NULLABLE')
+        return None
+
+    def get_stage_value(self, col_type: str = 'all', filter_ignored: bool = True,
+                        include_tech: bool = True,
+                        supported_types: Union[List[str], None] = None) -> Optional[str]:
+        """Get value of column loaded from Parquet or Avro file cast to column type.
+
+        E.g. `CAST(col_name AS DATE) AS col_name` or just `col_name` when types are the same.
+
+        Parameters:
+            col_type (str): what type of columns should be returned. Default `all`.
+            filter_ignored (bool): wheter ignored column should be filtered out from result.
+            include_tech (bool): wheter technical columns should be included in result.
+            supported_types (List[str]): supported data types.
+
+        Returns:
+            (str): sql expression
+
+        """
+        if self._should_return(col_type, filter_ignored, include_tech):
+            data_type = self._get_type(supported_types=supported_types)
+            if data_type == BQ_TYPES[self._get_embulk_value_type()]:
+                return self.get_name()
+            return f'CAST({self.get_name()} AS {data_type}) AS {self.get_name()}'
+        return None
+
     def _get_value_part(self, col_type: str = 'all', filter_ignored: bool = True,
                         include_tech: bool = True) -> Optional[str]:
         """Return value part. It is column name or constant. Used in aliasing: 4 AS COLUMN_NAME."""
@@ -283,6 +374,17 @@ class Column:
             raise TypeError(
                 f'Column type `{clean_type}` does not exists in column_type_mapper!')
 
+    def _get_embulk_value_type(self) -> str:
+        """Return type of value written by Embulk, mapped type without its options.
+
+        E.g. `string` for `string, timestamp_format: '%Y-%m-%d'`.
+
+        """
+        value_type = self._embulk_column_mapper().split(',')[0].strip().lower()
+        if value_type not in AVRO_TYPES:
+            raise TypeError(f'Embulk type `{value_type}` of column `{self.name}` is not supported.')
+        return value_type
+
     # pylint: disable=R0911
     def _should_return(self, col_type: str = 'all', filter_ignored: bool = True,
                        include_tech: bool = True) -> bool:
@@ -320,3 +422,128 @@ class Column:
         if filter_ignored and self.ignored:
             return False
         return True
+
+
+ColumnKey = Tuple[Any, ...]
+COLUMN_TYPES = ('all', 'pk', 'nonpk')
+
+
+class ColumnSet:
+    """Immutable set of columns of one task.
+
+    Column decides what should be returned and formats strings on every call. ColumnSet does it
+    only once per task - projections (names of pk, nonpk and all columns with or without ignored
+    and technical columns) are built on creation, SQL and Embulk fragments on first use. Every
+    date of run then reuses them.
+
+    """
+
+    __slots__ = ('columns', '_names', '_cache')
+
+    def __init__(self, columns: Optional[Iterable[Column]] = None):
+        """Create column set.
+
+        Parameters:
+            columns (List[Column]): columns of task.
+
+        """
+        columns = tuple(columns or ())
+        names: Dict[Tuple[str, bool, bool], Tuple[str, ...]] = {}
+        for col_type in COLUMN_TYPES:
+            for filter_ignored in (True, False):
+                for include_tech in (True, False):
+                    names[(col_type, filter_ignored, include_tech)] = tuple(
+                        col.rename or col.name for col in columns
+                        if col._should_return(col_type, filter_ignored, include_tech))
+        object.__setattr__(self, 'columns', columns)
+        object.__setattr__(self, '_names', names)
+        object.__setattr__(self, '_cache', {})
+
+    def __setattr__(self, name: str, value: Any):
+        """Column set is immutable."""
+        raise AttributeError(f'{self.__class__.__name__} is immutable.')
+
+    def __iter__(self) -> Iterator[Column]:
+        """Iterate over columns."""
+        return iter(self.columns)
+
+    def __len__(self) -> int:
+        """Return number of columns."""
+        return len(self.columns)
+
+    def _project(self, key: ColumnKey, func: Callable[[Column], Any]) -> Tuple[Any, ...]:
+        """Return non empty results of func for all columns. Computed only once for key."""
+        result = self._cache.get(key)
+        if result is None:
+            result = tuple(value for value in map(func, self.columns) if value)
+            self._cache[key] = result
+        return result
+
+    def get_names(self, col_type: str = 'all', filter_ignored: bool = True,
+                  include_tech: bool = True) -> Tuple[str, ...]:
+        """Return column names (or renames). Parameters are the same as in `Column.get_name`."""
+        return self._names[(col_type, filter_ignored, include_tech)]
+
+    def get_defs(self, col_type: str = 'all', filter_ignored: bool = True,
+                 include_tech: bool = True,
+                 supported_types: Optional[List[str]] = None) -> Tuple[str, ...]:
+        """Return column sql definitions. See `Column.get_def`."""
+        key = ('def', col_type, filter_ignored, include_tech, tuple(supported_types or ()))
+        return self._project(key, lambda col: col.get_def(
+            col_type, filter_ignored, include_tech, supported_types=supported_types))
+
+    def get_joins(self, col_type: str = 'pk', filter_ignored: bool = True,
+                  include_tech: bool = True) -> Tuple[str, ...]:
+        """Return join conditions of tables s and t. See `Column.get_join`."""
+        return self._project(('join', col_type, filter_ignored, include_tech),
+                             lambda col: col.get_join(col_type, filter_ignored, include_tech))
+
+    def get_hash_diff(self, col_type: str = 'all', filter_ignored: bool = True,
+                      include_tech: bool = True) -> Tuple[str, ...]:
+        """Return expressions of hash diff. E.g. `IFNULL(CAST(col_name AS STRING), '')`."""
+        key = ('hash_diff', col_type, filter_ignored, include_tech)
+        result = self._cache.get(key)
+        if result is None:
+            result = tuple(f"IFNULL(CAST({name} AS STRING), '')"
+                           for name in self.get_names(col_type, filter_ignored, include_tech))
+            self._cache[key] = result
+        return result
+
+    def get_aliased_names(self, col_type: str = 'all', filter_ignored: bool = True,
+                          include_tech: bool = True) -> Tuple[str, ...]:
+        """Return full aliased column names. See `Column.get_aliased_name`."""
+        return self._project(('aliased', col_type, filter_ignored, include_tech),
+                             lambda col: col.get_aliased_name(col_type, filter_ignored,
+                                                              include_tech))
+
+    def get_embulk_column_options(self, col_type: str = 'all', filter_ignored: bool = True,
+                                  include_tech: bool = True) -> Tuple[str, ...]:
+        """Return column options for Embulk. See `Column.get_embulk_column_option`."""
+        return self._project(('embulk', col_type, filter_ignored, include_tech),
+                             lambda col: col.get_embulk_column_option(col_type, filter_ignored,
+                                                                      include_tech))
+
+    def get_avro_fields(self, col_type: str = 'all', filter_ignored: bool = True,
+                        include_tech: bool = True) -> Tuple[Dict[str, Any], ...]:
+        """Return fields of Avro schema. See `Column.get_avro_field`."""
+        return self._project(('avro', col_type, filter_ignored, include_tech),
+                             lambda col: col.get_avro_field(col_type, filter_ignored,
+                                                            include_tech))
+
+    def get_bq_schema(self, col_type: str = 'all', filter_ignored: bool = True,
+                      include_tech: bool = True,
+                      supported_types: Optional[List[str]] = None
+                      ) -> Tuple[Tuple[str, str, str], ...]:
+        """Return BigQuery schema fields. See `Column.get_bq_schema_field`."""
+        key = ('bq_schema', col_type, filter_ignored, include_tech, tuple(supported_types or ()))
+        return self._project(key, lambda col: col.get_bq_schema_field(
+            col_type, filter_ignored, include_tech, supported_types=supported_types))
+
+    def get_stage_values(self, col_type: str = 'all', filter_ignored: bool = True,
+                         include_tech: bool = True,
+                         supported_types: Optional[List[str]] = None) -> Tuple[str, ...]:
+        """Return values of stage table loaded from files. See `Column.get_stage_value`."""
+        key = ('stage_value', col_type, filter_ignored, include_tech,
+               tuple(supported_types or ()))
+        return self._project(key, lambda col: col.get_stage_value(
+            col_type, filter_ignored, include_tech, supported_types=supported_types))
@@ -7,7 +7,7 @@ from typing import Optional
 
 from dotenv import load_dotenv
 
-from luft.common.logger import setup_logger
+from luft.common.logger import configure_logging, setup_logger
 from luft.common.utils import read_config
 
 # Setup logger
@@ -56,6 +56,24 @@ TASKS_FOLDER = Path(
 JDBC_CONFIG = os.getenv('JDBC_CONFIG', get_cfg('core', 'jdbc_config'))
 BLOB_STORAGE = os.getenv('BLOB_STORAGE', get_cfg('core', 'blob_storage'))
 PATH_PREFIX = get_cfg('core', 'path_prefix')
+TASK_TIMEOUT = float(os.getenv('LUFT_TASK_TIMEOUT', get_cfg(
+    'core', 'task_timeout', '')) or 0) or None
+KILL_GRACE_PERIOD = float(os.getenv('LUFT_KILL_GRACE_PERIOD', get_cfg(
+    'core', 'kill_grace_period', 10)))
+PROFILE = os.getenv('LUFT_PROFILE', get_cfg('core', 'profile', 'false')).lower() in ('1', 'true')
+PROFILE_DIR = os.getenv('LUFT_PROFILE_DIR', get_cfg('core', 'profile_dir', '.luft/profile'))
+
+# Logging
+LOG_QUEUE = os.getenv('LUFT_LOG_QUEUE', get_cfg('logging', 'queue', 'true')).lower() == 'true'
+LOG_JSON = os.getenv('LUFT_LOG_FORMAT', get_cfg('logging', 'format', 'text')).lower() == 'json'
+LOG_QUERIES = os.getenv('LUFT_LOG_QUERIES', get_cfg('logging', 'queries', 'summary')).lower()
+LOG_SUBPROCESS_RATE = float(os.getenv('LUFT_LOG_SUBPROCESS_RATE', get_cfg(
+    'logging', 'subprocess_rate', '')) or 0)
+LOG_SUBPROCESS_BURST = float(get_cfg('logging', 'subprocess_burst', '') or 0) or None
+LOG_SUBPROCESS_SAMPLE = int(get_cfg('logging', 'subprocess_sample', '') or 1)
+configure_logging(use_queue=LOG_QUEUE, json_format=LOG_JSON,
+                  subprocess_rate=LOG_SUBPROCESS_RATE, subprocess_burst=LOG_SUBPROCESS_BURST,
+                  subprocess_sample=LOG_SUBPROCESS_SAMPLE)
 
 # BQ
 BQ_CREDENTIALS_FILE = os.getenv(
@@ -66,6 +84,10 @@ BQ_LOCATION = os.getenv(
     'BQ_LOCATION', get_cfg('bq', 'location'))
 BQ_JOB_ID_PREFIX = os.getenv(
     'BQ_JOB_ID_PREFIX', get_cfg('bq', 'job_id_prefix'))
+BQ_METADATA_CACHE_TTL = int(os.getenv(
+    'BQ_METADATA_CACHE_TTL', get_cfg('bq', 'metadata_cache_ttl', 600)))
+BQ_POLL_INTERVAL = float(os.getenv(
+    'BQ_POLL_INTERVAL', get_cfg('bq', 'poll_interval', 2)))
 BQ_HIST_DEFAULT_TEMPLATE = get_cfg('bq', 'default_history_template')
 BQ_STAGE_DEFAULT_TEMPLATE = get_cfg('bq', 'default_stage_template')
 BQ_STAGE_SCHEMA_FORM = get_cfg('bq', 'stage_schema_form')
@@ -124,7 +146,15 @@ TASK_TYPE_MAPPER = conf['task_type_map']
 EMBULK_COMMAND = os.getenv('EMBULK_COMMAND', get_cfg(
     'embulk', 'embulk_command')).split()
 EMBULK_LOG_LEVEL = os.getenv('EMBULK_LOG_LEVEL', get_cfg(
-    'embulk', 'embulk_log_level'))
+    'embulk', 'embulk_log_level', 'info'))
+EMBULK_BATCH_COMMAND = (os.getenv('EMBULK_BATCH_COMMAND', get_cfg(
+    'embulk', 'batch_command')) or '').split()
+EMBULK_BATCH_RUNNER = get_cfg('embulk', 'batch_runner', 'templates/embulk/batch_runner.rb')
+EMBULK_AVRO_SCHEMA_DIR = get_cfg('embulk', 'avro_schema_dir', '.luft/avsc')
+EMBULK_REPORT_FILES = os.getenv('EMBULK_REPORT_FILES', get_cfg(
+    'embulk', 'report_files', 'false')).lower() == 'true'
+EMBULK_PARTITION_THREADS = int(os.getenv('EMBULK_PARTITION_THREADS', get_cfg(
+    'embulk', 'partition_threads', 4)))
 
 # Embulk Default Template
 EMBULK_DEFAULT_TEMPLATE = conf['embulk_default_template']
@@ -135,6 +165,21 @@ EMBULK_TYPE_MAPPER = conf['embulk_type_map']
 # Thread
 DEFAULT_THREAD_CNT = int(get_cfg('thread', 'default_thread_cnt'))
 THREAD_NAME_PREFIX = get_cfg('thread', 'thread_prefix')
+THREAD_DURATION_HISTORY = int(get_cfg('thread', 'duration_history', 5))
+
+# State
+STATE_DB = os.getenv('LUFT_STATE_DB', get_cfg('state', 'state_db', '.luft/state.db'))
+CATALOG_FILE = os.getenv('LUFT_CATALOG', get_cfg(
+    'state', 'catalog_file', str(Path(STATE_DB).parent / 'catalog.json')))
+CATALOG_PARSE_PROCESSES = int(get_cfg('state', 'catalog_parse_processes', os.cpu_count() or 1))
+CATALOG_PARSE_THRESHOLD = int(get_cfg('state', 'catalog_parse_threshold', 500))
+RUN_LEDGER = os.getenv('LUFT_RUN_LEDGER', get_cfg('state', 'run_ledger', 'false')).lower() == 'true'
+
+# Metrics
+METRICS_TEXTFILE = os.getenv('LUFT_METRICS_TEXTFILE', get_cfg('metrics', 'textfile', '')) or None
+
+# Server
+SERVER_SOCKET = os.getenv('LUFT_SOCKET', get_cfg('server', 'socket', '.luft/luft.sock'))
 
 # JDBC driver path
 JDBC_DRIVER_PATH = conf['jdbc_driver_path']
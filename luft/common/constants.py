@@ -8,3 +8,6 @@ LOG_LEVEL = 'INFO'
 LOG_HANDLER = logging.StreamHandler(stream=sys.stdout)
 # If running in Airflow time and level is disturbing
 LOG_FORMAT = '%(asctime)-15s [%(levelname)s] %(name)s:%(funcName)s - %(message)s'
+
+# Formats of files written by Embulk and loaded into BigQuery
+OUTPUT_FORMATS = ('csv', 'parquet', 'avro')
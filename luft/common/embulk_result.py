@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+"""Result of Embulk run parsed from its log.
+
+Embulk does not report any statistics except its log. Lines are parsed while they are streamed
+from Embulk, so counters are current during the whole run:
+
+* `{done:  3 / 8, running: 2}` - progress of Embulk tasks (Embulk core),
+* `Fetched 1,000 rows.` - rows read so far by input task (embulk-input-jdbc),
+* `Committed.` - transaction was committed (Embulk core),
+* `(0014:task-0000): 1,000 records uploaded, 1,024 bytes` - summary of output task logged
+  by output plugins that report rows and bytes. Only lines of task threads starting with the
+  count are taken, so buffer sizes or retries logged by plugins and JVM are not counted.
+"""
+import re
+import threading
+import time
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from luft.common.logger import setup_logger
+
+# Setup logger
+logger = setup_logger('common', 'INFO')
+
+PROGRESS_RE = re.compile(r'\{done:\s*(\d+)\s*/\s*(\d+),\s*running:\s*(\d+)\}')
+ROWS_READ_RE = re.compile(r'Fetched ([\d,]+) rows')
+OUTPUT_SUMMARY_RE = re.compile(r'\(\d+:task-(\d+)\): ([\d,]+) (?:rows|records) '
+                               r'(?:written|loaded|uploaded)(?:, ([\d,]+) bytes)?', re.I)
+COMMITTED_RE = re.compile(r'\bCommitted\.')
+
+
+def _to_int(value: str) -> int:
+    """Convert number with thousands separators to int."""
+    return int(value.replace(',', ''))
+
+
+class EmbulkResult:
+    """Counters of one (or more merged) Embulk runs."""
+
+    def __init__(self, job_id: str):
+        """Create empty result.
+
+        Parameters:
+            job_id (str): identification of run, used in logs.
+
+        """
+        self.job_id = job_id
+        self.rows_read = 0
+        self.rows_written = 0
+        self.bytes = 0
+        self.tasks_done = 0
+        self.tasks_total = 0
+        self.committed = False
+        self.started = time.time()
+        self.finished: Optional[float] = None
+        self._outputs: Dict[str, Tuple[int, int]] = {}  # rows and bytes by output task
+        self._lock = threading.Lock()
+
+    @property
+    def elapsed(self) -> float:
+        """Seconds since start of run or duration of finished run."""
+        return (self.finished or time.time()) - self.started
+
+    @property
+    def rows_per_sec(self) -> float:
+        """Read rows per second."""
+        elapsed = self.elapsed
+        return self.rows_read / elapsed if elapsed > 0 else 0.0
+
+    def feed(self, line: str) -> bool:
+        """Update counters from one line of Embulk log.
+
+        Returns:
+            bool: whether line contained any statistics.
+
+        """
+        with self._lock:
+            match = ROWS_READ_RE.search(line)
+            if match:  # input plugin reports total rows of task
+                self.rows_read = max(self.rows_read, _to_int(match.group(1)))
+                return True
+            match = PROGRESS_RE.search(line)
+            if match:
+                self.tasks_done, self.tasks_total = int(match.group(1)), int(match.group(2))
+                logger.info(f'{self.job_id}: {self.tasks_done}/{self.tasks_total} tasks done, '
+                            f'{self.rows_read} rows read ({self.rows_per_sec:.0f} rows/s).')
+                return True
+            if COMMITTED_RE.search(line):
+                self.committed = True
+                return True
+            match = OUTPUT_SUMMARY_RE.search(line)
+            if match:  # summary of output task replaces previous one of the same task
+                self._outputs[match.group(1)] = (_to_int(match.group(2)),
+                                                 _to_int(match.group(3) or '0'))
+                self.rows_written = sum(rows for rows, _ in self._outputs.values())
+                self.bytes = sum(size for _, size in self._outputs.values())
+                return True
+            return False
+
+    def finish(self) -> 'EmbulkResult':
+        """Mark run as finished."""
+        self.finished = time.time()
+        return self
+
+    @classmethod
+    def merge(cls, job_id: str, results: Iterable['EmbulkResult']) -> 'EmbulkResult':
+        """Merge results of concurrent runs (e.g. partitions of table) into one."""
+        merged = cls(job_id)
+        results = list(results)
+        for result in results:
+            merged.rows_read += result.rows_read
+            merged.rows_written += result.rows_written
+            merged.bytes += result.bytes
+            merged.tasks_done += result.tasks_done
+            merged.tasks_total += result.tasks_total
+        merged.committed = bool(results) and all(result.committed for result in results)
+        if results:
+            merged.started = min(result.started for result in results)
+            merged.finished = max(result.finished or time.time() for result in results)
+        return merged
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Return counters as dictionary."""
+        return {
+            'job_id': self.job_id,
+            'rows_read': self.rows_read,
+            'rows_written': self.rows_written,
+            'bytes': self.bytes,
+            'tasks_done': self.tasks_done,
+            'tasks_total': self.tasks_total,
+            'committed': self.committed,
+            'elapsed': round(self.elapsed, 3),
+            'rows_per_sec': round(self.rows_per_sec, 1)
+        }
+
+    def __repr__(self) -> str:
+        """Return readable representation."""
+        return f'EmbulkResult({self.as_dict()})'
@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+"""Embulk batch runner.
+
+Starting Embulk means starting JVM and loading all plugins, which takes longer than extraction of
+most small tables. In batch mode every thread of Embulk pool (`partition_executor`) keeps one long
+running Embulk (JRuby script `templates/embulk/batch_runner.rb`) and sends it configs rendered by
+Luft one by one. Size of the pool therefore limits number of running JVMs.
+"""
+import atexit
+import json
+import os
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from luft.common.config import (EMBULK_BATCH_COMMAND, EMBULK_BATCH_RUNNER, EMBULK_LOG_LEVEL,
+                                EMBULK_PARTITION_THREADS)
+from luft.common.logger import setup_logger
+from luft.common.processes import (kill_process_groups, register_process_group,
+                                   unregister_process_group)
+
+# Setup logger
+logger = setup_logger('common', 'INFO')
+
+RESULT_PREFIX = 'LUFT_RESULT '
+
+
+def render_embulk_template(template_path: str, env: Dict[str, Any]) -> str:
+    """Render Embulk liquid template the same way Embulk does.
+
+    Templates use only `{{ env.X }}` variables and `{% include 'name' %}` partials
+    (`_name.yml.liquid` in the same folder), which jinja2 renders identically.
+
+    Parameters:
+        template_path (str): path to template.
+        env (Dict[str, Any]): enviromental variables. Missing ones are rendered as empty.
+
+    Returns:
+        str: rendered Embulk config.
+
+    """
+    from jinja2 import Environment, FunctionLoader
+
+    folder = Path(template_path).parent
+
+    def _load(name: str) -> Optional[str]:
+        path = folder / name
+        if not path.exists():
+            path = folder / f'_{name}.yml.liquid'
+        return path.read_text() if path.exists() else None
+
+    jinja_env = Environment(loader=FunctionLoader(_load), keep_trailing_newline=True)
+    return jinja_env.get_template(Path(template_path).name).render(env=env)
+
+
+class EmbulkBatchRunner:
+    """Long running Embulk process executing configs sent to its stdin."""
+
+    def __init__(self, command: Optional[List[str]] = None, log_level: str = EMBULK_LOG_LEVEL):
+        """Create runner. Process is started on first run.
+
+        Parameters:
+            command (List[str]): command starting runner. Default is `[embulk] batch_command`
+                followed by path to `batch_runner.rb`.
+            log_level (str): Embulk log level.
+
+        """
+        if command is None:
+            import pkg_resources
+            command = EMBULK_BATCH_COMMAND + [
+                pkg_resources.resource_filename('luft', EMBULK_BATCH_RUNNER)]
+        self.command = command
+        self.log_level = log_level
+        self._process: Optional[subprocess.Popen] = None
+
+    def _get_process(self) -> subprocess.Popen:
+        """Start runner process if it is not running."""
+        if self._process is None or self._process.poll() is not None:
+            logger.info(f'Starting Embulk batch runner: {" ".join(self.command)}')
+            self._process = subprocess.Popen(
+                self.command + [self.log_level or 'info'], stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE, stderr=subprocess.STDOUT, universal_newlines=True,
+                bufsize=1, start_new_session=True)
+            process = self._process
+            register_process_group(process.pid, lambda: process.poll() is not None)
+        return self._process
+
+    def run(self, job_id: str, config: str,
+            line_callback: Optional[Callable[[str], Any]] = None) -> Dict[str, Any]:
+        """Run rendered Embulk config.
+
+        Parameters:
+            job_id (str): identification of job, used in logs.
+            config (str): rendered Embulk config.
+            line_callback (Callable[[str], Any]): called with every line of Embulk log.
+
+        Returns:
+            Dict[str, Any]: result reported by runner - `status` and `duration`.
+
+        """
+        fd, config_path = tempfile.mkstemp(prefix='luft_', suffix='.yml')
+        try:
+            with os.fdopen(fd, 'w') as config_file:  # mkstemp creates file readable by owner only
+                config_file.write(config)
+            return self._run_file(job_id, config_path, line_callback)
+        finally:
+            os.unlink(config_path)
+
+    def _run_file(self, job_id: str, config_path: str,
+                  line_callback: Optional[Callable[[str], Any]] = None) -> Dict[str, Any]:
+        """Send config file to runner and wait for its result."""
+        process = self._get_process()
+        start = time.time()
+        try:
+            process.stdin.write(json.dumps({'id': job_id, 'config': config_path}) + '\n')
+            process.stdin.flush()
+        except BrokenPipeError:
+            self.close()
+            raise ChildProcessError(f'Embulk batch runner is not running (job {job_id}).')
+        for line in process.stdout:
+            line = line.rstrip()
+            if not line.startswith(RESULT_PREFIX):
+                logger.info(f'[{job_id}] {line}', extra={'source': job_id})
+                if line_callback:
+                    line_callback(line)
+                continue
+            result = json.loads(line[len(RESULT_PREFIX):])
+            logger.info(f'[{job_id}] Embulk finished in {time.time() - start:.1f} s '
+                        f'with status {result.get("status")}.')
+            if result.get('status') != 'ok':
+                raise ChildProcessError(f'Embulk job {job_id} failed: {result.get("error")}')
+            return result
+        self.close()
+        raise ChildProcessError(f'Embulk batch runner exited while running job {job_id}.')
+
+    def kill(self):
+        """Terminate process group of runner, e.g. when running job is cancelled.
+
+        Thread waiting for the job gets end of output and fails, next job starts new runner.
+
+        """
+        process = self._process
+        if process is not None and process.poll() is None:
+            kill_process_groups({process.pid})
+
+    def close(self):
+        """Stop runner process."""
+        process, self._process = self._process, None
+        if process is None:
+            return
+        try:
+            process.stdin.close()
+            process.wait(timeout=30)
+        except Exception:
+            process.kill()
+            process.wait()
+        unregister_process_group(process.pid)
+        if process.stdout:
+            process.stdout.close()
+
+
+class _EmbulkBatchRunners:
+    """Embulk batch runners of all threads."""
+
+    local = threading.local()
+    runners: List[EmbulkBatchRunner] = []
+    lock = threading.Lock()
+
+
+def embulk_batch_runner() -> EmbulkBatchRunner:
+    """Get Embulk batch runner of current thread."""
+    runner = getattr(_EmbulkBatchRunners.local, 'runner', None)
+    if runner is None:
+        runner = EmbulkBatchRunner()
+        _EmbulkBatchRunners.local.runner = runner
+        with _EmbulkBatchRunners.lock:
+            _EmbulkBatchRunners.runners.append(runner)
+    return runner
+
+
+class _PartitionExecutor:
+    """Thread pool running partitions of tables and Embulk batch jobs."""
+
+    instance: Optional[ThreadPoolExecutor] = None
+    lock = threading.Lock()
+
+
+def partition_executor() -> ThreadPoolExecutor:
+    """Get thread pool for partitions of tables and Embulk batch jobs.
+
+    Pool is shared by all tasks, so its threads (and their Embulk batch runners) are reused.
+
+    """
+    with _PartitionExecutor.lock:
+        if _PartitionExecutor.instance is None:
+            _PartitionExecutor.instance = ThreadPoolExecutor(
+                max_workers=EMBULK_PARTITION_THREADS, thread_name_prefix='luft-partition')
+        return _PartitionExecutor.instance
+
+
+@atexit.register
+def close_embulk_batch_runners():
+    """Stop Embulk batch runners of all threads."""
+    with _EmbulkBatchRunners.lock:
+        runners, _EmbulkBatchRunners.runners = _EmbulkBatchRunners.runners, []
+    for runner in runners:
+        runner.close()
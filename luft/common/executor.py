@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+"""Task executor.
+
+Tasks are grouped into lanes by their `thread_name` (the same lanes Airflow uses). Every lane is
+executed sequentially while lanes themselves run concurrently in a thread pool. Tasks spend almost
+all of their time waiting for Embulk, BigQuery or Qlik so threads are sufficient and tasks (with
+their clients) do not have to be pickled. Tasks with timeout are run by their own event loop
+(`GenericTask.execute`), so timed out task is cancelled together with its subprocesses.
+
+Backfill mode ignores lanes and splits work into task x date units instead. Dates of one task are
+chained (run in order) unless the task type is date independent.
+"""
+import contextvars
+import copy
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from luft.common.logger import log_context, setup_logger
+
+# Setup logger
+logger = setup_logger('common', 'INFO')
+
+DoneCallback = Optional[Callable[[Any, str, float], None]]
+Chain = List[Tuple[Any, str]]
+SkipSet = Optional[Set[Tuple[str, str]]]
+
+
+def group_by_thread(task_list: Iterable[Any]) -> Dict[str, List[Any]]:
+    """Group tasks into lanes by thread name keeping order of tasks inside lane."""
+    lanes: Dict[str, List[Any]] = OrderedDict()
+    for task in task_list:
+        lanes.setdefault(task.get_thread_name() or '', []).append(task)
+    return lanes
+
+
+def _lane_chain(lane: List[Any], dates: List[str]) -> Chain:
+    """Return units of lane - all tasks of the lane date by date."""
+    return [(task, date_valid) for date_valid in dates for task in lane]
+
+
+def get_backfill_chains(task_list: List[Any], dates: List[str],
+                        keep_date_order: bool = False) -> List[Chain]:
+    """Split tasks and dates into chains of task x date units.
+
+    Every chain is run sequentially. Order sensitive tasks (or all tasks with `keep_date_order`)
+    get one chain with all dates in order. Date independent tasks get one chain per date and
+    every unit gets its own shallow copy of task because tasks keep date of valid as a state.
+
+    Parameters:
+        task_list (List[GenericTask]): tasks to run.
+        dates (List[str]): list of dates in format YYYY-MM-DD.
+        keep_date_order (bool): run dates in order for all task types.
+
+    Returns:
+        List[List[Tuple[GenericTask, str]]]: list of chains.
+
+    """
+    chains: List[Chain] = []
+    for task in task_list:
+        if keep_date_order or not task.date_independent:
+            chains.append([(task, date_valid) for date_valid in dates])
+        else:
+            chains.extend([[(copy.copy(task), date_valid)] for date_valid in dates])
+    return chains
+
+
+def skip_units(chains: List[Chain], skip: SkipSet) -> List[Chain]:
+    """Remove task x date units present in skip set (task_id, date_valid) from chains.
+
+    Chains left without any unit are removed.
+
+    """
+    if not skip:
+        return chains
+    result = []
+    for chain in chains:
+        chain = [(task, date_valid) for task, date_valid in chain
+                 if (task.get_task_id(), date_valid) not in skip]
+        if chain:
+            result.append(chain)
+    return result
+
+
+def run_chain(chain: Chain, on_done: DoneCallback = None,
+              stop: Optional[threading.Event] = None):
+    """Run task x date units of chain sequentially.
+
+    Parameters:
+        chain (List[Tuple[GenericTask, str]]): units to run.
+        on_done (Callable): function called with task, date and duration after task succeed.
+        stop (threading.Event): if set, no other task is started.
+
+    """
+    for task, date_valid in chain:
+        if stop is not None and stop.is_set():
+            return
+        start = time.monotonic()
+        with log_context(task_id=task.get_task_id(), date_valid=date_valid):
+            task.execute(ts=date_valid)
+        if on_done:
+            on_done(task, date_valid, time.monotonic() - start)
+
+
+def run_chains(chains: List[Chain], parallelism: int = 1, on_done: DoneCallback = None):
+    """Run chains concurrently in thread pool.
+
+    When any chain fails no other unit is started, running units are finished and first error
+    is raised.
+
+    Parameters:
+        chains (List[List[Tuple[GenericTask, str]]]): chains to run.
+        parallelism (int): number of chains running at the same time.
+        on_done (Callable): function called with task, date and duration after task succeed.
+
+    """
+    stop = threading.Event()
+
+    def _run_chain(chain):
+        try:
+            run_chain(chain, on_done, stop)
+        except Exception:
+            stop.set()  # do not start any other task, running ones will finish
+            raise
+
+    # Worker threads are named after calling thread and chains keep its logging context
+    with ThreadPoolExecutor(max_workers=max(parallelism, 1),
+                            thread_name_prefix=threading.current_thread().name) as pool:
+        futures = [pool.submit(contextvars.copy_context().run, _run_chain, chain)
+                   for chain in chains]
+    errors = [future.exception() for future in futures if future.exception()]
+    for error in errors:
+        logger.error(f'Chain failed: {error!r}')
+    if errors:
+        raise errors[0]
+
+
+def run_tasks(task_list: List[Any], dates: List[str], parallelism: int = 1,
+              on_done: DoneCallback = None, skip: SkipSet = None):
+    """Run task list for every date.
+
+    Parameters:
+        task_list (List[GenericTask]): tasks to run.
+        dates (List[str]): list of dates in format YYYY-MM-DD.
+        parallelism (int): number of lanes running at the same time. Default 1 (sequential).
+        on_done (Callable): function called with task, date and duration after task succeed.
+        skip (Set[Tuple[str, str]]): task x date units (task_id, date_valid) not to run.
+
+    """
+    if parallelism <= 1:
+        for chain in skip_units([_lane_chain(task_list, dates)], skip):
+            run_chain(chain, on_done)
+        return
+    lanes = group_by_thread(task_list)
+    logger.info(f'Running {len(task_list)} tasks in {len(lanes)} lanes '
+                f'with parallelism {parallelism}.')
+    chains = skip_units([_lane_chain(lane, dates) for lane in lanes.values()], skip)
+    run_chains(chains, parallelism, on_done)
+
+
+def run_backfill(task_list: List[Any], dates: List[str], parallelism: int = 1,
+                 keep_date_order: bool = False, on_done: DoneCallback = None,
+                 skip: SkipSet = None):
+    """Run task list for every date as independent task x date units.
+
+    Parameters:
+        task_list (List[GenericTask]): tasks to run.
+        dates (List[str]): list of dates in format YYYY-MM-DD.
+        parallelism (int): number of units running at the same time.
+        keep_date_order (bool): run dates in order for all task types.
+        on_done (Callable): function called with task, date and duration after task succeed.
+        skip (Set[Tuple[str, str]]): task x date units (task_id, date_valid) not to run.
+
+    """
+    chains = skip_units(get_backfill_chains(task_list, dates, keep_date_order), skip)
+    logger.info(f'Backfilling {len(task_list)} tasks for {len(dates)} dates in '
+                f'{len(chains)} chains with parallelism {parallelism}.')
+    run_chains(chains, parallelism, on_done)
@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+"""Direct database access for planning of JDBC extraction.
+
+Data are always extracted by Embulk. Luft connects to source database only to run small planning
+queries (e.g. boundaries of partitions) through DB-API driver of given database type. Drivers are
+optional dependencies (`pip install luft[jdbc]`).
+"""
+import datetime
+import decimal
+from typing import Any, Dict, List, Optional
+
+from luft.common.logger import setup_logger
+
+# Setup logger
+logger = setup_logger('common', 'INFO')
+
+PARTITION_METHODS = ('minmax', 'quantile')
+# Column types whose range `minmax` method splits into parts of the same width. Method `quantile`
+# only compares values, so it splits columns of any type (e.g. string keys).
+MINMAX_PARTITION_TYPES = ('int', 'int64', 'integer', 'bigint', 'smallint', 'tinyint', 'number',
+                          'numeric', 'decimal', 'float', 'float64', 'double', 'real', 'date',
+                          'datetime', 'timestamp')
+
+
+def get_db_connection(jdbc_params: Dict[str, str]) -> Any:
+    """Open DB-API connection to database from jdbc parameters of task.
+
+    Parameters:
+        jdbc_params (Dict[str, str]): `TYPE`, `URI`, `PORT`, `USER`, `PASSWORD` and `DATABASE`.
+
+    Returns:
+        Any: DB-API connection.
+
+    """
+    db_type = jdbc_params['TYPE'].lower()
+    params = {
+        'host': jdbc_params['URI'],
+        'port': int(jdbc_params['PORT']),
+        'user': jdbc_params['USER'],
+        'password': jdbc_params['PASSWORD']
+    }
+    try:
+        if db_type in ('postgresql', 'redshift'):
+            import psycopg2
+            return psycopg2.connect(dbname=jdbc_params['DATABASE'], **params)
+        elif db_type == 'mysql':
+            import pymysql
+            return pymysql.connect(database=jdbc_params['DATABASE'], **params)
+    except ImportError as e:
+        raise ImportError(f'Driver for `{db_type}` is not installed ({e}). '
+                          'Install it by `pip install luft[jdbc]`.')
+    raise ValueError(f'Direct connection to `{db_type}` database is not supported.')
+
+
+def sql_literal(value: Any) -> str:
+    """Format python value as SQL literal."""
+    if isinstance(value, (int, float, decimal.Decimal)) and not isinstance(value, bool):
+        return str(value)
+    if isinstance(value, datetime.datetime):
+        return "'{}'".format(value.isoformat(sep=' '))
+    if isinstance(value, datetime.date):
+        return "'{}'".format(value.isoformat())
+    return "'{}'".format(str(value).replace("'", "''"))
+
+
+def _interpolate(low: Any, high: Any, partitions: int) -> List[Any]:
+    """Split interval <low, high> into `partitions` parts of the same size. Return inner bounds."""
+    if isinstance(low, datetime.date) and not isinstance(low, datetime.datetime):
+        step = (high - low).days / partitions
+        return [low + datetime.timedelta(days=int(step * i)) for i in range(1, partitions)]
+    if isinstance(low, datetime.datetime):
+        step = (high - low) / partitions
+        return [low + step * i for i in range(1, partitions)]
+    if isinstance(low, bool) or not isinstance(low, (int, float, decimal.Decimal)):
+        raise TypeError(f'Range of {type(low).__name__} values cannot be split by `minmax` '
+                        'partition method. Use numeric or date partition_column or `quantile` '
+                        'method.')
+    if isinstance(low, int):
+        return [low + (high - low) * i // partitions for i in range(1, partitions)]
+    return [low + (high - low) * i / partitions for i in range(1, partitions)]
+
+
+def get_partition_bounds(connection: Any, table: str, column: str, partitions: int,
+                         method: str = 'minmax', where_clause: Optional[str] = None) -> List[Any]:
+    """Get inner boundaries splitting table into partitions.
+
+    Parameters:
+        connection (Any): DB-API connection.
+        table (str): name of table including schema.
+        column (str): numeric or date column.
+        partitions (int): number of partitions.
+        method (str): `minmax` - ranges of the same width between min and max value, `quantile` -
+            ranges with the same number of rows.
+        where_clause (str): condition of extracted rows.
+
+    Returns:
+        List[Any]: sorted unique boundaries, at most `partitions - 1`. Empty list when table
+            cannot be split.
+
+    """
+    if method not in PARTITION_METHODS:
+        raise ValueError(f'Partition method `{method}` is not supported. Use one of '
+                         f'{", ".join(PARTITION_METHODS)}.')
+    where = f'{column} IS NOT NULL' + (f' AND ({where_clause})' if where_clause else '')
+    if method == 'minmax':
+        query = f'SELECT MIN({column}), MAX({column}) FROM {table} WHERE {where}'
+    else:
+        query = (f'SELECT MIN({column}) FROM (SELECT {column}, NTILE({partitions}) OVER '
+                 f'(ORDER BY {column}) AS luft_bucket FROM {table} WHERE {where}) luft_buckets '
+                 'GROUP BY luft_bucket ORDER BY luft_bucket')
+    logger.info(f'Computing partition bounds: {query}')
+    cursor = connection.cursor()
+    try:
+        cursor.execute(query)
+        rows = cursor.fetchall()
+    finally:
+        cursor.close()
+    if method == 'minmax':
+        low, high = rows[0] if rows else (None, None)
+        bounds = _interpolate(low, high, partitions) if low is not None and low != high else []
+    else:
+        bounds = [row[0] for row in rows[1:]]
+    return sorted(set(bound for bound in bounds if bound is not None))
+
+
+def get_max_value(connection: Any, table: str, column: str,
+                  where_clause: Optional[str] = None) -> Any:
+    """Get maximal value of column, None for empty table."""
+    query = f'SELECT MAX({column}) FROM {table}'
+    if where_clause:
+        query += f' WHERE {where_clause}'
+    logger.info(f'Computing high-water mark: {query}')
+    cursor = connection.cursor()
+    try:
+        cursor.execute(query)
+        row = cursor.fetchone()
+    finally:
+        cursor.close()
+    return row[0] if row else None
+
+
+def get_incremental_predicate(column: str, last: Optional[str], high: Optional[str]) -> str:
+    """Get where condition of rows added since last run.
+
+    Parameters:
+        column (str): incremental column.
+        last (str): SQL literal of high-water mark of last successful run, None for first run.
+        high (str): SQL literal of current maximal value, None for empty table.
+
+    Returns:
+        str: condition `last < column <= high`. Upper bound keeps rows added during extraction
+            for next run.
+
+    """
+    if high is None:
+        return '1 = 0'
+    predicate = f'{column} <= {high}'
+    return f'{column} > {last} AND {predicate}' if last is not None else predicate
+
+
+def get_partition_predicates(column: str, bounds: List[Any]) -> List[str]:
+    """Get where conditions of partitions given by boundaries.
+
+    First partition contains also NULL values, so partitions together cover the whole table.
+
+    """
+    if not bounds:
+        return []
+    literals = [sql_literal(bound) for bound in bounds]
+    predicates = [f'({column} < {literals[0]} OR {column} IS NULL)']
+    for low, high in zip(literals, literals[1:]):
+        predicates.append(f'{column} >= {low} AND {column} < {high}')
+    predicates.append(f'{column} >= {literals[-1]}')
+    return predicates
@@ -1,10 +1,47 @@
 # -*- coding: utf-8 -*-
-"""Utilities for setup logger."""
+"""Utilities for setup logger.
+
+Luft loggers share one output handler (stdout). With `[logging] queue` enabled records are only
+put into queue by logging threads and background thread formats and writes them, so tasks never
+wait for slow stdout (e.g. Airflow log collection). Handler in front of the queue (running in
+logging thread) adds context of task to records and limits output of subprocesses.
+"""
+import atexit
+import contextlib
+import contextvars
+import json
 import logging
 import os
+import queue
+import re
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, Iterator, List, Optional
 
 from luft.common.constants import (LOG_FORMAT, LOG_HANDLER, LOG_LEVEL)
 
+# Fields of logging context attached to every record, see `log_context`
+CONTEXT_FIELDS = ('task_id', 'date_valid', 'job_id')
+
+_LOG_CONTEXT: contextvars.ContextVar = contextvars.ContextVar('luft_log_context', default={})
+
+
+class _LogPipeline:
+    """Shared handlers of Luft loggers."""
+
+    output_handler: logging.Handler = LOG_HANDLER
+    queue_handler: Optional[QueueHandler] = None
+    listener: Optional[QueueListener] = None
+    filters: List[logging.Filter] = []
+    loggers: List[logging.Logger] = []
+    lock = threading.RLock()
+
+
+def _front_handler() -> logging.Handler:
+    """Return handler attached to loggers - queue handler or output handler itself."""
+    return _LogPipeline.queue_handler or _LogPipeline.output_handler
+
 
 def setup_logger(log_name, log_level=LOG_LEVEL, log_handler=LOG_HANDLER):
     """Set logging system.
@@ -16,11 +53,205 @@ def setup_logger(log_name, log_level=LOG_LEVEL, log_handler=LOG_HANDLER):
     if not os.getenv('IS_AIRFLOW'):
         logger = logging.getLogger(log_name)
         if not len(logger.handlers):
-            log_handler.setFormatter(logging.Formatter(LOG_FORMAT))
-            log_handler.setLevel(log_level)
-            logger.addHandler(log_handler)
+            with _LogPipeline.lock:
+                if log_handler is not _LogPipeline.output_handler:
+                    log_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+                    handler = log_handler
+                else:
+                    handler = _front_handler()
+                    _LogPipeline.loggers.append(logger)
+                if handler.formatter is None:
+                    handler.setFormatter(logging.Formatter(LOG_FORMAT))
+                log_handler.setLevel(log_level)
+                logger.addHandler(handler)
             logger.setLevel(log_level)
             logger.propagate = False
         return logger
     else:
         return logging
+
+
+class ContextFilter(logging.Filter):
+    """Attach logging context (task_id, date_valid, job_id) of current task to records."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        """Add context fields to record."""
+        context = _LOG_CONTEXT.get()
+        for field in CONTEXT_FIELDS:
+            if not hasattr(record, field):
+                setattr(record, field, context.get(field, ''))
+        return True
+
+
+class RateLimitFilter(logging.Filter):
+    """Limit number of records of every source, e.g. lines of one Embulk job.
+
+    Only records with `source` attribute (output of subprocesses) below WARNING are limited.
+    Every `sample`-th record is kept and at most `rate` records per second (with bursts up to
+    `burst`) pass. Number of dropped records is appended to the next record of the source.
+    """
+
+    def __init__(self, rate: float = 0, burst: Optional[float] = None, sample: int = 1):
+        """Create filter.
+
+        Parameters:
+            rate (float): records per second of one source, 0 means no limit.
+            burst (float): records passing at once before limit applies. Default is `rate`.
+            sample (int): keep only every n-th record.
+
+        """
+        super().__init__()
+        self.rate = rate
+        self.burst = burst or rate
+        self.sample = max(int(sample or 1), 1)
+        self._buckets: Dict[str, List[float]] = {}
+        self._seen: Dict[str, int] = {}
+        self._dropped: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def _allow(self, source: str) -> bool:
+        """Decide whether next record of source passes."""
+        seen = self._seen[source] = self._seen.get(source, 0) + 1
+        if (seen - 1) % self.sample:
+            return False
+        if not self.rate:
+            return True
+        now = time.monotonic()
+        tokens, last = self._buckets.get(source, [self.burst, now])
+        tokens = min(self.burst, tokens + (now - last) * self.rate)
+        allowed = tokens >= 1
+        self._buckets[source] = [tokens - 1 if allowed else tokens, now]
+        return allowed
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        """Drop record over the limit of its source."""
+        source = getattr(record, 'source', None)
+        if source is None or record.levelno >= logging.WARNING:
+            return True
+        with self._lock:
+            if not self._allow(source):
+                self._dropped[source] = self._dropped.get(source, 0) + 1
+                return False
+            dropped = self._dropped.pop(source, 0)
+        if dropped:
+            record.msg = f'{record.getMessage()} [{dropped} lines of {source} suppressed]'
+            record.args = None
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """Format record as one json object per line."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        """Format record with context fields."""
+        message: Dict[str, Any] = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'function': record.funcName,
+            'thread': record.threadName,
+            'message': record.getMessage()
+        }
+        for field in CONTEXT_FIELDS + ('source',):
+            value = getattr(record, field, None)
+            if value:
+                message[field] = value
+        if record.exc_info:
+            message['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(message, default=str)
+
+
+@contextlib.contextmanager
+def log_context(**fields: str) -> Iterator[None]:
+    """Attach fields (task_id, date_valid, job_id) to all records logged inside the block.
+
+    Context is kept by asyncio tasks. Blocking functions run in thread pools must be run through
+    `contextvars.copy_context().run` to keep it.
+
+    """
+    token = _LOG_CONTEXT.set(dict(_LOG_CONTEXT.get(), **fields))
+    try:
+        yield
+    finally:
+        _LOG_CONTEXT.reset(token)
+
+
+def summarize_query(query: str, max_length: int = 200) -> str:
+    """Return query shortened to one line with its number of lines and characters."""
+    lines = query.count('\n') + 1
+    text = re.sub(r'\s+', ' ', query).strip()
+    if len(text) > max_length:
+        text = text[:max_length] + '...'
+    return f'{text} ({lines} lines, {len(query)} chars)'
+
+
+def _start_listener():
+    """Start background writer reading queue of records."""
+    record_queue: queue.Queue = queue.Queue(-1)
+    if _LogPipeline.queue_handler is None:
+        _LogPipeline.queue_handler = QueueHandler(record_queue)
+    else:
+        _LogPipeline.queue_handler.queue = record_queue
+    _LogPipeline.listener = QueueListener(record_queue, _LogPipeline.output_handler,
+                                          respect_handler_level=True)
+    _LogPipeline.listener.start()
+
+
+@atexit.register
+def stop_log_listener():
+    """Write all queued records and stop background writer."""
+    with _LogPipeline.lock:
+        listener, _LogPipeline.listener = _LogPipeline.listener, None
+    if listener is not None:
+        listener.stop()
+
+
+def _restart_listener_after_fork():
+    """Start own writer in forked child, thread of parent does not exist there."""
+    if _LogPipeline.listener is not None:
+        _LogPipeline.listener = None
+        _start_listener()
+
+
+os.register_at_fork(after_in_child=_restart_listener_after_fork)
+
+
+def configure_logging(use_queue: bool = True, json_format: bool = False,
+                      subprocess_rate: float = 0, subprocess_burst: Optional[float] = None,
+                      subprocess_sample: int = 1):
+    """Configure output of all Luft loggers.
+
+    Parameters:
+        use_queue (bool): write records in background thread.
+        json_format (bool): write json records including task_id and date_valid.
+        subprocess_rate (float): lines per second of one subprocess (source), 0 means no limit.
+        subprocess_burst (float): lines of subprocess passing at once before limit applies.
+        subprocess_sample (int): keep only every n-th line of subprocess.
+
+    """
+    with _LogPipeline.lock:
+        old_front = _front_handler()
+        stop_log_listener()
+        if use_queue:
+            _start_listener()
+        else:
+            _LogPipeline.queue_handler = None
+        front = _front_handler()
+        for log_filter in _LogPipeline.filters:
+            old_front.removeFilter(log_filter)
+        _LogPipeline.filters = [ContextFilter()]
+        if subprocess_rate or subprocess_sample > 1:
+            _LogPipeline.filters.append(
+                RateLimitFilter(subprocess_rate, subprocess_burst, subprocess_sample))
+        for log_filter in _LogPipeline.filters:
+            front.addFilter(log_filter)
+        if json_format:
+            _LogPipeline.output_handler.setFormatter(JsonFormatter())
+        else:
+            _LogPipeline.output_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+        if use_queue:  # records are formatted by output handler, queue keeps only message
+            front.setFormatter(logging.Formatter('%(message)s'))
+        for logger in _LogPipeline.loggers:
+            if old_front is not front:
+                logger.removeHandler(old_front)
+                logger.addHandler(front)
@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+"""Metrics of task runs.
+
+Tasks measure named phases of their runs (`GenericTask.span`) and count rows and bytes
+(`GenericTask.record_rows`, `record_bytes` and `record_bq_bytes`). Metrics of the whole process
+are written at the end of run into file in Prometheus text format - for textfile collector of
+node exporter or to be sent to pushgateway
+(`curl --data-binary @luft.prom <pushgateway>/metrics/job/luft`).
+"""
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from luft.common.config import METRICS_TEXTFILE
+from luft.common.logger import setup_logger
+
+# Setup logger
+logger = setup_logger('common', 'INFO')
+
+METRIC_PREFIX = 'luft_'
+Labels = Tuple[Tuple[str, str], ...]
+
+# Metric name: (type, help)
+METRICS = OrderedDict([
+    ('task_phase_seconds', ('summary', 'Duration of phase of task run.')),
+    ('task_runs_total', ('counter', 'Finished task runs by status.')),
+    ('task_rows_total', ('counter', 'Rows processed by task.')),
+    ('task_bytes_total', ('counter', 'Bytes produced by task.')),
+    ('task_bq_bytes_processed_total', ('counter', 'Bytes processed by BigQuery jobs of task.')),
+    ('task_last_success_timestamp_seconds', ('gauge', 'Time of last successful task run.'))
+])
+
+
+def _escape(value: str) -> str:
+    """Escape label value."""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels: Labels) -> str:
+    """Format labels as `{name="value",...}`."""
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels) + '}'
+
+
+class MetricsRegistry:
+    """Metrics collected by all threads of process."""
+
+    def __init__(self):
+        """Create empty registry."""
+        self._values: Dict[Tuple[str, Labels], List[float]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(name: str, labels: Dict[str, str]) -> Tuple[str, Labels]:
+        if name not in METRICS:
+            raise ValueError(f'Unknown metric `{name}`.')
+        return name, tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+    def observe(self, name: str, value: float, **labels: str):
+        """Add observation to summary (sum and count)."""
+        key = self._key(name, labels)
+        with self._lock:
+            total = self._values.setdefault(key, [0.0, 0])
+            total[0] += value
+            total[1] += 1
+
+    def inc(self, name: str, value: float = 1, **labels: str):
+        """Increase counter."""
+        key = self._key(name, labels)
+        with self._lock:
+            self._values.setdefault(key, [0.0])[0] += value
+
+    def set(self, name: str, value: float, **labels: str):
+        """Set gauge."""
+        key = self._key(name, labels)
+        with self._lock:
+            self._values[key] = [value]
+
+    def get(self, name: str, **labels: str) -> Optional[List[float]]:
+        """Get value (sum and count of summary) of metric."""
+        with self._lock:
+            value = self._values.get(self._key(name, labels))
+        return list(value) if value else None
+
+    def clear(self):
+        """Remove all metrics."""
+        with self._lock:
+            self._values.clear()
+
+    def render(self) -> str:
+        """Render metrics in Prometheus text format."""
+        with self._lock:
+            values = sorted(self._values.items())
+        lines = []
+        for name, (metric_type, help_text) in METRICS.items():
+            samples = [(labels, value) for (metric, labels), value in values if metric == name]
+            if not samples:
+                continue
+            lines.append(f'# HELP {METRIC_PREFIX}{name} {help_text}')
+            lines.append(f'# TYPE {METRIC_PREFIX}{name} {metric_type}')
+            for labels, value in samples:
+                if metric_type == 'summary':
+                    lines.append(f'{METRIC_PREFIX}{name}_sum{_format_labels(labels)} {value[0]:g}')
+                    lines.append(f'{METRIC_PREFIX}{name}_count{_format_labels(labels)} '
+                                 f'{value[1]:g}')
+                else:
+                    lines.append(f'{METRIC_PREFIX}{name}{_format_labels(labels)} {value[0]:g}')
+        return '\n'.join(lines) + '\n' if lines else ''
+
+    def write_textfile(self, path: str):
+        """Write metrics into file atomically, so collector never reads half written file."""
+        target = Path(path)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=str(target.parent), prefix='.luft_metrics_')
+        try:
+            with os.fdopen(fd, 'w') as metrics_file:
+                metrics_file.write(self.render())
+            os.chmod(tmp_path, 0o644)  # collector usually runs as another user
+            os.replace(tmp_path, str(target))
+        except Exception:
+            os.unlink(tmp_path)
+            raise
+
+
+class _Metrics:
+    """Metrics registry singleton."""
+
+    instance: Optional[MetricsRegistry] = None
+    lock = threading.Lock()
+
+
+def metrics() -> MetricsRegistry:
+    """Get metrics registry of process."""
+    with _Metrics.lock:
+        if _Metrics.instance is None:
+            _Metrics.instance = MetricsRegistry()
+        return _Metrics.instance
+
+
+def record_task_run(task_id: str, task_type: str, duration: float, success: bool):
+    """Record finished run of task."""
+    registry = metrics()
+    status = 'ok' if success else 'failed'
+    registry.inc('task_runs_total', task_id=task_id, task_type=task_type, status=status)
+    registry.observe('task_phase_seconds', duration, task_id=task_id, task_type=task_type,
+                     phase='total')
+    if success:
+        registry.set('task_last_success_timestamp_seconds', time.time(), task_id=task_id,
+                     task_type=task_type)
+
+
+def write_metrics(path: Optional[str] = METRICS_TEXTFILE):
+    """Write metrics into `[metrics] textfile`. Errors are only logged, they do not fail run."""
+    if not path:
+        return
+    try:
+        metrics().write_textfile(path)
+        logger.info(f'Metrics written to {path}.')
+    except Exception as e:
+        logger.warning(f'Metrics cannot be written to {path}: {e!r}')
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+"""Process groups of subprocesses started by Luft.
+
+Embulk is started through shell (and `java -jar`), so killing only the started process would leave
+JVM running and holding its database connections. Every subprocess is therefore started in its
+own session (process group) and the whole group is terminated when task is cancelled, times out
+or Luft itself receives SIGTERM/SIGINT (e.g. from Airflow or Kubernetes).
+"""
+import os
+import signal
+import threading
+import time
+from typing import Callable, Dict, Iterable, Optional
+
+from luft.common.config import KILL_GRACE_PERIOD
+from luft.common.logger import setup_logger
+
+# Setup logger
+logger = setup_logger('common', 'INFO')
+
+
+class _ProcessGroups:
+    """Process groups of running subprocesses."""
+
+    groups: Dict[int, Callable[[], bool]] = {}
+    lock = threading.Lock()
+
+
+def register_process_group(pgid: int, exited: Callable[[], bool]):
+    """Register process group to be terminated when Luft is terminated.
+
+    Parameters:
+        pgid (int): id of process group - pid of started process.
+        exited (Callable[[], bool]): whether started process already exited and was reaped.
+            Until it is reaped it exists as zombie, so signal alone cannot tell.
+
+    """
+    with _ProcessGroups.lock:
+        _ProcessGroups.groups[pgid] = exited
+
+
+def unregister_process_group(pgid: int):
+    """Unregister finished process group."""
+    with _ProcessGroups.lock:
+        _ProcessGroups.groups.pop(pgid, None)
+
+
+def _signal_group(pgid: int, signum: int) -> bool:
+    """Send signal to process group. Return whether group still exists."""
+    try:
+        os.killpg(pgid, signum)
+    except (ProcessLookupError, PermissionError):
+        return False
+    return True
+
+
+def _is_running(pgid: int) -> bool:
+    """Check whether started process or any other process of its group is running."""
+    with _ProcessGroups.lock:
+        exited: Optional[Callable[[], bool]] = _ProcessGroups.groups.get(pgid)
+    if exited is not None and not exited():
+        return True
+    return _signal_group(pgid, 0)
+
+
+def kill_process_groups(pgids: Iterable[int], grace_period: float = KILL_GRACE_PERIOD):
+    """Terminate process groups - SIGTERM first, SIGKILL after grace period.
+
+    Parameters:
+        pgids (Iterable[int]): ids of process groups.
+        grace_period (float): seconds to wait for groups to exit after SIGTERM.
+
+    """
+    pgids = set(pgids)
+    running = {pgid for pgid in pgids if _signal_group(pgid, signal.SIGTERM)}
+    deadline = time.monotonic() + grace_period
+    while running and time.monotonic() < deadline:
+        time.sleep(0.1)
+        running = {pgid for pgid in running if _is_running(pgid)}
+    for pgid in running:
+        logger.warning(f'Process group {pgid} did not exit in {grace_period} s, killing it.')
+        _signal_group(pgid, signal.SIGKILL)
+    for pgid in pgids:
+        unregister_process_group(pgid)
+
+
+def terminate_process_groups(grace_period: float = KILL_GRACE_PERIOD):
+    """Terminate all registered process groups."""
+    with _ProcessGroups.lock:
+        pgids = set(_ProcessGroups.groups)
+    if pgids:
+        logger.warning(f'Terminating {len(pgids)} running process groups.')
+        kill_process_groups(pgids, grace_period)
+
+
+def _handle_signal(signum, frame):
+    """Terminate subprocesses and exit."""
+    logger.error(f'Received signal {signal.Signals(signum).name}, terminating.')
+    terminate_process_groups()
+    raise SystemExit(128 + signum)
+
+
+def install_signal_handlers():
+    """Terminate all subprocesses on SIGTERM and SIGINT.
+
+    Must be called from main thread.
+
+    """
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, _handle_signal)
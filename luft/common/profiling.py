@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+"""Opt-in profiling of task runs.
+
+With `luft --profile ...` (or LUFT_PROFILE=true) every task run is profiled by cProfile and
+tracemalloc. For every run `<name>.prof` (open it by `python -m pstats` or snakeviz) and
+`<name>.tracemalloc` (`tracemalloc.Snapshot.load`) are written into `[core] profile_dir`.
+
+cProfile measures thread running the task and blocking calls the task runs in executor threads
+(`run_in_executor`), e.g. `__call__` of task with timeout. Tracemalloc traces the whole process,
+so with parallelism > 1 memory snapshot contains also allocations of concurrently running tasks.
+"""
+import cProfile
+import contextlib
+import contextvars
+import pstats
+import re
+import sys
+import threading
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable, Iterator, List, Optional
+
+from luft.common.config import PROFILE, PROFILE_DIR
+from luft.common.logger import setup_logger
+
+# Setup logger
+logger = setup_logger('common', 'INFO')
+
+# Number of frames of traceback stored by tracemalloc for every allocation
+TRACEMALLOC_FRAMES = 25
+
+# Profilers of executor threads started by profiled block, merged into its profile
+_thread_profilers: contextvars.ContextVar = contextvars.ContextVar(
+    'luft_thread_profilers', default=None)
+
+
+class _Profiling:
+    """Profiling settings of process."""
+
+    directory: Optional[Path] = Path(PROFILE_DIR) if PROFILE else None
+    lock = threading.Lock()
+
+
+def enable_profiling(directory: str = PROFILE_DIR):
+    """Profile all following task runs, write profiles into directory."""
+    _Profiling.directory = Path(directory)
+
+
+def disable_profiling():
+    """Stop profiling of task runs."""
+    _Profiling.directory = None
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+
+def profiling_enabled() -> bool:
+    """Check whether task runs are profiled."""
+    return _Profiling.directory is not None
+
+
+def _file_name(name: str) -> str:
+    """Make safe file name from name of profiled block."""
+    return re.sub(r'[^\w.-]+', '_', name)
+
+
+def profile_thread(func: Callable[..., Any], *args: Any) -> Any:
+    """Run function in executor thread, profile it when it was started by profiled block.
+
+    Parameters:
+        func (callable): function to run.
+        args: arguments of function.
+
+    Returns:
+        Any: result of function.
+
+    """
+    profilers: Optional[List[cProfile.Profile]] = _thread_profilers.get()
+    if profilers is None:
+        return func(*args)
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:  # another profiler is active in this thread
+        return func(*args)
+    try:
+        return func(*args)
+    finally:
+        profiler.disable()
+        with _Profiling.lock:
+            profilers.append(profiler)
+
+
+@contextlib.contextmanager
+def profile(name: str) -> Iterator[None]:
+    """Profile block by cProfile and tracemalloc when profiling is enabled.
+
+    Block inside another profiled block or run under another profiler (e.g. test run by cProfile)
+    is run without its own profile, like in `profile_thread`.
+
+    Parameters:
+        name (str): name of profile files, e.g. task id and date valid.
+
+    """
+    directory = _Profiling.directory
+    if directory is None:
+        yield
+        return
+    profiler = cProfile.Profile()
+    try:
+        if _thread_profilers.get() is not None or sys.getprofile() is not None:
+            raise ValueError('Another profiler is active in this thread.')
+        profiler.enable()
+    except ValueError as e:
+        logger.warning(f'{name} is not profiled: {e}')
+        profiler = None
+    if profiler is None:
+        yield
+        return
+    with _Profiling.lock:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+    thread_profilers: List[cProfile.Profile] = []
+    token = _thread_profilers.set(thread_profilers)
+    start = time.monotonic()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        _thread_profilers.reset(token)
+        duration = time.monotonic() - start
+        try:
+            directory.mkdir(parents=True, exist_ok=True)
+            base = directory / _file_name(name)
+            stats = pstats.Stats(profiler)
+            with _Profiling.lock:
+                for thread_profiler in thread_profilers:
+                    stats.add(thread_profiler)
+            stats.dump_stats(f'{base}.prof')
+            tracemalloc.take_snapshot().dump(f'{base}.tracemalloc')
+            current, peak = tracemalloc.get_traced_memory()
+            logger.info(f'Profile of {name} ({duration:.1f} s) written to {base}.prof and '
+                        f'{base}.tracemalloc. Traced memory {current / 2 ** 20:.1f} MiB, '
+                        f'peak {peak / 2 ** 20:.1f} MiB.')
+        except Exception as e:  # profiling must not fail the task
+            logger.warning(f'Profile of {name} cannot be written: {e!r}')
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+"""Statistics of task runs recorded in run ledger (see `luft stats`)."""
+import math
+import statistics
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence
+
+Run = Dict[str, Any]
+
+
+def percentile(values: Sequence[float], pct: float) -> Optional[float]:
+    """Get percentile of values (nearest rank method). None for no values."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(math.ceil(pct / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+def get_duration(run: Run) -> float:
+    """Get duration of run in seconds."""
+    return run['finished_at'] - run['started_at']
+
+
+def _group_by(runs: List[Run], key) -> Dict[Any, List[Run]]:
+    """Group runs by key keeping their order."""
+    groups: Dict[Any, List[Run]] = OrderedDict()
+    for run in runs:
+        groups.setdefault(key(run), []).append(run)
+    return groups
+
+
+def task_stats(runs: List[Run]) -> List[Dict[str, Any]]:
+    """Get duration percentiles and volumes of every task, the slowest (p95) first.
+
+    Durations are computed only from successful runs.
+
+    """
+    result = []
+    for task_id, task_runs in _group_by(runs, lambda run: run['task_id']).items():
+        durations = [get_duration(run) for run in task_runs if run['status'] == 'ok']
+        result.append({
+            'task_id': task_id,
+            'task_type': task_runs[-1]['task_type'],
+            'runs': len(task_runs),
+            'failed': sum(1 for run in task_runs if run['status'] != 'ok'),
+            'p50': percentile(durations, 50),
+            'p95': percentile(durations, 95),
+            'max': max(durations, default=None),
+            'rows': sum(run['rows'] or 0 for run in task_runs),
+            'bytes': sum(run['bytes'] or 0 for run in task_runs),
+            'bq_bytes_processed': sum(run['bq_bytes_processed'] or 0 for run in task_runs)
+        })
+    return sorted(result, key=lambda stats: -(stats['p95'] or 0))
+
+
+def daily_trend(runs: List[Run]) -> List[Dict[str, Any]]:
+    """Get number of runs, total and percentile durations of runs started every day."""
+    result = []
+    by_day = _group_by(
+        runs, lambda run: datetime.fromtimestamp(run['started_at']).strftime('%Y-%m-%d'))
+    for day, day_runs in sorted(by_day.items()):
+        durations = [get_duration(run) for run in day_runs if run['status'] == 'ok']
+        result.append({
+            'day': day,
+            'runs': len(day_runs),
+            'failed': sum(1 for run in day_runs if run['status'] != 'ok'),
+            'total': sum(durations),
+            'p50': percentile(durations, 50),
+            'p95': percentile(durations, 95),
+            'bq_bytes_processed': sum(run['bq_bytes_processed'] or 0 for run in day_runs)
+        })
+    return result
+
+
+def find_regressions(runs: List[Run], recent: int = 5, threshold: float = 1.5,
+                     min_history: int = 5) -> List[Dict[str, Any]]:
+    """Find tasks whose recent runs are slower than the older ones.
+
+    Parameters:
+        runs (List[Dict[str, Any]]): runs ordered by start.
+        recent (int): number of last successful runs compared with the older ones.
+        threshold (float): ratio of median durations reported as regression.
+        min_history (int): minimal number of older runs to compare with.
+
+    Returns:
+        List[Dict[str, Any]]: task_id, median durations `before` and `recent` and their `ratio`,
+            the biggest ratio first.
+
+    """
+    result = []
+    for task_id, task_runs in _group_by(runs, lambda run: run['task_id']).items():
+        durations = [get_duration(run) for run in task_runs if run['status'] == 'ok']
+        if len(durations) < recent + min_history:
+            continue
+        before = statistics.median(durations[:-recent])
+        last = statistics.median(durations[-recent:])
+        if before > 0 and last / before >= threshold:
+            result.append({'task_id': task_id, 'before': before, 'recent': last,
+                           'ratio': last / before})
+    return sorted(result, key=lambda regression: -regression['ratio'])
+
+
+def _format_value(value: Any) -> str:
+    """Format value of table cell."""
+    if value is None:
+        return '-'
+    if isinstance(value, float):
+        return f'{value:.1f}'
+    return str(value)
+
+
+def format_table(rows: List[Dict[str, Any]], columns: Sequence[str]) -> str:
+    """Format rows as text table with aligned columns."""
+    cells = [list(columns)] + [[_format_value(row[column]) for column in columns]
+                               for row in rows]
+    widths = [max(len(row[i]) for row in cells) for i in range(len(columns))]
+    lines = ['  '.join(cell.ljust(width) for cell, width in zip(row, widths)).rstrip()
+             for row in cells]
+    lines.insert(1, '  '.join('-' * width for width in widths))
+    return '\n'.join(lines)
@@ -2,25 +2,45 @@
 """S3 utils."""
 
 import gzip
-from typing import Optional
+import threading
+from typing import Any, Dict, List, Optional, Tuple
 
-import boto3
+_s3_clients: Dict[Tuple[str, str], Any] = {}
+_s3_lock = threading.Lock()
 
 
 def get_s3(aws_access_key, aws_secret_access_key):
-    """Get S3 connections."""
-    s3 = boto3.client('s3', aws_access_key_id=aws_access_key,
-                      aws_secret_access_key=aws_secret_access_key)
-    return s3
+    """Get S3 connections.
+
+    Client is created only once for every credentials and then reused (boto3 clients are thread
+    safe, creating of them is not).
+
+    """
+    import boto3
+    with _s3_lock:
+        key = (aws_access_key, aws_secret_access_key)
+        if key not in _s3_clients:
+            _s3_clients[key] = boto3.client('s3', aws_access_key_id=aws_access_key,
+                                            aws_secret_access_key=aws_secret_access_key)
+        return _s3_clients[key]
 
 
 def get_s3_resource(aws_access_key, aws_secret_access_key):
     """Get S3 resource."""
+    import boto3
     s3_resource = boto3.resource('s3', aws_access_key_id=aws_access_key,
                                  aws_secret_access_key=aws_secret_access_key)
     return s3_resource
 
 
+def list_s3_objects(s3, s3_bucket: str, prefix: str) -> List[Tuple[str, int]]:
+    """List keys and sizes of objects with prefix."""
+    objects = []
+    for page in s3.get_paginator('list_objects_v2').paginate(Bucket=s3_bucket, Prefix=prefix):
+        objects.extend((obj['Key'], obj['Size']) for obj in page.get('Contents', []))
+    return objects
+
+
 def write_s3(env: str, source_system: str, source_subsystem: str, object_name: str, s3,
              s3_bucket: str, content, date_valid: str, page: int = 1,
              extension: str = 'json', compress: bool = True, s3_path: Optional[str] = None):
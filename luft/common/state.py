@@ -0,0 +1,265 @@
+# -*- coding: utf-8 -*-
+"""Local state of Luft runs."""
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from luft.common.config import STATE_DB, THREAD_DURATION_HISTORY
+from luft.common.logger import setup_logger
+
+# Setup logger
+logger = setup_logger('common', 'INFO')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS task_checkpoint (
+    run_id TEXT NOT NULL,
+    task_id TEXT NOT NULL,
+    date_valid TEXT NOT NULL,
+    finished_at REAL NOT NULL,
+    PRIMARY KEY (run_id, task_id, date_valid)
+);
+CREATE TABLE IF NOT EXISTS task_output (
+    task_id TEXT NOT NULL,
+    date_valid TEXT,
+    files INTEGER NOT NULL,
+    bytes INTEGER NOT NULL,
+    recorded_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS task_output_task_id ON task_output (task_id, recorded_at);
+CREATE TABLE IF NOT EXISTS task_watermark (
+    task_id TEXT NOT NULL PRIMARY KEY,
+    value TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS task_run (
+    task_id TEXT NOT NULL,
+    task_type TEXT,
+    source_system TEXT,
+    date_valid TEXT,
+    started_at REAL NOT NULL,
+    finished_at REAL NOT NULL,
+    status TEXT NOT NULL,
+    rows INTEGER,
+    bytes INTEGER,
+    bq_bytes_processed INTEGER,
+    host TEXT
+);
+CREATE INDEX IF NOT EXISTS task_run_started_at ON task_run (started_at);
+CREATE INDEX IF NOT EXISTS task_run_task_id ON task_run (task_id, started_at);
+"""
+
+# Columns of run ledger
+RUN_COLUMNS = ('task_id', 'task_type', 'source_system', 'date_valid', 'started_at', 'finished_at',
+               'status', 'rows', 'bytes', 'bq_bytes_processed', 'host')
+
+
+class StateStore:
+    """State store.
+
+    Small SQLite database shared by all threads of one process. It keeps information about
+    previous runs that are used for planning of next runs.
+
+    """
+
+    def __init__(self, path: str = STATE_DB):
+        """Create state store.
+
+        Parameters:
+            path (str): path to SQLite database. It is created with its folder if missing.
+
+        """
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open connection and create tables on first use."""
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False)
+            self._conn.executescript(SCHEMA)
+        return self._conn
+
+    def close(self):
+        """Close connection."""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def get_durations(self, task_ids: Iterable[str],
+                      history: int = THREAD_DURATION_HISTORY) -> Dict[str, float]:
+        """Get average duration of last successful runs of tasks from run ledger.
+
+        Parameters:
+            task_ids (Iterable[str]): task identifiers.
+            history (int): how many last runs are taken into account.
+
+        Returns:
+            Dict[str, float]: average duration in seconds by task_id. Tasks without any
+                recorded run are missing.
+
+        """
+        result: Dict[str, float] = {}
+        if not self.path.exists():  # do not create database just for reading
+            return result
+        with self._lock:
+            conn = self._connect()
+            for task_id in task_ids:
+                row = conn.execute(
+                    'SELECT AVG(finished_at - started_at) FROM (SELECT started_at, finished_at'
+                    " FROM task_run WHERE task_id = ? AND status = 'ok'"
+                    ' ORDER BY started_at DESC LIMIT ?)', (task_id, history)).fetchone()
+                if row and row[0] is not None:
+                    result[task_id] = row[0]
+        return result
+
+    def mark_done(self, run_id: str, task_id: str, date_valid: str):
+        """Record that task x date unit of run has finished successfully.
+
+        Parameters:
+            run_id (str): run identifier.
+            task_id (str): task identifier.
+            date_valid (str): date of valid.
+
+        """
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.execute('INSERT OR REPLACE INTO task_checkpoint VALUES (?, ?, ?, ?)',
+                             (run_id, task_id, date_valid, time.time()))
+
+    def get_done(self, run_id: str) -> Set[Tuple[str, str]]:
+        """Get finished task x date units of run.
+
+        Parameters:
+            run_id (str): run identifier.
+
+        Returns:
+            Set[Tuple[str, str]]: set of (task_id, date_valid).
+
+        """
+        if not self.path.exists():
+            return set()
+        with self._lock:
+            conn = self._connect()
+            rows = conn.execute('SELECT task_id, date_valid FROM task_checkpoint WHERE run_id = ?',
+                                (run_id,)).fetchall()
+        return {(task_id, date_valid) for task_id, date_valid in rows}
+
+    def record_output(self, task_id: str, date_valid: Optional[str], files: int, size: int):
+        """Record files produced by one run of task.
+
+        Parameters:
+            task_id (str): task identifier.
+            date_valid (str): date of valid of the run.
+            files (int): number of files.
+            size (int): total size of files in bytes.
+
+        """
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.execute('INSERT INTO task_output VALUES (?, ?, ?, ?, ?)',
+                             (task_id, date_valid, files, size, time.time()))
+
+    def get_last_output_size(self, task_id: str) -> Optional[int]:
+        """Get total size in bytes of files produced by last recorded run of task."""
+        if not self.path.exists():
+            return None
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute('SELECT bytes FROM task_output WHERE task_id = ?'
+                               ' ORDER BY recorded_at DESC LIMIT 1', (task_id,)).fetchone()
+        return row[0] if row else None
+
+    def get_watermark(self, task_id: str) -> Optional[str]:
+        """Get high-water mark of incremental task.
+
+        Parameters:
+            task_id (str): task identifier.
+
+        Returns:
+            str: SQL literal of maximal extracted value, None when task has not run yet.
+
+        """
+        if not self.path.exists():
+            return None
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute('SELECT value FROM task_watermark WHERE task_id = ?',
+                               (task_id,)).fetchone()
+        return row[0] if row else None
+
+    def set_watermark(self, task_id: str, value: str):
+        """Store high-water mark of incremental task after successful run.
+
+        Parameters:
+            task_id (str): task identifier.
+            value (str): SQL literal of maximal extracted value.
+
+        """
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.execute('INSERT OR REPLACE INTO task_watermark VALUES (?, ?, ?)',
+                             (task_id, value, time.time()))
+
+    def record_run(self, run: Dict[str, Any]):
+        """Append one task x date execution to run ledger.
+
+        Parameters:
+            run (Dict[str, Any]): values of `RUN_COLUMNS`, missing ones are stored as NULL.
+
+        """
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.execute(f'INSERT INTO task_run ({", ".join(RUN_COLUMNS)})'
+                             f' VALUES ({", ".join("?" * len(RUN_COLUMNS))})',
+                             tuple(run.get(column) for column in RUN_COLUMNS))
+
+    def get_runs(self, since: Optional[float] = None, task_type: Optional[str] = None,
+                 source_system: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Get executions from run ledger ordered by start.
+
+        Parameters:
+            since (float): only runs started after this unix time.
+            task_type (str): only runs of tasks of this type.
+            source_system (str): only runs of tasks of this source system.
+
+        Returns:
+            List[Dict[str, Any]]: runs with values of `RUN_COLUMNS`.
+
+        """
+        if not self.path.exists():
+            return []
+        conditions, params = [], []
+        for condition, param in (('started_at >= ?', since), ('task_type = ?', task_type),
+                                 ('source_system = ?', source_system)):
+            if param is not None:
+                conditions.append(condition)
+                params.append(param)
+        where = ' WHERE ' + ' AND '.join(conditions) if conditions else ''
+        with self._lock:
+            conn = self._connect()
+            rows = conn.execute(f'SELECT {", ".join(RUN_COLUMNS)} FROM task_run{where}'
+                                ' ORDER BY started_at', params).fetchall()
+        return [dict(zip(RUN_COLUMNS, row)) for row in rows]
+
+
+class _StateStore:
+    """State store singleton."""
+
+    instance: Optional[StateStore] = None
+    lock = threading.Lock()
+
+
+def state_store() -> StateStore:
+    """State store singleton."""
+    with _StateStore.lock:
+        if _StateStore.instance is None:
+            _StateStore.instance = StateStore(STATE_DB)
+        return _StateStore.instance
@@ -1,15 +1,16 @@
 # -*- coding: utf-8 -*-
 """List of tasks."""
-
+import statistics
+from collections import OrderedDict
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Any, Dict, List, Optional
 
-from luft.common.config import TASK_TYPE_MAPPER
+from luft.common.catalog import parse_yml, yaml_catalog
+from luft.common.config import TASK_TYPE_MAPPER, THREAD_NAME_PREFIX
 from luft.common.logger import setup_logger
+from luft.common.state import state_store
 from luft.common.utils import class_for_name
 
-from ruamel import yaml
-
 TaskListType = List[Dict[str, str]]
 
 # Setup logger
@@ -52,10 +53,7 @@ class TaskList:
 
         """
         task_list_def: List[Dict[str, str]] = []
-        try:
-            task = yaml.load(yml_str, Loader=yaml.Loader)
-        except yaml.YAMLError:
-            raise
+        task = parse_yml(yml_str)
         task_list_def.append(task)
         self._process_tasks(task_list_def, whitelist, blacklist, task_type, source_system,
                             source_subsystem, thread_cnt, color)
@@ -88,31 +86,49 @@ class TaskList:
 
         """
         task_list_def: List[Dict[str, str]] = []
-        try:
-            if yml_path.is_dir():  # yaml var is a directory
-                glob_filter = '**/*.yml' if not glob_filter else glob_filter
-                yml_files = sorted(
-                    list(yml_path.glob(glob_filter)), reverse=True)
-                for yml_file in yml_files:
-                    task = yaml.load(yml_file.read_text(), Loader=yaml.Loader)
-                    self._add_yaml_file_loc(task, yml_file)
-                    task_list_def.append(task)
-            elif yml_path.is_file():  # yaml var is a file
-                task = yaml.load(yml_path.read_text(), Loader=yaml.Loader)
-                if isinstance(task, list):  # if yaml contains multiple definitions
-                    self._separate_tasks(task, yml_path, task_list_def)
-                else:
-                    self._add_yaml_file_loc(task, yml_path)
-                    task_list_def.append(task)
+        catalog = yaml_catalog()
+        if yml_path.is_dir():  # yaml var is a directory
+            yml_files = self.get_yml_files(yml_path, glob_filter)
+            catalog.refresh(yml_files)  # parse changed files at once, possibly in parallel
+            for yml_file in yml_files:
+                # names are indexed in catalog, files without whitelisted task are not loaded
+                if whitelist and not catalog.get_names(yml_file).intersection(whitelist):
+                    continue
+                task = catalog.load(yml_file)
+                self._add_yaml_file_loc(task, yml_file)
+                task_list_def.append(task)
+        elif yml_path.is_file():  # yaml var is a file
+            task = catalog.load(yml_path)
+            if isinstance(task, list):  # if yaml contains multiple definitions
+                self._separate_tasks(task, yml_path, task_list_def)
             else:
-                raise TypeError(
-                    'Unknown format of yaml or non-existent folder.')
-        except yaml.YAMLError:
-            raise
+                self._add_yaml_file_loc(task, yml_path)
+                task_list_def.append(task)
+        else:
+            raise TypeError(
+                'Unknown format of yaml or non-existent folder.')
+        catalog.save()
         self._process_tasks(task_list_def, whitelist, blacklist, task_type, source_system,
                             source_subsystem, thread_cnt, color)
         return self.task_list
 
+    @staticmethod
+    def get_yml_files(yml_path: Path, glob_filter: str = None) -> List[Path]:
+        """Get yml files of folder in order they are loaded.
+
+        Parameters:
+            yml_path (Path): folder with yml files or yml file.
+            glob_filter (str): pathname pattern for yml files. See glob library.
+
+        Returns:
+            List[Path]: list of yml files.
+
+        """
+        if not yml_path.is_dir():
+            return [yml_path]
+        glob_filter = '**/*.yml' if not glob_filter else glob_filter
+        return sorted(list(yml_path.glob(glob_filter)), reverse=True)
+
     def _process_tasks(self, task_list_def: TaskListType, whitelist: Optional[List[str]],
                        blacklist: Optional[List[str]], task_type: Optional[str],
                        source_system: Optional[str], source_subsystem: Optional[str],
@@ -121,12 +137,20 @@ class TaskList:
         task_list_def = self._filter_task_list(
             task_list_def, whitelist, blacklist)
         self._add_task_id(task_list_def)  # add unique id to every task
+        # Remember which tasks have thread from yaml file before schema generates the rest
+        explicit_threads = [bool(task.get('thread_name')) for task in task_list_def]
+        timeouts = [task.get('timeout') for task in task_list_def]
         # Get schema class
         schema_class = class_for_name(TASK_TYPE_MAPPER.get(task_type))
         context = self._get_context(
             task_type, source_system, source_subsystem, thread_cnt, color)
         self.task_list = schema_class(
             many=True, context=context).load(task_list_def)
+        for task, timeout in zip(self.task_list, timeouts):
+            if timeout:  # not a constructor argument, default is `[core] task_timeout`
+                task.set_timeout(float(timeout))
+        if thread_cnt and int(thread_cnt) > 1:
+            self._balance_threads(self.task_list, explicit_threads, int(thread_cnt))
 
     def _separate_tasks(self, tasks: TaskListType, yml_path: Path, task_list_def: TaskListType):
         """If one yaml file contains multiple objects/tasks, separate them."""
@@ -135,6 +159,39 @@ class TaskList:
             self._add_yaml_file_loc(task, yml_path)
             task_list_def.append(task)
 
+    @staticmethod
+    def _balance_threads(task_list: List[Any], explicit_threads: List[bool], thread_cnt: int):
+        """Assign tasks to threads by their historical durations.
+
+        Longest processing time first - the longest task goes to the least loaded thread.
+        Tasks with thread_name from yaml file keep it (and add their duration to load of that
+        thread). Tasks without history count as median duration. If there is no history at all,
+        threads assigned by schema (`ID mod thread_count`) are kept.
+
+        Durations are read from run ledger of state database on host loading the task list, so
+        balancing works only with `[state] run_ledger` enabled (default is disabled). Airflow
+        parses DAGs on scheduler, where tasks do not run, so there lanes stay assigned by schema
+        unless `[state] state_db` points to database shared with hosts running the tasks.
+
+        """
+        durations = state_store().get_durations(task.get_task_id() for task in task_list)
+        if not durations:
+            return
+        default_duration = statistics.median(durations.values())
+        loads = OrderedDict((THREAD_NAME_PREFIX + str(i), 0.0) for i in range(thread_cnt))
+        free_tasks = []
+        for task, explicit in zip(task_list, explicit_threads):
+            duration = durations.get(task.get_task_id(), default_duration)
+            if not explicit:
+                free_tasks.append((duration, task))
+            elif task.get_thread_name() in loads:
+                loads[task.get_thread_name()] += duration
+        for duration, task in sorted(free_tasks, key=lambda item: -item[0]):
+            thread_name = min(loads, key=loads.get)
+            task.set_thread_name(thread_name)
+            loads[thread_name] += duration
+        logger.debug('Thread loads: %s', dict(loads))
+
     @staticmethod
     def _add_task_id(task_list: TaskListType):
         """Add unique task_id to every task."""
@@ -3,16 +3,14 @@
 from datetime import datetime
 import importlib
 import os
+import stat
+import threading
 from configparser import ConfigParser
 from pathlib import Path
-from typing import Any, Optional, Union
-
-import dateutil.parser
+from typing import Any, Dict, Optional, Tuple, Union
 
 from luft.common.logger import setup_logger
 
-import pendulum
-
 
 # Setup logger
 logger = setup_logger('util', 'INFO')
@@ -32,6 +30,8 @@ def class_for_name(path: str) -> Any:
 
 def ts_to_tz(ts: str) -> datetime:
     """Convert timestamp to timezone aware timestamp."""
+    import dateutil.parser
+    import pendulum
     local_tz = pendulum.timezone(os.getenv('DEFAULT_TIMEZONE', 'UTC'))
     tz = dateutil.parser.parse(ts)
     ts_loc = local_tz.convert(tz)
@@ -72,22 +72,27 @@ def get_source_subsystem(path: str = None, source_subsystem: str = None) -> Opti
 
 
 def _get_path_part(path: str, part: str) -> Optional[str]:
-    """Get source_system, source_subsystem and object_name from path."""
+    """Get source_system, source_subsystem and object_name from path.
+
+    Path is checked by one `stat` call and never cached, so long running worker notices added
+    and removed task folders.
+
+    """
     part_mapper = {
         'source_system': -3,
         'source_subsystem': -2,
         'object_name': -1
     }
     path_object = Path(path)
-    if path_object.exists():
-        position = part_mapper[part] + \
-            1 if path_object.is_dir() else part_mapper[part]
-        result = path_object.parts[position]
-        logger.debug('Setting %s: %s', part, result)
-        return result
-    else:
+    try:
+        is_dir = stat.S_ISDIR(path_object.stat().st_mode)
+    except OSError:
         logger.info('Path %s you provided does not exists', path)
         return None
+    position = part_mapper[part] + 1 if is_dir else part_mapper[part]
+    result = path_object.parts[position]
+    logger.debug('Setting %s: %s', part, result)
+    return result
 
 
 def read_config(config_file: str) -> ConfigParser:
@@ -99,3 +104,31 @@ def read_config(config_file: str) -> ConfigParser:
     else:
         raise FileNotFoundError(
             'Config file `%s` does not exists.' % config_file)
+
+
+_config_cache: Dict[str, Tuple[Tuple[int, int], ConfigParser]] = {}
+_config_lock = threading.Lock()
+
+
+def get_file_signature(path: Union[str, Path]) -> Tuple[int, int]:
+    """Return modification time (ns) and size of file. Used for detecting changes of file."""
+    st = os.stat(str(path))
+    return st.st_mtime_ns, st.st_size
+
+
+def read_config_cached(config_file: str) -> ConfigParser:
+    """Read configuration, parse it again only when file changes.
+
+    Returned config is shared, it must not be modified.
+
+    """
+    if not Path(config_file).exists():
+        raise FileNotFoundError(
+            'Config file `%s` does not exists.' % config_file)
+    signature = get_file_signature(config_file)
+    with _config_lock:
+        cached = _config_cache.get(config_file)
+        if cached is None or cached[0] != signature:
+            cached = (signature, read_config(config_file))
+            _config_cache[config_file] = cached
+        return cached[1]
@@ -1,10 +1,11 @@
 # -*- coding: utf-8 -*-
 """BigQuery Load Task Schema."""
+from luft.common.constants import OUTPUT_FORMATS
 from luft.schemas.column_schema import ColumnSchema
 from luft.schemas.generic_task_schema import GenericTaskSchema
 from luft.tasks.bq_load_task import BQLoadTask
 
-from marshmallow import fields, post_load
+from marshmallow import ValidationError, fields, post_load, validates
 
 
 class BQLoadTaskSchema(GenericTaskSchema):
@@ -20,6 +21,14 @@ class BQLoadTaskSchema(GenericTaskSchema):
     field_delimiter = fields.Str(missing='\t')
     disable_check = fields.Boolean(missing=False)
     path_prefix = fields.Str()
+    output_format = fields.Str(missing='csv')
+
+    @validates('output_format')
+    def _validates_output_format(self, data):
+        """Check that output format is known."""
+        if data not in OUTPUT_FORMATS:
+            raise ValidationError(f'Output format {data} is not supported. '
+                                  f'Use one of {", ".join(OUTPUT_FORMATS)}.')
 
     @post_load
     def make_task(self, data, **kwargs):
@@ -35,6 +44,7 @@ class BQLoadTaskSchema(GenericTaskSchema):
                           disable_check=data.get('disable_check'),
                           field_delimiter=data.get('field_delimiter'),
                           path_prefix=data.get('path_prefix'),
+                          output_format=data.get('output_format'),
                           yaml_file=data.get('yaml_file'), env=data.get('env'),
                           thread_name=data.get('thread_name'), color=data.get('color')
                           )
@@ -1,10 +1,12 @@
 # -*- coding: utf-8 -*-
 """Embulk JDBC Task Schema."""
+from luft.common.constants import OUTPUT_FORMATS
+from luft.common.jdbc_utils import MINMAX_PARTITION_TYPES, PARTITION_METHODS
 from luft.schemas.column_schema import ColumnSchema
 from luft.schemas.generic_task_schema import GenericTaskSchema
 from luft.tasks.embulk_jdbc_task import EmbulkJdbcTask
 
-from marshmallow import fields, post_load
+from marshmallow import ValidationError, fields, post_load, validates, validates_schema
 
 
 class EmbulkJdbcTaskSchema(GenericTaskSchema):
@@ -17,6 +19,46 @@ class EmbulkJdbcTaskSchema(GenericTaskSchema):
     source_table = fields.Str()
     where_clause = fields.Str()
     path_prefix = fields.Str()
+    partition_column = fields.Str()
+    partitions = fields.Int()
+    partition_method = fields.Str(missing='minmax')
+    incremental_column = fields.Str()
+    output_format = fields.Str(missing='csv')
+    output_tasks = fields.Int()
+    output_file_size = fields.Int()
+    max_threads = fields.Int()
+
+    @validates('output_format')
+    def _validates_output_format(self, data):
+        """Check that output format is known."""
+        if data not in OUTPUT_FORMATS:
+            raise ValidationError(f'Output format {data} is not supported. '
+                                  f'Use one of {", ".join(OUTPUT_FORMATS)}.')
+
+    @validates('partition_method')
+    def _validates_partition_method(self, data):
+        """Check that partition method is known."""
+        if data not in PARTITION_METHODS:
+            raise ValidationError(f'Partition method {data} is not supported. '
+                                  f'Use one of {", ".join(PARTITION_METHODS)}.')
+
+    @validates_schema
+    def _validates_partition_column(self, data, **kwargs):
+        """Check that partition column is one of columns and its values can be split."""
+        partition_column = data.get('partition_column')
+        if not partition_column:
+            return
+        data_types = {col.name.lower(): col.data_type.split('(')[0].lower()
+                      for col in data.get('columns') or []}
+        data_type = data_types.get(partition_column.lower())
+        if data_type is None:
+            raise ValidationError(f'Partition column {partition_column} is not one of columns.',
+                                  'partition_column')
+        minmax = data.get('partition_method', 'minmax') == 'minmax'
+        if minmax and data_type not in MINMAX_PARTITION_TYPES:
+            raise ValidationError(f'Partition column {partition_column} of type {data_type} '
+                                  'cannot be split by minmax method. Use numeric or date column '
+                                  'or `partition_method: quantile`.', 'partition_column')
 
     @post_load
     def _make_task(self, data, **kwargs):
@@ -30,6 +72,14 @@ class EmbulkJdbcTaskSchema(GenericTaskSchema):
                               where_clause=data.get('where_clause'),
                               embulk_template=data.get('embulk_template'),
                               path_prefix=data.get('path_prefix'),
+                              partition_column=data.get('partition_column'),
+                              partitions=data.get('partitions'),
+                              partition_method=data.get('partition_method'),
+                              incremental_column=data.get('incremental_column'),
+                              output_format=data.get('output_format'),
+                              output_tasks=data.get('output_tasks'),
+                              output_file_size=data.get('output_file_size'),
+                              max_threads=data.get('max_threads'),
                               yaml_file=data.get('yaml_file'),
                               env=data.get('env'), thread_name=data.get('thread_name'),
                               color=data.get('color'))
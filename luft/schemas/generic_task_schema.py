@@ -25,6 +25,7 @@ class GenericTaskSchema(Schema):
     env = fields.Str()
     thread_name = fields.Str()
     color = fields.Str()
+    timeout = fields.Float()
 
     @pre_load
     def _prepare_task(self, data, **kwargs):
@@ -61,3 +62,9 @@ class GenericTaskSchema(Schema):
         if not TASK_TYPE_MAPPER.get(data):
             raise ValidationError(
                 f'Type of task {data} is not supported. Please change it!')
+
+    @validates('timeout')
+    def _validates_timeout(self, data):
+        """Check that timeout is positive."""
+        if data <= 0:
+            raise ValidationError('Timeout must be positive number of seconds.')
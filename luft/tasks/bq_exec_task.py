@@ -1,23 +1,28 @@
 # -*- coding: utf-8 -*-
 """BigQuery exec Task."""
+import asyncio
 from pathlib import Path
-from typing import Dict, List, Union
-
-from google.cloud import bigquery
-from google.cloud.exceptions import NotFound
-from google.oauth2.service_account import Credentials
+from typing import Any, Dict, List, Optional, TYPE_CHECKING, Union
 
 from jinja2 import Template
 
-from luft.common.config import BQ_CREDENTIALS_FILE, BQ_JOB_ID_PREFIX, BQ_LOCATION, BQ_PROJECT_ID
-from luft.common.logger import setup_logger
+from luft.common.bq_utils import create_dataset, dataset_exists, get_bq_client
+from luft.common.config import (BQ_CREDENTIALS_FILE, BQ_JOB_ID_PREFIX, BQ_LOCATION,
+                                BQ_POLL_INTERVAL, BQ_PROJECT_ID, LOG_QUERIES)
+from luft.common.logger import setup_logger, summarize_query
 from luft.common.utils import NoneStr
-from luft.tasks.generic_task import GenericTask
+from luft.tasks.generic_task import GenericTask, run_coroutine, run_in_executor
+
+if TYPE_CHECKING:  # pragma: no cover
+    from google.cloud import bigquery
 
 # Setup logger
 logger = setup_logger('common', 'INFO')
 NoneDict = Union[Dict[str, str], None]
 
+# Seconds before the first check of state of BigQuery job, see `[bq] poll_interval`
+FIRST_POLL_INTERVAL = 0.05
+
 
 class BQExecTask(GenericTask):
     """BQ exec Task."""
@@ -44,7 +49,7 @@ class BQExecTask(GenericTask):
         self.sql_files = sql_files or ['']
         self.bq_project_id = self._get_project_id(project_id)
         self.bq_location = self._get_location(location)
-        self.bq_client = self._init_bq_client()  # Initialize BQ client
+        self._bq_client: Optional['bigquery.Client'] = None  # Created on first use
         super().__init__(name=name, task_type=task_type,
                          source_system=source_system,
                          source_subsystem=source_subsystem,
@@ -57,9 +62,22 @@ class BQExecTask(GenericTask):
         Attributes:
             ts (str): time of valid.
 
+        """
+        return run_coroutine(self.run(ts, env))
+
+    async def run(self, ts: str, env: NoneStr = None):
+        """Run queries in event loop.
+
+        Jobs are polled by the loop, so cancellation of the task (e.g. timeout) cancels running
+        job and no other query is started.
+
         """
         env_vars = self.get_env_vars(ts, env)
-        self._run_bq_command(self.sql_folder, self.sql_files, env_vars)
+        try:
+            with self.span('queries'):
+                await self._run_bq_command_async(self.sql_folder, self.sql_files, env_vars)
+        finally:
+            self.release_bq_client()
 
     def get_env_vars(self, ts: str, env: NoneStr = None) -> Dict[str, str]:
         """Get Docker enviromental variables."""
@@ -72,10 +90,21 @@ class BQExecTask(GenericTask):
         clean_dict.update(super_env_dict)
         return clean_dict
 
-    def get_bq_client(self) -> bigquery.Client:
+    @property
+    def bq_client(self) -> 'bigquery.Client':
+        """Return BigQuery client. It is created on first use, not when task list is loaded."""
+        if self._bq_client is None:
+            self._bq_client = self._init_bq_client()
+        return self._bq_client
+
+    def get_bq_client(self) -> 'bigquery.Client':
         """Return BigQuery client."""
         return self.bq_client
 
+    def release_bq_client(self):
+        """Release BigQuery client after run. Shared client itself stays open in pool."""
+        self._bq_client = None
+
     def _prepare_scripts(self, sql_folder: str, sql_files: List[str]):
         scripts = []
         if len(sql_files) > 0:
@@ -83,10 +112,9 @@ class BQExecTask(GenericTask):
                 scripts.append(Path(sql_folder) / script)
             return scripts
 
-    def _init_bq_client(self) -> bigquery.Client:
-        """Init BigQuery client."""
-        bq_cred = Credentials.from_service_account_file(BQ_CREDENTIALS_FILE)
-        return bigquery.Client(project=self.bq_project_id, credentials=bq_cred)
+    def _init_bq_client(self) -> 'bigquery.Client':
+        """Get BigQuery client shared by all tasks with the same project and location."""
+        return get_bq_client(self.bq_project_id, self.bq_location, BQ_CREDENTIALS_FILE)
 
     def _get_project_id(self, project_id: NoneStr = None):
         """Get BigQuery project id."""
@@ -125,12 +153,10 @@ class BQExecTask(GenericTask):
             dataset_id (str): identifier of dataset.
 
         """
-        if not self._dataset_exists(dataset_id):
-            dataset_id = f'{self.bq_client.project}.{dataset_id}'
-            dataset = bigquery.Dataset(dataset_id)
-            dataset.location = self.bq_location
-            dataset = self.bq_client.create_dataset(dataset)
-            logger.info(f'Dataset {dataset_id} has been created.')
+        if create_dataset(self.bq_client, dataset_id, self.bq_location):
+            logger.info(f'Dataset {self.bq_client.project}.{dataset_id} has been created.')
+        else:
+            logger.info(f'Dataset {dataset_id} already exists.')
 
     def _dataset_exists(self, dataset_id: str) -> bool:
         """Check if dataset exits.
@@ -139,32 +165,64 @@ class BQExecTask(GenericTask):
             dataset_id (str): identifier of dataset.
 
         """
-        try:
-            self.bq_client.get_dataset(dataset_id)
+        if dataset_exists(self.bq_client, dataset_id):
             logger.info(f'Dataset {dataset_id} already exists.')
             return True
-        except NotFound:
-            logger.info(f'Dataset {dataset_id} does not exist.')
-            return False
+        logger.info(f'Dataset {dataset_id} does not exist.')
+        return False
+
+    async def _wait_for_job(self, job: Any) -> Any:
+        """Wait for BigQuery job and return its result.
+
+        State of job is checked in executor of the loop with growing interval (up to
+        `[bq] poll_interval`). When the coroutine is cancelled, the job is cancelled too.
+
+        Raises:
+            Exception: error of failed job.
+
+        """
+        interval = FIRST_POLL_INTERVAL
+        try:
+            while not await run_in_executor(None, job.done):  # API request - reloads the job
+                await asyncio.sleep(interval)
+                interval = min(interval * 2, BQ_POLL_INTERVAL)
+        except asyncio.CancelledError:
+            logger.warning(f'Cancelling BigQuery job {job.job_id}.')
+            try:
+                job.cancel()
+            except Exception as e:  # job keeps running, but the task is cancelled anyway
+                logger.error(f'BigQuery job {job.job_id} cannot be cancelled: {e!r}')
+            raise
+        return await run_in_executor(None, job.result)
 
     def _run_bq_command(self, sql_folder: str, sql_files: List[str],
                         env_vars: NoneDict = None):
-        """Run BigQuery command."""
+        """Run BigQuery command. Must not be called from running event loop."""
+        run_coroutine(self._run_bq_command_async(sql_folder, sql_files, env_vars))
+
+    async def _run_bq_command_async(self, sql_folder: str, sql_files: List[str],
+                                    env_vars: NoneDict = None):
+        """Run queries of sql files one after another."""
         queries = self._get_sql_commands(sql_folder, sql_files, env_vars)
         for query in queries:
-            query_job = self.bq_client.query(
-                query,
-                job_id_prefix=BQ_JOB_ID_PREFIX,
-                project=self.bq_project_id,
-                location=self.bq_location
-            )  # API request - starts the query
+            query_job = await run_in_executor(
+                None, lambda: self.bq_client.query(
+                    query,
+                    job_id_prefix=BQ_JOB_ID_PREFIX,
+                    project=self.bq_project_id,
+                    location=self.bq_location
+                ))  # API request - starts the query
             start_msg = f'Starting job {query_job.job_id}'
             logger.info('#' * len(start_msg))
             logger.info(start_msg)
             logger.info('-' * len(start_msg))
-            for line in query_job.query.split('\n'):
-                logger.info(line)
-            query_job.result()
+            if LOG_QUERIES == 'full':
+                for line in query_job.query.split('\n'):
+                    logger.info(line)
+            else:
+                logger.info(summarize_query(query_job.query))
+            await self._wait_for_job(query_job)
+            self.record_bq_bytes(query_job.total_bytes_processed or 0)
             duration = query_job.ended - query_job.started
             end_msg = (f'Job {query_job.job_id} finished.')
             logger.info('-' * len(start_msg))
@@ -3,17 +3,14 @@
 from pathlib import Path
 from typing import Dict, List
 
-from google.cloud import bigquery
-
-from luft.common.column import Column
+from luft.common.column import Column, ColumnSet
 from luft.common.config import (
     BQ_DATA_TYPES, BQ_HIST_DEFAULT_TEMPLATE, BQ_STAGE_DEFAULT_TEMPLATE,
     BQ_STAGE_SCHEMA_FORM, GCS_BUCKET, PATH_PREFIX)
 from luft.common.logger import setup_logger
 from luft.common.utils import NoneStr, get_path_prefix
 from luft.tasks.bq_exec_task import BQExecTask
-
-import pkg_resources
+from luft.tasks.generic_task import run_coroutine, run_in_executor
 
 # Setup logger
 logger = setup_logger('common', 'INFO')
@@ -27,7 +24,7 @@ class BQLoadTask(BQExecTask):
                  dataset_id: NoneStr = None, skip_leading_rows: bool = True,
                  allow_quoted_newlines: bool = True, disable_check: bool = False,
                  field_delimiter: str = '\t', path_prefix: NoneStr = None,
-                 yaml_file: NoneStr = None, env: NoneStr = None,
+                 output_format: str = 'csv', yaml_file: NoneStr = None, env: NoneStr = None,
                  thread_name: NoneStr = None, color: NoneStr = None):
         """Initialize BigQuery Load Task.
 
@@ -41,14 +38,17 @@ class BQLoadTask(BQExecTask):
             env (str): environment - PROD, DEV.
             thread_name(str): name of thread for Airflow parallelization.
             color (str): hex code of color. Airflow operator will have this color.
+            output_format (str): format of files on blob storage - csv, parquet or avro.
 
         """
         self.columns = columns
+        self.column_set = ColumnSet(columns)  # column fragments are built once per task
         self.path_prefix = path_prefix or PATH_PREFIX
         self.skip_leading_rows = skip_leading_rows
         self.allow_quoted_newlines = allow_quoted_newlines
         self.field_delimiter = field_delimiter
         self.disable_check = disable_check
+        self.output_format = (output_format or 'csv').lower()
         self.dataset_id = dataset_id or source_system
         self.stage_dataset_id = BQ_STAGE_SCHEMA_FORM.format(
             env=self.get_env,
@@ -71,18 +71,36 @@ class BQLoadTask(BQExecTask):
             ts (str): time of valid.
 
         """
+        return run_coroutine(self.run(ts, env))
+
+    async def run(self, ts: str, env: NoneStr = None):
+        """Load stage table and historize it in event loop.
+
+        Load and query jobs are polled by the loop, so cancellation of the task (e.g. timeout)
+        cancels running job and no other step is started.
+
+        """
+        import pkg_resources
         stage_template = Path(pkg_resources.resource_filename(
             'luft', BQ_STAGE_DEFAULT_TEMPLATE))
         hist_template = Path(pkg_resources.resource_filename(
             'luft', BQ_HIST_DEFAULT_TEMPLATE))
         env_vars = self.get_env_vars(ts, env)
-        self._create_dataset(self.stage_dataset_id)
-        self._run_bq_command(stage_template.parent, [stage_template.name],
-                             env_vars)
-        self.load_csv()
-        self._create_dataset(self.dataset_id)
-        self._run_bq_command(hist_template.parent, [hist_template.name],
-                             env_vars)
+        try:
+            with self.span('stage_dataset'):
+                await run_in_executor(None, self._create_dataset, self.stage_dataset_id)
+            with self.span('stage_table'):
+                await self._run_bq_command_async(stage_template.parent, [stage_template.name],
+                                                 env_vars)
+            with self.span('load'):
+                await self._load_data_async()
+            with self.span('dataset'):
+                await run_in_executor(None, self._create_dataset, self.dataset_id)
+            with self.span('history'):
+                await self._run_bq_command_async(hist_template.parent, [hist_template.name],
+                                                 env_vars)
+        finally:
+            self.release_bq_client()
 
     def get_env_vars(self, ts: str, env: NoneStr = None) -> Dict[str, str]:
         """Get Docker enviromental variables."""
@@ -95,6 +113,10 @@ class BQLoadTask(BQExecTask):
             'PK_DEFINITION_LIST': self._get_col_defs('pk'),
             'COLUMNS': self._get_col_names('nonpk'),
             'COLUMN_DEFINITION_LIST': self._get_col_defs('nonpk'),
+            'STAGE_PK': self._get_stage_values('pk'),
+            'STAGE_PK_DEFINITION_LIST': self._get_stage_col_defs('pk'),
+            'STAGE_COLUMNS': self._get_stage_values('nonpk'),
+            'STAGE_COLUMN_DEFINITION_LIST': self._get_stage_col_defs('nonpk'),
             'HASH_COLUMNS': self._get_hash_diff(),
             'PK_JOIN': self._get_pk_join()
         }
@@ -113,9 +135,7 @@ class BQLoadTask(BQExecTask):
                     - nonpk - only nonprimary keys are returned.
 
         """
-        cols = [col.get_name(col_type, include_tech=False) for col in self.columns
-                if col.get_name(col_type, include_tech=False)]
-        return ',\n'.join(cols)
+        return ',\n'.join(self.column_set.get_names(col_type, include_tech=False))
 
     def _get_col_defs(self, col_type: str) -> str:
         """Get list of column definition.
@@ -128,10 +148,32 @@ class BQLoadTask(BQExecTask):
                     - nonpk - only nonprimary keys are returned.
 
         """
-        cols = [col.get_def(col_type, include_tech=False, supported_types=BQ_DATA_TYPES)
-                for col in self.columns if col.get_def(col_type, include_tech=False,
-                                                       supported_types=BQ_DATA_TYPES)]
-        return ',\n    '.join(cols)
+        col_defs = self.column_set.get_defs(col_type, include_tech=False,
+                                            supported_types=BQ_DATA_TYPES)
+        return ',\n    '.join(col_defs)
+
+    def _get_stage_col_defs(self, col_type: str) -> str:
+        """Get list of column definitions of stage table.
+
+        Columns of stage table loaded from Parquet or Avro have type of values Embulk writes (e.g.
+        date formatted as string), csv is parsed by BigQuery into column types.
+
+        """
+        if self.output_format == 'csv':
+            return self._get_col_defs(col_type)
+        schema = self.column_set.get_bq_schema(col_type, include_tech=False,
+                                               supported_types=BQ_DATA_TYPES)
+        col_defs = (f'{name} {field_type}{" NOT NULL" if mode == "REQUIRED" else ""}'
+                    for name, field_type, mode in schema)
+        return ',\n    '.join(col_defs)
+
+    def _get_stage_values(self, col_type: str) -> str:
+        """Get list of stage table values cast to column types. See `_get_stage_col_defs`."""
+        if self.output_format == 'csv':
+            return self._get_col_names(col_type)
+        values = self.column_set.get_stage_values(col_type, include_tech=False,
+                                                  supported_types=BQ_DATA_TYPES)
+        return ',\n'.join(values)
 
     def _get_pk_join(self) -> str:
         """Get PK join.
@@ -144,9 +186,7 @@ class BQLoadTask(BQExecTask):
                     - nonpk - only nonprimary keys are returned.
 
         """
-        pk_join = [col.get_join('pk', include_tech=False) for col in self.columns
-                   if col.get_join('pk', include_tech=False)]
-        return '\nAND '.join(pk_join)
+        return '\nAND '.join(self.column_set.get_joins('pk', include_tech=False))
 
     def _get_hash_diff(self) -> str:
         """Get hash diff columns.
@@ -159,20 +199,48 @@ class BQLoadTask(BQExecTask):
                     - nonpk - only nonprimary keys are returned.
 
         """
-        cols = [f'IFNULL(CAST({col.get_name("all", include_tech=False)} AS STRING), \'\')' for col
-                in self.columns if col.get_name('all', include_tech=False)]
-        return ', '.join(cols)
+        return ', '.join(self.column_set.get_hash_diff('all', include_tech=False))
 
-    def load_csv(self):
-        """Load CSV."""
+    def get_load_job_config(self):
+        """Get configuration of load job for output format of task.
+
+        Parquet and Avro files are loaded with explicit schema built from columns, so BigQuery
+        does not have to parse any values and can split files between workers.
+
+        """
+        from google.cloud import bigquery
         job_config = bigquery.LoadJobConfig()
-        job_config.skip_leading_rows = int(self.skip_leading_rows)
-        job_config.allow_quoted_newlines = self.allow_quoted_newlines
-        job_config.field_delimiter = self.field_delimiter
-        # The source format defaults to CSV, so the line below is optional.
-        job_config.source_format = bigquery.SourceFormat.CSV
-        table_ref = self.bq_client.dataset(
-            self.stage_dataset_id).table(self.get_name())
+        if self.output_format == 'csv':
+            job_config.skip_leading_rows = int(self.skip_leading_rows)
+            job_config.allow_quoted_newlines = self.allow_quoted_newlines
+            job_config.field_delimiter = self.field_delimiter
+            job_config.source_format = bigquery.SourceFormat.CSV
+            return job_config
+        if self.output_format == 'parquet':
+            job_config.source_format = bigquery.SourceFormat.PARQUET
+        elif self.output_format == 'avro':
+            job_config.source_format = bigquery.SourceFormat.AVRO
+            job_config.use_avro_logical_types = True
+        else:
+            raise ValueError(f'Output format `{self.output_format}` is not supported.')
+        job_config.schema = [
+            bigquery.SchemaField(name, field_type, mode=mode)
+            for name, field_type, mode in self.column_set.get_bq_schema(
+                include_tech=False, supported_types=BQ_DATA_TYPES)]
+        # Files contain also ignored columns that are not part of stage table
+        job_config.ignore_unknown_values = True
+        return job_config
+
+    def load_data(self):
+        """Load files from blob storage into stage table. Must not be called from running loop."""
+        run_coroutine(self._load_data_async())
+
+    async def _load_data_async(self):
+        """Load files from blob storage into stage table and wait for load job in event loop."""
+        from google.cloud import bigquery
+        job_config = self.get_load_job_config()
+        table_ref = bigquery.DatasetReference(
+            self.bq_client.project, self.stage_dataset_id).table(self.get_name())
         uri = f'gs://{GCS_BUCKET}/' + get_path_prefix(path_prefix=self.path_prefix,
                                                       env=self.get_env(),
                                                       source_system=self.get_source_system(),
@@ -181,15 +249,16 @@ class BQLoadTask(BQExecTask):
                                                       date_valid=self.get_date_valid(),
                                                       time_valid=self.get_time_valid()
                                                       ) + '*'
-        logger.info(f'Loading CSV data from `{uri}`.')
-        load_job = self.bq_client.load_table_from_uri(
+        logger.info(f'Loading {self.output_format.upper()} data from `{uri}`.')
+        load_job = await run_in_executor(None, lambda: self.bq_client.load_table_from_uri(
             uri, table_ref, job_config=job_config
-        )
+        ))
         try:
-            load_job.result()
-            stage_table = self.bq_client.get_table(table_ref)
+            await self._wait_for_job(load_job)
+            stage_table = await run_in_executor(None, self.bq_client.get_table, table_ref)
             logger.info(
                 f'Loaded {stage_table.num_rows} rows into {self.get_name()}.')
+            self.record_rows(stage_table.num_rows or 0, 'loaded')
             if self.disable_check and stage_table.num_rows == 0:
                 raise TypeError(
                     f'There is no data in {self.stage_dataset_id + "." + self.get_name()}.')
@@ -197,3 +266,11 @@ class BQLoadTask(BQExecTask):
             logger.error(e)
             logger.error(load_job.errors)
             raise
+
+    def load_csv(self):
+        """Load files from blob storage into stage table.
+
+        Kept for subclasses and callers written before other output formats, see `load_data`.
+
+        """
+        return self.load_data()
@@ -1,13 +1,19 @@
 # -*- coding: utf-8 -*-
 """Embulk JDBC Task."""
+import asyncio
 import os
-from typing import Dict, List
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
 
-from luft.common.column import Column
-from luft.common.config import (
-    EMBULK_COMMAND, EMBULK_LOG_LEVEL, JDBC_CONFIG, JDBC_DRIVER_PATH, PATH_PREFIX)
-from luft.common.utils import NoneStr, get_path_prefix, read_config, setup_logger
+from luft.common.column import Column, ColumnSet
+from luft.common.config import (EMBULK_AVRO_SCHEMA_DIR, EMBULK_BATCH_COMMAND, EMBULK_COMMAND,
+                                EMBULK_LOG_LEVEL, EMBULK_PARTITION_THREADS, EMBULK_REPORT_FILES,
+                                JDBC_CONFIG, JDBC_DRIVER_PATH, PATH_PREFIX)
+from luft.common.embulk_result import EmbulkResult
+from luft.common.utils import (NoneStr, get_file_signature, get_path_prefix, read_config_cached,
+                               setup_logger)
 from luft.tasks.generic_embulk_task import GenericEmbulkTask
+from luft.tasks.generic_task import run_coroutine, run_in_executor
 
 # Setup logger
 logger = setup_logger('common', 'INFO')
@@ -20,8 +26,12 @@ class EmbulkJdbcTask(GenericEmbulkTask):
                  columns: List[Column], fetch_rows: int = 10000,
                  source_table: NoneStr = None, where_clause: NoneStr = None,
                  embulk_template: NoneStr = None, path_prefix: NoneStr = None,
-                 yaml_file: NoneStr = None, env: NoneStr = None, thread_name: NoneStr = None,
-                 color: NoneStr = None):
+                 partition_column: NoneStr = None, partitions: Optional[int] = None,
+                 partition_method: str = 'minmax', incremental_column: NoneStr = None,
+                 output_format: str = 'csv', output_tasks: Optional[int] = None,
+                 output_file_size: Optional[int] = None, max_threads: Optional[int] = None,
+                 yaml_file: NoneStr = None,
+                 env: NoneStr = None, thread_name: NoneStr = None, color: NoneStr = None):
         """Initialize Embulk JDBC Task.
 
         Attributes:
@@ -34,32 +44,289 @@ class EmbulkJdbcTask(GenericEmbulkTask):
             env (str): environment - PROD, DEV.
             thread_name(str): name of thread for Airflow parallelization.
             color (str): hex code of color. Airflow operator will have this color.
+            partition_column (str): numeric or date column splitting extraction into ranges.
+            partitions (int): number of ranges extracted concurrently.
+            partition_method (str): `minmax` or `quantile` boundaries of ranges.
+            incremental_column (str): monotonically growing column. Only rows above high-water
+                mark of last successful run are extracted.
+            output_format (str): format of output files - csv, parquet or avro.
+            output_tasks (int): number of Embulk output tasks - number of produced files.
+            output_file_size (int): target size of produced files in MB. Number of output tasks
+                is derived from size of files produced by previous run.
+            max_threads (int): maximal number of Embulk threads.
 
         """
         self.columns = columns
+        self.column_set = ColumnSet(columns)  # column fragments are built once per task
         self.path_prefix = path_prefix
         self.embulk_template = embulk_template
         self.fetch_rows = fetch_rows
         self.source_table = source_table
         self.where_clause = where_clause
+        self.partition_column = partition_column
+        self.partitions = partitions or 1
+        self.partition_method = partition_method or 'minmax'
+        self.incremental_column = incremental_column
+        # Dates of incremental task share high-water mark, so they must run one after another
+        self.date_independent = not incremental_column
+        self.output_format = (output_format or 'csv').lower()
+        self.output_tasks = output_tasks
+        self.output_file_size = output_file_size
+        self.max_threads = max_threads
         super().__init__(name=name, task_type=task_type,
                          source_system=source_system,
                          source_subsystem=source_subsystem, yaml_file=yaml_file,
                          env=env, thread_name=thread_name, color=color)
 
-    def __call__(self, ts: str, env: NoneStr = None):
+    def __call__(self, ts: str, env: NoneStr = None) -> EmbulkResult:
         """Make class callable.
 
         Attributes:
             ts (str): time of valid.
             env (str): environment.
 
+        Partitioned tables (`partition_column`) are extracted by one Embulk run per partition,
+        concurrently. Incremental tables (`incremental_column`) extract only rows added since
+        last successful run.
+
+        Returns:
+            EmbulkResult: rows read and written, bytes and elapsed time of run.
+
+        """
+        return run_coroutine(self.run(ts, env))
+
+    async def run(self, ts: str, env: NoneStr = None) -> EmbulkResult:
+        """Extract table in event loop.
+
+        Planning queries and state database block, so they run in executor of the loop. Embulk
+        runs of all partitions are awaited concurrently and cancellation of the task terminates
+        them (their process groups or batch runners).
+
+        """
+        with self.span('plan'):
+            env_vars, partition_env_vars, watermark = await run_in_executor(
+                None, self._plan_run, ts, env)
+        with self.span('extract'):
+            result = await self._run_partitions(env_vars, partition_env_vars)
+        with self.span('finish'):
+            await run_in_executor(None, self._finish_run, env_vars, watermark, result)
+        self.record_rows(result.rows_read, 'read')
+        self.record_rows(result.rows_written, 'written')
+        self.record_bytes(result.bytes)
+        logger.info(f'{self.get_name()} finished: {result.rows_read} rows read in '
+                    f'{result.elapsed:.1f} s ({result.rows_per_sec:.0f} rows/s).')
+        return result
+
+    async def _run_partitions(self, env_vars: Dict[str, str],
+                              partition_env_vars: List[Dict[str, str]]) -> EmbulkResult:
+        """Run Embulk for every partition concurrently and merge their results."""
+        if len(partition_env_vars) == 1:
+            return await self._run_embulk(self.get_name(), env_vars)
+        semaphore = asyncio.Semaphore(EMBULK_PARTITION_THREADS)
+
+        async def _run_partition(job_id, part_env_vars):
+            async with semaphore:
+                return await self._run_embulk(job_id, part_env_vars)
+
+        # Wait for all partitions, so no Embulk is left running when one of them fails
+        results = await asyncio.gather(
+            *[_run_partition(f'{self.get_name()}_p{i:03d}', part_env_vars)
+              for i, part_env_vars in enumerate(partition_env_vars)],
+            return_exceptions=True)
+        errors = [result for result in results if isinstance(result, BaseException)]
+        if errors:
+            raise errors[0]
+        return EmbulkResult.merge(self.get_name(), results)
+
+    def _plan_run(self, ts: str,
+                  env: NoneStr) -> Tuple[Dict[str, str], List[Dict[str, str]], NoneStr]:
+        """Get enviromental variables of run and its partitions and new high-water mark."""
+        env_vars = self.get_env_vars(ts, env)
+        watermark: NoneStr = None
+        if self.incremental_column:
+            predicate, watermark = self._get_incremental_predicate(env_vars.get('WHERE_CLAUSE'))
+            env_vars['WHERE_CLAUSE'] = self._and_where(env_vars.get('WHERE_CLAUSE'), predicate)
+        return env_vars, self.get_partition_env_vars(env_vars), watermark
+
+    def _finish_run(self, env_vars: Dict[str, str], watermark: NoneStr, result: EmbulkResult):
+        """Store high-water mark and report produced files of successful run."""
+        if watermark is not None:
+            from luft.common.state import state_store
+            state_store().set_watermark(self.get_task_id(), watermark)
+            logger.info(f'High-water mark of {self.get_task_id()} advanced to {watermark}.')
+        if self.output_file_size or EMBULK_REPORT_FILES:
+            report = self.report_files(env_vars['PATH_PREFIX'])
+            if report:  # listed files are more reliable than bytes logged by output plugin
+                result.bytes = report['bytes']
+
+    def report_files(self, path_prefix: str) -> Optional[Dict[str, int]]:
+        """Log files produced by run and store their number and size in state database.
+
+        Listing errors are only logged, they do not fail the task.
+
+        Returns:
+            Dict[str, int]: number of `files`, total `bytes`, `min_bytes` and `max_bytes`.
+
+        """
+        from luft.common.blob_utils import list_blob_files
+        from luft.common.state import state_store
+        try:
+            files = list_blob_files(path_prefix)
+        except Exception as e:
+            logger.warning(f'Files with prefix {path_prefix} cannot be listed: {e!r}')
+            return None
+        sizes = [size for _, size in files]
+        report = {'files': len(files), 'bytes': sum(sizes),
+                  'min_bytes': min(sizes, default=0), 'max_bytes': max(sizes, default=0)}
+        for uri, size in files:
+            logger.info(f'Produced file {uri} ({size} B).')
+        logger.info(f'{self.get_name()} produced {report["files"]} files, {report["bytes"]} B '
+                    f'(smallest {report["min_bytes"]} B, largest {report["max_bytes"]} B).')
+        state_store().record_output(self.get_task_id(), self.get_date_valid(), report['files'],
+                                    report['bytes'])
+        return report
+
+    def get_output_tasks(self) -> Optional[int]:
+        """Get number of Embulk output tasks.
+
+        Explicit `output_tasks` or size of previous run divided by `output_file_size`. None
+        when it is not known - Embulk default is used. Every output task writes its own file and
+        output plugins cannot rotate files by size, so `exec.min_output_tasks` is the only thing
+        controlling number (and so size) of produced files.
+
         """
+        if self.output_tasks:
+            return self.output_tasks
+        if self.output_file_size:
+            from luft.common.state import state_store
+            last_size = state_store().get_last_output_size(self.get_task_id())
+            if last_size:
+                target_size = self.output_file_size * 1024 * 1024
+                return max(1, -(-last_size // target_size))
+        return None
+
+    def _get_exec_options(self, output_tasks: Optional[int]) -> NoneStr:
+        """Get Embulk exec section."""
+        options = []
+        if self.max_threads:
+            options.append(f'max_threads: {self.max_threads}')
+        if output_tasks:
+            options.append(f'min_output_tasks: {output_tasks}')
+        return 'exec: {{{}}}'.format(', '.join(options)) if options else None
+
+    async def _run_embulk(self, job_id: str, env_vars: Dict[str, str]) -> EmbulkResult:
+        """Run Embulk with given enviromental variables.
+
+        With `[embulk] batch_command` set config is rendered by Luft and run by Embulk batch
+        runner of Embulk thread pool instead of starting new Embulk.
+
+        Returns:
+            EmbulkResult: counters parsed from Embulk log.
+
+        """
+        result = EmbulkResult(job_id)
+        if EMBULK_BATCH_COMMAND:
+            await self._run_embulk_batch(job_id, env_vars, result)
+            return result.finish()
         cmd = self.get_command()
         args = self.get_command_args()
-        env_vars = self.get_env_vars(ts, env)
         logger.info(f'Embulk cmd: {cmd}')
-        self._run_subprocess(cmd, args, env_vars)
+        await self._run_subprocess_async(cmd, args, env_vars, line_callback=result.feed,
+                                         log_source=job_id)
+        return result.finish()
+
+    async def _run_embulk_batch(self, job_id: str, env_vars: Dict[str, str],
+                                result: EmbulkResult):
+        """Run rendered config by Embulk batch runner, kill the runner when cancelled."""
+        from luft.common.embulk_runner import (embulk_batch_runner, partition_executor,
+                                               render_embulk_template)
+        config = render_embulk_template(self._resolve_embulk_template(), env_vars)
+        runners = []
+
+        def _run():
+            runner = embulk_batch_runner()
+            runners.append(runner)
+            runner.run(job_id, config, line_callback=result.feed)
+
+        try:
+            await run_in_executor(partition_executor(), _run)
+        except asyncio.CancelledError:
+            for runner in runners:  # running job cannot be interrupted, runner is restarted
+                await run_in_executor(None, runner.kill)
+            raise
+
+    def get_partition_env_vars(self, env_vars: Dict[str, str]) -> List[Dict[str, str]]:
+        """Get enviromental variables of every partition.
+
+        Every partition has its own where clause and writes into its own files `<PATH_PREFIX>_pNNN`
+        so wildcard of `bq-load` still loads all of them.
+
+        """
+        if not self.partition_column or self.partitions <= 1:
+            return [env_vars]
+        predicates = self._get_partition_predicates(env_vars.get('WHERE_CLAUSE'))
+        if not predicates:
+            logger.info(f'Table {self._get_source_table()} cannot be partitioned, '
+                        'it is extracted at once.')
+            return [env_vars]
+        output_tasks = self.get_output_tasks()
+        partition_env_vars = []
+        for i, predicate in enumerate(predicates):
+            part_env_vars = dict(env_vars)
+            if output_tasks:
+                part_output_tasks = -(-output_tasks // len(predicates))
+                part_env_vars['EXEC_OPTIONS'] = self._get_exec_options(part_output_tasks)
+            part_env_vars['WHERE_CLAUSE'] = self._and_where(env_vars.get('WHERE_CLAUSE'), predicate)
+            part_env_vars['PATH_PREFIX'] = f'{env_vars["PATH_PREFIX"]}_p{i:03d}'
+            partition_env_vars.append(part_env_vars)
+        return partition_env_vars
+
+    def _get_partition_predicates(self, where_clause: NoneStr) -> List[str]:
+        """Compute boundaries of partitions in source database and return their conditions."""
+        from luft.common.jdbc_utils import (get_db_connection, get_partition_bounds,
+                                            get_partition_predicates)
+        connection = get_db_connection(self._get_jdbc_params())
+        try:
+            bounds = get_partition_bounds(connection, self._get_db_table(), self.partition_column,
+                                          self.partitions, self.partition_method, where_clause)
+        finally:
+            connection.close()
+        return get_partition_predicates(self.partition_column, bounds)
+
+    def _get_incremental_predicate(self, where_clause: NoneStr) -> Tuple[str, NoneStr]:
+        """Get condition of rows added since last successful run.
+
+        Returns:
+            Tuple[str, str]: condition and new high-water mark (SQL literal) stored after
+                successful run. None when there are no rows.
+
+        """
+        from luft.common.jdbc_utils import (get_db_connection, get_incremental_predicate,
+                                            get_max_value, sql_literal)
+        from luft.common.state import state_store
+        last = state_store().get_watermark(self.get_task_id())
+        connection = get_db_connection(self._get_jdbc_params())
+        try:
+            high = get_max_value(connection, self._get_db_table(), self.incremental_column,
+                                 where_clause)
+        finally:
+            connection.close()
+        high_literal = sql_literal(high) if high is not None else None
+        if high_literal is not None and high_literal == last:
+            logger.info(f'No new rows in {self._get_db_table()} since {last}.')
+            high_literal = None
+        predicate = get_incremental_predicate(self.incremental_column, last,
+                                              high_literal or last)
+        return predicate, high_literal
+
+    @staticmethod
+    def _and_where(where_clause: NoneStr, predicate: str) -> str:
+        """Join where clause and predicate."""
+        return f'({where_clause}) AND ({predicate})' if where_clause else predicate
+
+    def _get_db_table(self) -> str:
+        """Get name of source table including schema for queries run by Luft."""
+        return f'{self.get_source_subsystem()}.{self._get_source_table()}'
 
     def get_command(self) -> List[str]:
         """Get Docker command for running Embulk."""
@@ -67,27 +334,57 @@ class EmbulkJdbcTask(GenericEmbulkTask):
 
     def get_command_args(self) -> List[str]:
         """Get Docker command arguments for running Embulk."""
-        self._set_embulk_template(self.embulk_template)
-        return ['run', self.embulk_template, '-l', EMBULK_LOG_LEVEL]
+        return ['run', self._resolve_embulk_template(), '-l', EMBULK_LOG_LEVEL]
 
     def get_env_vars(self, ts: str, env: NoneStr = None) -> Dict[str, str]:
-        """Get Docker enviromental variables."""
+        """Get Docker enviromental variables.
+
+        Static variables are taken from plan, only date dependent ones are computed.
+
+        """
         super_env_dict = super().get_env_vars(ts=ts, env=env)
-        jdbc_params = self._get_jdbc_params()
-        blob_storage = self._get_blob_storage_params()
-        path_prefix = self._get_path_prefix()
-        env_dict = {
-            **jdbc_params,
-            **blob_storage,
-            **path_prefix,
+        env_dict = dict(self.get_plan()['env'])
+        env_dict.update(self.clean_dictionary({
+            **self._get_path_prefix(),
+            'WHERE_CLAUSE': self._get_where_clause(),
+            'EXEC_OPTIONS': self._get_exec_options(self.get_output_tasks())
+        }))
+        env_dict.update(super_env_dict)
+        return env_dict
+
+    def _get_plan_key(self) -> Tuple:
+        """Plan is compiled again when jdbc config changes."""
+        return get_file_signature(JDBC_CONFIG)
+
+    def _get_static_env_vars(self) -> Dict[str, Optional[str]]:
+        """Get enviromental variables that are the same for all dates."""
+        return {
+            **self._get_jdbc_params(),
+            **super()._get_static_env_vars(),
             'SOURCE_TABLE': self._get_source_table(),
             'COLUMNS': self._get_column_list(),
             'COLUMN_OPTIONS': self._get_column_options(),
-            'WHERE_CLAUSE': self._get_where_clause()
+            'AVRO_SCHEMA_FILE': self._write_avro_schema() if self.output_format == 'avro' else None
+        }
+
+    def _get_default_template_key(self) -> str:
+        """Get key of default template. Formats other than csv have key `<task type>-<format>`."""
+        if self.output_format == 'csv':
+            return self.task_type
+        return f'{self.task_type}-{self.output_format}'
+
+    def _write_avro_schema(self) -> str:
+        """Write Avro schema of extracted columns and return path to it."""
+        import json
+        schema = {
+            'type': 'record',
+            'name': self.get_name(),
+            'fields': list(self.column_set.get_avro_fields(filter_ignored=False))
         }
-        clean_dict = self.clean_dictionary(env_dict)
-        clean_dict.update(super_env_dict)
-        return clean_dict
+        schema_file = Path(EMBULK_AVRO_SCHEMA_DIR).resolve() / f'{self.get_task_id()}.avsc'
+        schema_file.parent.mkdir(parents=True, exist_ok=True)
+        schema_file.write_text(json.dumps(schema, indent=2))
+        return str(schema_file)
 
     def _get_source_table(self) -> str:
         """Get name of source table."""
@@ -96,16 +393,12 @@ class EmbulkJdbcTask(GenericEmbulkTask):
 
     def _get_column_options(self) -> str:
         """Get list of columns for Embulk."""
-        col_options = list(map(lambda col: col.get_embulk_column_option(
-            filter_ignored=False), self.columns))  # for every column call get_embulk_column_option
-        # filter None columns
-        return 'column_options:\n    {}'.format('\n    '.join(filter(None, col_options)))
+        col_options = self.column_set.get_embulk_column_options(filter_ignored=False)
+        return 'column_options:\n    {}'.format('\n    '.join(col_options))
 
     def _get_column_list(self) -> str:
         """Get column options for Embulk loading."""
-        col_list = list(map(lambda col: col.get_aliased_name(
-            filter_ignored=False), self.columns))
-        return ', '.join(filter(None, col_list))
+        return ', '.join(self.column_set.get_aliased_names(filter_ignored=False))
 
     def _get_where_clause(self) -> NoneStr:
         """Get where clause."""
@@ -129,7 +422,7 @@ class EmbulkJdbcTask(GenericEmbulkTask):
 
     def _get_jdbc_params(self) -> Dict[str, str]:
         """Get JDBC parameters."""
-        jdbc_config = read_config(JDBC_CONFIG)
+        jdbc_config = read_config_cached(JDBC_CONFIG)
         try:
             db = jdbc_config[self.source_system.upper()]
         except KeyError as e:
@@ -1,7 +1,7 @@
 # -*- coding: utf-8 -*-
 """Generic Embulk Task."""
 from pathlib import Path
-from typing import Dict, Optional
+from typing import Any, Dict, Optional, Tuple
 
 from luft.common.config import (AWS_ACCESS_KEY_ID, AWS_BUCKET, AWS_ENDPOINT, AWS_SECRET_ACCESS_KEY,
                                 BLOB_STORAGE, EMBULK_DEFAULT_TEMPLATE, GCS_APP_NAME,
@@ -10,8 +10,6 @@ from luft.common.config import (AWS_ACCESS_KEY_ID, AWS_BUCKET, AWS_ENDPOINT, AWS
 from luft.common.utils import NoneStr
 from luft.tasks.generic_task import GenericTask
 
-import pkg_resources
-
 
 class GenericEmbulkTask(GenericTask):
     """Generic Embulk JDBC Task."""
@@ -38,6 +36,35 @@ class GenericEmbulkTask(GenericTask):
                          source_subsystem=source_subsystem,
                          yaml_file=yaml_file,
                          env=env, thread_name=thread_name, color=color)
+        self._plan: Optional[Dict[str, Any]] = None
+        self._template_resolved = False
+
+    def get_plan(self) -> Dict[str, Any]:
+        """Get execution plan of task - everything that does not change between dates.
+
+        Plan is compiled on first run and again only when its key changes (e.g. when config file
+        it is built from changes). Plan is never modified, it is replaced.
+
+        Returns:
+            Dict[str, Any]: `key` of plan and `env` - enviromental variables that are the same
+                for all dates.
+
+        """
+        key = self._get_plan_key()
+        if self._plan is None or self._plan['key'] != key:
+            self._plan = {
+                'key': key,
+                'env': self.clean_dictionary(self._get_static_env_vars())
+            }
+        return self._plan
+
+    def _get_plan_key(self) -> Tuple:
+        """Get key of plan. Plan is compiled again when key changes."""
+        return ()
+
+    def _get_static_env_vars(self) -> Dict[str, Optional[str]]:
+        """Get enviromental variables that are the same for all dates."""
+        return self._get_blob_storage_params()
 
     def _set_embulk_template(self, embulk_template: Optional[str]):
         """Set Embulk template if specified.
@@ -52,11 +79,23 @@ class GenericEmbulkTask(GenericTask):
                 raise FileNotFoundError(
                     'File `%s` does not exists.' % embulk_template)
         else:
+            import pkg_resources
             tmp_embulk_template = pkg_resources.resource_filename(
-                'luft', EMBULK_DEFAULT_TEMPLATE[self.task_type])
+                'luft', EMBULK_DEFAULT_TEMPLATE[self._get_default_template_key()])
             self.embulk_template = tmp_embulk_template.format(
                 blob_storage=BLOB_STORAGE)
 
+    def _get_default_template_key(self) -> str:
+        """Get key of default Embulk template in `[embulk_default_template]` section."""
+        return self.task_type
+
+    def _resolve_embulk_template(self) -> str:
+        """Resolve path to Embulk template only once and return it."""
+        if not self._template_resolved:
+            self._set_embulk_template(self.embulk_template)
+            self._template_resolved = True
+        return self.embulk_template
+
     def _get_embulk_template(self) -> str:
         """Return Embulk template."""
         return self.embulk_template
@@ -94,7 +133,8 @@ class GenericEmbulkTask(GenericTask):
             'GCS_APP_NAME': self.get_null_param('application_name', GCS_APP_NAME),
             'GCS_SERVICE_ACCOUNT_EMAIL': self.get_null_param('service_account_email', GCS_EMAIL),
             'GCS_P12_KEYFILE': self.get_null_param('p12_keyfile', GCS_P12_KEYFILE),
-            'GCS_JSON_KEYFILE': self.get_null_param('json_keyfile', GCS_JSON_KEYFILE)
+            'GCS_JSON_KEYFILE': self.get_null_param('json_keyfile', GCS_JSON_KEYFILE),
+            'GCS_JSON_KEYFILE_PATH': GCS_JSON_KEYFILE
         }
         GenericEmbulkTask.check_mandatory(mandatory_params)
         params.update(mandatory_params)
@@ -1,16 +1,55 @@
 # -*- coding: utf-8 -*-
 """Generic Task."""
 import asyncio
+import contextlib
+import contextvars
+import functools
+import socket
+import time
 from abc import ABC, abstractmethod
-from typing import Dict, List, Optional
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional
 
-from luft.common.config import ENV
+from luft.common.config import ENV, KILL_GRACE_PERIOD, RUN_LEDGER, TASK_TIMEOUT
 from luft.common.logger import setup_logger
+from luft.common.metrics import metrics, record_task_run
+from luft.common.processes import (kill_process_groups, register_process_group,
+                                   unregister_process_group)
+from luft.common.profiling import profile, profile_thread
 from luft.common.utils import NoneStr, ts_to_tz
 
 # Setup logger
 logger = setup_logger('common', 'INFO')
 
+# Rows, bytes and BigQuery bytes of running task x date execution, see `GenericTask.execute`
+_RUN_STATS: contextvars.ContextVar = contextvars.ContextVar('luft_run_stats', default=None)
+
+
+def run_coroutine(coroutine: Awaitable[Any]) -> Any:
+    """Run coroutine to completion in its own event loop.
+
+    Synchronous code (e.g. executor threads) has no running loop, so every call gets a new one.
+
+    """
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        # Do not wait for executor threads of timed out tasks, they cannot be interrupted
+        loop.close()
+
+
+async def run_in_executor(executor: Any, func: Callable[..., Any], *args: Any) -> Any:
+    """Run blocking function in executor of running loop (None is default one).
+
+    Function keeps context (e.g. logging context of task) of calling coroutine and it is profiled
+    together with the task when profiling is enabled.
+
+    """
+    context = contextvars.copy_context()
+    loop = asyncio.get_event_loop()
+    return await loop.run_in_executor(
+        executor, functools.partial(context.run, profile_thread, func, *args))
+
 
 class GenericTask(ABC):
     """Generic Task.
@@ -18,6 +57,10 @@ class GenericTask(ABC):
     It is used only for inheritance.
     """
 
+    # Whether runs for different dates can be executed in any order (or concurrently).
+    # E.g. extraction to blob storage is, historization of data is not.
+    date_independent = False
+
     def __init__(self, name: str, task_type: str, source_system: str, source_subsystem: str,
                  yaml_file: NoneStr = None, env: NoneStr = None,
                  thread_name: NoneStr = None, color: NoneStr = None):
@@ -46,12 +89,146 @@ class GenericTask(ABC):
         self.task_id = ''
         self.date_valid = '1970-01-01'
         self.time_valid = '0000'
+        self.timeout = TASK_TIMEOUT
+        # Set when blocking `__call__` of run was cancelled, see `run`
+        self.cancelled = False
 
     @abstractmethod
     def __call__(self, *args, **kwargs):  # pragma: no cover
         """Callable."""
         pass
 
+    async def run(self, ts: str, env: NoneStr = None) -> Any:
+        """Run task in event loop.
+
+        Default implementation runs blocking `__call__` in executor of the loop. Tasks waiting
+        for subprocesses or remote jobs override it, so one loop can drive many of them
+        concurrently and cancellation reaches their subprocesses.
+
+        Executor thread cannot be interrupted, so timeout of blocking `__call__` is soft. When run
+        is cancelled, `cancelled` is set and `cancel` closes resources of the task, so blocked
+        call fails and thread ends. Without `cancel` the thread runs until `__call__` returns.
+
+        """
+        self.cancelled = False
+        try:
+            return await run_in_executor(None, functools.partial(self, ts=ts, env=env))
+        except asyncio.CancelledError:
+            self.cancelled = True
+            logger.warning(f'Run of {self.get_task_id()} was cancelled, its blocking call is '
+                           'stopped by closing resources of task.')
+            self.cancel()
+            raise
+
+    def cancel(self):
+        """Close resources used by blocking `__call__` of cancelled run, see `run`.
+
+        It is called from event loop thread while `__call__` may still run in executor thread.
+        Default does nothing.
+
+        """
+
+    async def run_with_timeout(self, ts: str, env: NoneStr = None) -> Any:
+        """Run task and cancel it when it does not finish in `timeout` seconds.
+
+        Raises:
+            TimeoutError: task did not finish in time.
+
+        """
+        if not self.timeout:
+            return await self.run(ts, env)
+        try:
+            return await asyncio.wait_for(self.run(ts, env), self.timeout)
+        except asyncio.TimeoutError:
+            raise TimeoutError(f'Task {self.get_task_id()} did not finish in {self.timeout} s.')
+
+    def execute(self, ts: str, env: NoneStr = None) -> Any:
+        """Run task synchronously with its timeout and record the run into metrics and ledger."""
+        start = time.monotonic()
+        started_at = time.time()
+        stats = {'rows': 0, 'bytes': 0, 'bq_bytes_processed': 0}
+        token = _RUN_STATS.set(stats)
+        success = False
+        try:
+            with profile(f'{self.get_task_id()}_{ts}'):
+                if not self.timeout:
+                    result = self(ts=ts, env=env)
+                else:
+                    result = run_coroutine(self.run_with_timeout(ts, env))
+            success = True
+            return result
+        finally:
+            _RUN_STATS.reset(token)
+            record_task_run(self.get_task_id(), self.get_task_type(), time.monotonic() - start,
+                            success)
+            if RUN_LEDGER:
+                self._record_run(ts, started_at, success, stats)
+
+    def _record_run(self, ts: str, started_at: float, success: bool, stats: Dict[str, int]):
+        """Append execution to run ledger. Errors are only logged, they do not fail the task."""
+        from luft.common.state import state_store
+        run = dict(stats, task_id=self.get_task_id(), task_type=self.get_task_type(),
+                   source_system=self.get_source_system(),
+                   date_valid=ts_to_tz(ts).strftime('%Y-%m-%d'), started_at=started_at,
+                   finished_at=time.time(), status='ok' if success else 'failed',
+                   host=socket.gethostname())
+        try:
+            state_store().record_run(run)
+        except Exception as e:
+            logger.warning(f'Run of {self.get_task_id()} cannot be recorded: {e!r}')
+
+    @contextlib.contextmanager
+    def span(self, phase: str) -> Iterator[None]:
+        """Measure duration of named phase of task run (e.g. `load`, `history`).
+
+        Duration is logged and added to `luft_task_phase_seconds` metric even if phase fails.
+
+        """
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            duration = time.monotonic() - start
+            metrics().observe('task_phase_seconds', duration, task_id=self.get_task_id(),
+                              task_type=self.get_task_type(), phase=phase)
+            logger.info(f'{self.get_task_id()}: phase {phase} took {duration:.2f} s.')
+
+    def record_rows(self, rows: int, kind: str):
+        """Add rows processed by task (kind is e.g. `read`, `written`, `loaded`) to metrics.
+
+        Run ledger keeps the largest count of the run - rows read and written are the same data.
+
+        """
+        metrics().inc('task_rows_total', rows, task_id=self.get_task_id(),
+                      task_type=self.get_task_type(), kind=kind)
+        stats = _RUN_STATS.get()
+        if stats is not None:
+            stats['rows'] = max(stats['rows'], rows)
+
+    def record_bytes(self, size: int):
+        """Add bytes produced by task to metrics."""
+        metrics().inc('task_bytes_total', size, task_id=self.get_task_id(),
+                      task_type=self.get_task_type())
+        stats = _RUN_STATS.get()
+        if stats is not None:
+            stats['bytes'] += size
+
+    def record_bq_bytes(self, size: int):
+        """Add bytes processed (billed by) BigQuery jobs of task to metrics."""
+        metrics().inc('task_bq_bytes_processed_total', size, task_id=self.get_task_id(),
+                      task_type=self.get_task_type())
+        stats = _RUN_STATS.get()
+        if stats is not None:
+            stats['bq_bytes_processed'] += size
+
+    def set_timeout(self, timeout: Optional[float]):
+        """Set timeout of task run in seconds, None means no timeout."""
+        self.timeout = timeout
+
+    def get_timeout(self) -> Optional[float]:
+        """Get timeout of task run in seconds."""
+        return self.timeout
+
     def get_env_vars(self, ts: str, env: NoneStr = None) -> Dict[str, str]:
         """Get Docker enviromental variables."""
         ts_tz = ts_to_tz(ts)
@@ -176,12 +353,21 @@ class GenericTask(ABC):
                 raise ValueError(f'Missing mandatory param: `{key}`.')
 
     @staticmethod
-    def _run_subprocess(cmd: List[str], args: List[str], env: Optional[Dict[str, str]] = None):
-        """Run command as subprocess.
+    async def _run_subprocess_async(cmd: List[str], args: List[str],
+                                    env: Optional[Dict[str, str]] = None,
+                                    line_callback: Optional[Callable[[str], Any]] = None,
+                                    log_source: NoneStr = None):
+        """Run command as subprocess in its own process group.
+
+        When coroutine is cancelled (e.g. on timeout), the whole process group is terminated, so
+        no JVM started by shell script is left running.
 
         Parameters:
         cmd (List[str]): command to execute.
         env (Dict[str, str]): enviromental variables to set.
+        line_callback (Callable[[str], Any]): called with every line of output while streaming.
+        log_source (str): name of output in logs, output is rate limited by `[logging]` per
+            source. Default is the command.
 
         """
         async def _read_output(stream, logger_instance):
@@ -190,24 +376,46 @@ class GenericTask(ABC):
                 line = await stream.readline()
                 if line == b'':
                     break
-                logger_instance(line.decode('utf-8').rstrip())
-
-        async def _stream_subprocess(cmd, args, env):
-            """Run subprocess."""
-            cmd_ = ' '.join(cmd)
-            args_ = ' '.join(args)
-            process = await asyncio.create_subprocess_shell(f'{cmd_} {args_}',
-                                                            stdout=asyncio.subprocess.PIPE,
-                                                            stderr=asyncio.subprocess.PIPE,
-                                                            env=env)
-
-            await asyncio.wait([
+                line = line.decode('utf-8').rstrip()
+                logger_instance(line, extra=extra)
+                if line_callback:
+                    line_callback(line)
+
+        cmd_ = ' '.join(cmd)
+        extra = {'source': log_source or cmd_}
+        args_ = ' '.join(args)
+        process = await asyncio.create_subprocess_shell(f'{cmd_} {args_}',
+                                                        stdout=asyncio.subprocess.PIPE,
+                                                        stderr=asyncio.subprocess.PIPE,
+                                                        env=env, start_new_session=True)
+        register_process_group(process.pid, lambda: process.returncode is not None)
+        try:
+            await asyncio.gather(
                 _read_output(process.stdout, logger.info),
                 _read_output(process.stderr, logger.error)
-            ])
+            )
             await process.wait()
-            if process.returncode is None or process.returncode != 0:
-                raise ValueError('Task failed!')
+        except BaseException:  # cancelled or failed while streaming
+            logger.warning(f'Terminating process group {process.pid}: {cmd_}')
+            await run_in_executor(None, kill_process_groups, {process.pid}, KILL_GRACE_PERIOD)
+            raise
+        finally:
+            unregister_process_group(process.pid)
+        if process.returncode is None or process.returncode != 0:
+            raise ValueError('Task failed!')
+
+    @classmethod
+    def _run_subprocess(cls, cmd: List[str], args: List[str],
+                        env: Optional[Dict[str, str]] = None,
+                        line_callback: Optional[Callable[[str], Any]] = None,
+                        log_source: NoneStr = None):
+        """Run command as subprocess and wait for it.
+
+        Parameters:
+        cmd (List[str]): command to execute.
+        env (Dict[str, str]): enviromental variables to set.
+        line_callback (Callable[[str], Any]): called with every line of output while streaming.
+        log_source (str): name of output in logs. Default is the command.
 
-        loop = asyncio.get_event_loop()
-        loop.run_until_complete(_stream_subprocess(cmd, args, env))
+        """
+        run_coroutine(cls._run_subprocess_async(cmd, args, env, line_callback, log_source))
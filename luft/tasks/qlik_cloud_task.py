@@ -53,11 +53,7 @@ class QlikCloud(GenericTask):
         """
         self.account_id = account_id
         self.apps = apps
-
-        options = Options()  # Chrome options
-        options.headless = QLIK_CLOUD_HEADLESS  # Run headless
-        options.add_argument('--no-sandbox')
-        self.browser = webdriver.Chrome(chrome_options=options)  # Browser
+        self._browser = None  # Browser is launched on first use and quit after run
 
         super().__init__(name=name, task_type=task_type,
                          source_system=source_system,
@@ -72,7 +68,34 @@ class QlikCloud(GenericTask):
             ts (str): time of valid.
 
         """
-        self.update_apps()
+        try:
+            with self.span('update_apps'):
+                self.update_apps()
+        finally:
+            self.quit_browser()
+
+    @property
+    def browser(self) -> webdriver.Chrome:
+        """Chrome browser. It is launched on first use."""
+        if self.cancelled:
+            raise RuntimeError(f'Run of {self.get_task_id()} was cancelled.')
+        if self._browser is None:
+            options = Options()  # Chrome options
+            options.headless = QLIK_CLOUD_HEADLESS  # Run headless
+            options.add_argument('--no-sandbox')
+            self._browser = webdriver.Chrome(chrome_options=options)
+        return self._browser
+
+    def quit_browser(self):
+        """Quit browser if launched."""
+        # Called also from event loop thread when run is cancelled, see `cancel`
+        browser, self._browser = self._browser, None
+        if browser is not None:
+            browser.quit()
+
+    def cancel(self):
+        """Quit browser, so blocked call of timed out run fails."""
+        self.quit_browser()
 
     def get_env_vars(self, ts: str, env: NoneStr = None) -> Dict[str, str]:
         """Get Docker enviromental variables."""
@@ -12,7 +12,6 @@ from luft.common.logger import setup_logger
 from luft.common.s3_utils import get_s3, write_s3
 from luft.common.utils import NoneStr, ts_to_tz
 from luft.tasks.generic_task import GenericTask
-from luft.vendor.pyqlikengine import engine_helper, pyqlikengine
 
 # Setup logger
 logger = setup_logger('common', 'INFO')
@@ -21,6 +20,8 @@ logger = setup_logger('common', 'INFO')
 class QlikMetric(GenericTask):
     """Qlik Sense export metrics."""
 
+    date_independent = True
+
     def __init__(self, name: str, task_type: str, source_system: str, source_subsystem: str,
                  app_id: str, dimensions: Union[List[str]] = None,
                  measures: Union[List[str]] = None,
@@ -49,10 +50,9 @@ class QlikMetric(GenericTask):
         self.measures = measures
         self.selections = selections
         self.date_valid = None
-
-        self.engine = self.qlik_login()
-        self.app = self.engine.open_app(self.app_id)
-        self.app_handle = self.engine.ega.get_handle(self.app)
+        # Engine connection is opened on first use and closed after run
+        self._engine = None
+        self._app_handle = None
 
         super().__init__(name=name, task_type=task_type,
                          source_system=source_system,
@@ -69,11 +69,52 @@ class QlikMetric(GenericTask):
         """
         ts_tz = ts_to_tz(ts)
         self.date_valid = ts_tz.strftime('%Y-%m-%d')
-        qlik_data = self.get_qlik_data(ts_tz=ts_tz)
-        self.write_blob_storage(json_list=qlik_data)
+        try:
+            with self.span('extract'):
+                qlik_data = self.get_qlik_data(ts_tz=ts_tz)
+        finally:
+            self.disconnect()
+        self.record_rows(len(qlik_data), 'read')
+        with self.span('upload'):
+            self.write_blob_storage(json_list=qlik_data)
+
+    def _connect(self):
+        """Login to Qlik Sense and open app if not connected yet."""
+        if self.cancelled:
+            raise RuntimeError(f'Run of {self.get_task_id()} was cancelled.')
+        if self._engine is None:
+            engine = self.qlik_login()
+            app = engine.open_app(self.app_id)
+            self._app_handle = engine.ega.get_handle(app)
+            self._engine = engine
+
+    @property
+    def engine(self):
+        """Qlik engine with opened app. Connection is opened on first use."""
+        self._connect()
+        return self._engine
+
+    @property
+    def app_handle(self) -> int:
+        """Handle of opened app."""
+        self._connect()
+        return self._app_handle
+
+    def disconnect(self):
+        """Close engine connection if opened."""
+        # Called also from event loop thread when run is cancelled, see `cancel`
+        engine, self._engine, self._app_handle = self._engine, None, None
+        if engine is not None:
+            engine.disconnect()
+            logger.info(f'Engine disconnected.')
+
+    def cancel(self):
+        """Close engine connection, so blocked call of timed out run fails."""
+        self.disconnect()
 
     def qlik_login(self):
         """Login to Qlik Sense."""
+        from luft.vendor.pyqlikengine import pyqlikengine
         return pyqlikengine.QixEngine(url=QLIK_ENT_HOST, user_directory='LMC',
                                       user_id='tomsejr', ca_certs=QLIK_ENT_ROOT_CERT,
                                       certfile=QLIK_ENT_CLIENT_CERT,
@@ -196,6 +237,7 @@ class QlikMetric(GenericTask):
         Arguments:
         ts(str): time and date.
         """
+        from luft.vendor.pyqlikengine import engine_helper
         # Open application
         logger.info(f'Opening app: {self.app_id}')
         measure_dict = self.get_measures()
@@ -206,6 +248,4 @@ class QlikMetric(GenericTask):
         logger.info(f'Creating hypercube.')
         qlik_data = engine_helper.get_hypercube_data(
             conn, self.app_handle, measure_dict, self.dimensions, select_dict, self.date_valid)
-        self.engine.disconnect()
-        logger.info(f'Engine disconnected.')
         return qlik_data
@@ -0,0 +1,27 @@
+# Luft Embulk batch runner.
+#
+# Runs many Embulk configs inside one JVM. Jobs are read from stdin, one json per line
+# ({"id": ..., "config": <path to rendered config>}). Embulk logs are written as usual and every
+# job ends with result line `LUFT_RESULT {"id": ..., "status": "ok"|"error", ...}`.
+require 'json'
+require 'embulk'
+
+log_level = ARGV[0] || 'info'
+Embulk.setup({'log_level' => log_level})
+$stdout.sync = true
+$stderr.sync = true
+
+$stdin.each_line do |line|
+  line = line.strip
+  next if line.empty?
+  job = JSON.parse(line)
+  started = Time.now
+  begin
+    Embulk::Runner.run(job['config'])
+    result = {'id' => job['id'], 'status' => 'ok'}
+  rescue Exception => e
+    result = {'id' => job['id'], 'status' => 'error', 'error' => "#{e.class}: #{e.message}"}
+  end
+  result['duration'] = Time.now - started
+  $stdout.puts("LUFT_RESULT #{JSON.generate(result)}")
+end
@@ -1,8 +1,8 @@
 -- Create stage table
 CREATE OR REPLACE TABLE {{ STAGE_SCHEMA }}.{{ TABLE_NAME }} (
     -------------------------------- PKs -------------------------------------
-    {{ PK_DEFINITION_LIST }}{{ ',' if PK_DEFINITION_LIST and PK_DEFINITION_LIST|length and COLUMN_DEFINITION_LIST and COLUMN_DEFINITION_LIST|length else '' }}
+    {{ STAGE_PK_DEFINITION_LIST }}{{ ',' if STAGE_PK_DEFINITION_LIST and STAGE_PK_DEFINITION_LIST|length and STAGE_COLUMN_DEFINITION_LIST and STAGE_COLUMN_DEFINITION_LIST|length else '' }}
     ------------------------------ Columns -----------------------------------
-    {{ COLUMN_DEFINITION_LIST }}
+    {{ STAGE_COLUMN_DEFINITION_LIST }}
     --------------------------------------------------------------------------
 );
\ No newline at end of file
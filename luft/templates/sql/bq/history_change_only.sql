@@ -42,8 +42,8 @@ MERGE INTO {{ HISTORY_SCHEMA }}.{{ TABLE_NAME }} t
             FROM (
                 -- We need unique columns
                 SELECT DISTINCT
-                    {{ PK }}{{ ',' if PK and PK|length else '' }}
-                    {{ COLUMNS }}
+                    {{ STAGE_PK }}{{ ',' if STAGE_PK and STAGE_PK|length else '' }}
+                    {{ STAGE_COLUMNS }}
                 FROM {{ STAGE_SCHEMA }}.{{ TABLE_NAME }}
               ) i
     ) s
@@ -33,7 +33,8 @@ if README_PATH.exists():
 install_requires = []
 extras_require = {
     'dev': [],
-    'bq': ['google-cloud-bigquery==1.18.0'],
+    'bq': ['google-cloud-bigquery==1.18.0', 'google-cloud-storage==1.20.0'],
+    'jdbc': ['psycopg2-binary==2.8.4', 'PyMySQL==0.9.3'],
     'qlik-cloud': ['selenium==3.141.0'],
     'qlik-metric': ['boto3==1.9.242', 'websocket-client==0.56.0'],
 }
@@ -101,8 +102,8 @@ def do_setup():
             'Operating System :: Microsoft :: Windows',
             'Operating System :: POSIX',
             'Programming Language :: Python :: 3',
-            'Programming Language :: Python :: 3.6',
             'Programming Language :: Python :: 3.7',
+            'Programming Language :: Python :: 3.8',
             'Programming Language :: Python',
             'Topic :: Software Development :: Libraries',
         ],
@@ -110,7 +111,7 @@ def do_setup():
                   'yaml', 'airflow', 'luft', 'lmc'],
 
         packages=find_packages(exclude=['tests*', 'docs*']),
-        python_requires='>=3.6, <4',
+        python_requires='>=3.7, <4',
         include_package_data=True,
 
         entry_points={
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""Fixtures of micro-benchmarks.
+
+Benchmarks run only with `--benchmark-only` (pytest-benchmark), so they do not slow down unit
+tests. See README section Benchmarks.
+"""
+from pathlib import Path
+from typing import List
+
+from luft.common import catalog
+from luft.common.catalog import YamlCatalog
+from luft.common.column import Column
+
+import pytest
+
+from yaml_loading import generate_tasks
+
+
+def pytest_collection_modifyitems(config, items):
+    """Skip benchmarks unless they are explicitly requested."""
+    if config.getoption('benchmark_only', default=False):
+        return
+    skip = pytest.mark.skip(reason='benchmarks run only with --benchmark-only')
+    benchmarks = Path(__file__).parent
+    for item in items:
+        if benchmarks in Path(str(item.fspath)).parents:
+            item.add_marker(skip)
+
+
+@pytest.fixture(scope='session')
+def task_folders(tmp_path_factory):
+    """Create folder with given number of synthetic task files, once per session."""
+    folders = {}
+
+    def _task_folder(files: int) -> Path:
+        if files not in folders:
+            folders[files] = generate_tasks(tmp_path_factory.mktemp(f'tasks_{files}'), files)
+        return folders[files]
+
+    return _task_folder
+
+
+@pytest.fixture(scope='function')
+def empty_catalog(tmp_path, monkeypatch):
+    """Use empty catalog in temporary folder instead of the configured one."""
+    def _empty_catalog():
+        cat = YamlCatalog(str(tmp_path / 'catalog.json'))
+        monkeypatch.setattr(catalog._YamlCatalog, 'instance', cat)
+
+    _empty_catalog()
+    return _empty_catalog
+
+
+@pytest.fixture(scope='session')
+def make_columns():
+    """Create columns - first one primary key, every fifth mandatory, some renamed."""
+    def _make_columns(count: int) -> List[Column]:
+        return [Column(name=f'column_{i}', data_type='string(50)' if i % 3 else 'int64',
+                       rename=f'col_{i}' if i % 7 == 0 else None, pk=i == 0,
+                       mandatory=i % 5 == 0)
+                for i in range(count)]
+
+    return _make_columns
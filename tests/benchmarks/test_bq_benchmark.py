@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+"""Benchmark building of BigQuery env variables and SQL commands."""
+from pathlib import Path
+
+from luft.common.column import ColumnSet
+from luft.common.config import BQ_DATA_TYPES, BQ_HIST_DEFAULT_TEMPLATE
+from luft.tasks.bq_load_task import BQLoadTask
+
+import pytest
+
+pytest.importorskip('pytest_benchmark')
+
+COLUMN_COUNTS = [10, 100, 500, 2000]
+TS = '2019-09-22T00:00:00+00:00'
+
+
+def _bq_load_task(columns):
+    return BQLoadTask(name='BENCH', task_type='bq-load', source_system='bench',
+                      source_subsystem='public', project_id='project', location='US',
+                      columns=columns)
+
+
+@pytest.mark.parametrize('column_count', COLUMN_COUNTS)
+def test_column_defs(benchmark, make_columns, column_count):
+    """Benchmark rendering of column fragments by columns themselves."""
+    columns = make_columns(column_count)
+
+    def _render():
+        return [(column.get_name(), column.get_def(supported_types=BQ_DATA_TYPES),
+                 column.get_join()) for column in columns]
+
+    assert len(benchmark(_render)) == column_count
+
+
+@pytest.mark.parametrize('column_count', COLUMN_COUNTS)
+def test_column_set(benchmark, make_columns, column_count):
+    """Benchmark precomputing of column fragments of task."""
+    columns = make_columns(column_count)
+    column_set = benchmark(ColumnSet, columns)
+    assert len(column_set) == column_count
+
+
+@pytest.mark.parametrize('column_count', COLUMN_COUNTS)
+def test_bq_load_env_vars(benchmark, make_columns, column_count):
+    """Benchmark creating BigQuery load task and its env variables."""
+    columns = make_columns(column_count)
+    env_vars = benchmark(lambda: _bq_load_task(columns).get_env_vars(TS))
+    assert env_vars['COLUMN_DEFINITION_LIST'].count('\n') == column_count - 2
+
+
+@pytest.mark.parametrize('column_count', COLUMN_COUNTS)
+def test_bq_sql_commands(benchmark, make_columns, column_count):
+    """Benchmark Jinja rendering of default history template."""
+    import pkg_resources
+    template = Path(pkg_resources.resource_filename('luft', BQ_HIST_DEFAULT_TEMPLATE))
+    task = _bq_load_task(make_columns(column_count))
+    env_vars = task.get_env_vars(TS)
+    cmds = benchmark(task._get_sql_commands, str(template.parent), [template.name], env_vars)
+    assert cmds
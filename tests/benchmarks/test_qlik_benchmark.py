@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""Benchmark conversion of Qlik hypercube data and writing of its results to S3."""
+import json
+import math
+
+from luft.tasks import qlik_metric_task
+from luft.tasks.qlik_metric_task import QlikMetric
+from luft.vendor.pyqlikengine import engine_helper
+from luft.vendor.pyqlikengine.pyqlikengine import QixEngine
+
+import pytest
+
+pytest.importorskip('pytest_benchmark')
+
+ROW_COUNTS = [1000, 10000, 50000]
+DIMENSIONS = ['D.Date', 'D.Country', 'D.Product']
+MEASURES = [{'id': f'measure_{i}', 'name': f'# Measure {i}'} for i in range(4)]
+
+
+def _cell(row: int, col: int):
+    """Get canned cell of QIX matrix - dimensions are texts, measures numbers."""
+    if col < len(DIMENSIONS):
+        return {'qText': f'value_{row}_{col}', 'qNum': 'NaN', 'qElemNumber': row}
+    return {'qText': str(row * col), 'qNum': row * col, 'qElemNumber': 0,
+            'qIsNull': row % 97 == 0}
+
+
+class CannedQixConnection:
+    """Connection answering QIX engine calls by canned responses."""
+
+    def __init__(self, rows: int):
+        """Prepare serialized pages of hypercube with rows."""
+        width = len(DIMENSIONS) + len(MEASURES)
+        self.height = int(math.floor(10000 / width))
+        self.pages = {}
+        for top in range(0, rows + 1, self.height):
+            matrix = [[_cell(row, col) for col in range(width)]
+                      for row in range(top, min(top + self.height, rows))]
+            self.pages[top] = json.dumps({'result': {'qDataPages': [{'qMatrix': matrix}]}})
+        self.layout = json.dumps({'result': {'qLayout': {
+            'qFileName': 'app-id', 'qTitle': 'Bench', 'stream': {'id': 's', 'name': 'Stream'}}}})
+
+    def send_call(self, socket, msg: str) -> str:
+        """Answer call of engine API, socket is the connection itself."""
+        call = json.loads(msg)
+        method = call['method']
+        if method == 'GetHyperCubeData':
+            return self.pages[call['params'][1][0]['qTop']]
+        if method == 'GetAppLayout':
+            return self.layout
+        if method in ('CreateObject', 'GetField'):
+            return json.dumps({'result': {'qReturn': {'qHandle': 2}}})
+        return json.dumps({'result': {}})
+
+
+class FakeS3:
+    """S3 client keeping size of written objects."""
+
+    def __init__(self):
+        """Init client."""
+        self.objects = {}
+
+    def put_object(self, Body, Bucket, Key):  # noqa: N803 - boto3 argument names
+        """Store size of object."""
+        self.objects[Key] = len(Body)
+
+
+def _hypercube(rows: int, width: int = 10):
+    return {'qDataPages': [{'qMatrix': [[{'qText': f'{row}_{col}'} for col in range(width)]
+                                        for row in range(rows)]}]}
+
+
+@pytest.mark.parametrize('rows', ROW_COUNTS)
+def test_get_hypercube_data(benchmark, rows):
+    """Benchmark paging and conversion of hypercube into metric records."""
+    connection = CannedQixConnection(rows)
+    results = benchmark(engine_helper.get_hypercube_data, connection, 1, MEASURES, DIMENSIONS,
+                        {'D.Date': ['2019-09-22', 43730]}, '2019-09-22')
+    assert len(results) == rows % connection.height * len(MEASURES)
+
+
+@pytest.mark.parametrize('rows', [100, 1000, 10000])
+def test_convert_hypercube_to_inline_table(benchmark, rows):
+    """Benchmark conversion of hypercube into inline table load script."""
+    script = benchmark(QixEngine.convert_hypercube_to_inline_table, _hypercube(rows), 'Bench')
+    assert script.count('\n') == rows + 3
+
+
+@pytest.mark.parametrize('rows', [1000, 10000, 50000])
+def test_write_blob_storage(benchmark, monkeypatch, capsys, rows):
+    """Benchmark building of gzipped json payload written to S3."""
+    s3 = FakeS3()
+    monkeypatch.setattr(qlik_metric_task, 'get_s3', lambda **kwargs: s3)
+    task = QlikMetric(name='QLIK_METRIC', task_type='qlik-metric-load', source_system='qlik',
+                      source_subsystem='metric', app_id='app-id', dimensions=DIMENSIONS)
+    task.date_valid = '2019-09-22'
+    records = [{'date_valid': '2019-09-22', 'app_id': 'app-id', 'app_name': 'Bench',
+                'dimensions': {'d.date': f'value_{i}', 'd.country': 'CZ'},
+                'measure_id': 'measure_1', 'measure_name': '# Measure 1', 'measure_value': i}
+               for i in range(rows)]
+    benchmark(task.write_blob_storage, records)
+    capsys.readouterr()  # drop `Writing to` lines printed by every round
+    assert len(s3.objects) == 1
@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+"""Benchmark reading folders of task files."""
+from luft.common.task_list import TaskList
+
+import pytest
+
+pytest.importorskip('pytest_benchmark')
+
+FILE_COUNTS = [1000, 10000, 50000]
+# Rounds of one benchmark - large folders take tens of seconds per round
+ROUNDS = {1000: 5, 10000: 2, 50000: 1}
+
+
+def _read(folder):
+    return TaskList().read_yml_path(folder, task_type='embulk-jdbc-load', thread_cnt=8)
+
+
+@pytest.mark.parametrize('files', FILE_COUNTS)
+def test_read_yml_path_cold(benchmark, task_folders, empty_catalog, files):
+    """Benchmark reading task folder with empty catalog (first run, changed files)."""
+    folder = task_folders(files)
+    task_list = benchmark.pedantic(_read, args=(folder,), setup=empty_catalog,
+                                   rounds=ROUNDS[files])
+    assert len(task_list) == files
+
+
+@pytest.mark.parametrize('files', FILE_COUNTS)
+def test_read_yml_path_warm(benchmark, task_folders, empty_catalog, files):
+    """Benchmark reading task folder with warm catalog (nothing changed since last run)."""
+    folder = task_folders(files)
+    _read(folder)
+    task_list = benchmark.pedantic(_read, args=(folder,), rounds=ROUNDS[files])
+    assert len(task_list) == files
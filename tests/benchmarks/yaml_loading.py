@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""Benchmark of loading yml task files.
+
+Generates synthetic folder of task files and measures parsing by pure python loader (original
+behaviour), by libyaml loader, by libyaml loader in process pool and loading from warm catalog.
+
+Run from repository root:
+    LUFT_CONFIG=example/config/luft.cfg python -m tests.benchmarks.yaml_loading --files 10000
+"""
+import argparse
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable
+
+from luft.common.catalog import YamlCatalog, parse_files
+from luft.common.task_list import TaskList
+
+TASK_TEMPLATE = """name: TABLE_{i}
+source_table: public.table_{i}
+thread_name: thread_{thread}
+columns:
+{columns}
+"""
+
+COLUMN_TEMPLATE = """  - name: column_{c}
+    type: varchar
+    mandatory: {mandatory}
+    pk: {pk}
+    escape: false
+"""
+
+
+def generate_tasks(folder: Path, files: int, columns: int = 20) -> Path:
+    """Generate `files` task files into folder `source_system/source_subsystem`."""
+    tasks_folder = folder / 'bench' / 'public'
+    tasks_folder.mkdir(parents=True)
+    column_defs = ''.join(COLUMN_TEMPLATE.format(c=c, mandatory=str(c == 0).lower(),
+                                                 pk=str(c == 0).lower()) for c in range(columns))
+    for i in range(files):
+        (tasks_folder / f'TABLE_{i}.yml').write_text(
+            TASK_TEMPLATE.format(i=i, thread=i % 8, columns=column_defs))
+    return folder
+
+
+def _measure(name: str, func: Callable[[], object]) -> float:
+    """Run function and print its duration."""
+    start = time.perf_counter()
+    func()
+    duration = time.perf_counter() - start
+    print(f'{name:<32} {duration:8.3f} s')
+    return duration
+
+
+def main():
+    """Run benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--files', type=int, default=10000, help='Number of task files.')
+    parser.add_argument('--processes', type=int, default=4, help='Size of process pool.')
+    args = parser.parse_args()
+
+    from ruamel import yaml
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        folder = generate_tasks(Path(tmp_dir), args.files)
+        yml_files = TaskList.get_yml_files(folder)
+        print(f'{len(yml_files)} task files')
+        _measure('pure python loader (serial)',
+                 lambda: [yaml.load(f.read_text(), Loader=yaml.Loader) for f in yml_files])
+        _measure('libyaml loader (serial)',
+                 lambda: parse_files(yml_files, processes=1))
+        _measure(f'libyaml loader ({args.processes} processes)',
+                 lambda: parse_files(yml_files, processes=args.processes, threshold=0))
+        catalog_file = str(Path(tmp_dir) / 'catalog.json')
+        YamlCatalog(catalog_file).compile(yml_files)
+        _measure('warm catalog',
+                 lambda: YamlCatalog(catalog_file).refresh(yml_files))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,10 +1,31 @@
 # -*- coding: utf-8 -*-
-"""Test Embulk JDBC task."""
+"""Shared fixtures of tests."""
 import docker
 
+from luft.common import catalog, state
+from luft.common.catalog import YamlCatalog
+from luft.common.state import StateStore
+
 import pytest
 
 
+@pytest.fixture(scope='function', autouse=True)
+def isolated_catalog(tmp_path, monkeypatch):
+    """Keep yml catalog of every test in temporary folder instead of working directory."""
+    yml_catalog = YamlCatalog(str(tmp_path / 'catalog.json'))
+    monkeypatch.setattr(catalog._YamlCatalog, 'instance', yml_catalog)
+    return yml_catalog
+
+
+@pytest.fixture(scope='function', autouse=True)
+def isolated_state(tmp_path, monkeypatch):
+    """Keep state database of every test in temporary folder instead of working directory."""
+    state_db = StateStore(str(tmp_path / 'state.db'))
+    monkeypatch.setattr(state._StateStore, 'instance', state_db)
+    yield state_db
+    state_db.close()
+
+
 @pytest.fixture(scope='function')
 def postgres_db():
     """Create Postgres docker container with test data."""
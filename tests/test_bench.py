@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""Test benchmark harness and its fakes."""
+import json
+
+from cli.luft import luft
+
+from click.testing import CliRunner
+
+from luft.bench import embulk_stub
+from luft.bench.fakes import FakeBigQueryClient, FilesystemS3
+from luft.bench.qix_server import QixServerProcess
+from luft.common import bq_utils
+from luft.common.embulk_result import EmbulkResult
+from luft.common.s3_utils import list_s3_objects, write_s3
+from luft.tasks import generic_task
+
+import pytest
+
+
+@pytest.mark.unit
+def test_embulk_stub_log_is_parsed(capsys):
+    """Test that output of Embulk stand-in is parsed as Embulk log."""
+    embulk_stub.main(['--rows', '25000', '--rate', '1000000', 'run', 'config.yml', '-l', 'info'])
+    result = EmbulkResult('A')
+    for line in capsys.readouterr().out.splitlines():
+        result.feed(line)
+    assert (result.rows_read, result.rows_written, result.bytes) == (25000, 25000, 2500000)
+    assert result.committed
+
+
+@pytest.mark.unit
+def test_qix_server_returns_hypercube():
+    """Test that canned QIX server answers engine API over websocket."""
+    pytest.importorskip('websocket')
+    from luft.vendor.pyqlikengine import engine_helper
+    from luft.vendor.pyqlikengine.engine_communicator import EngineCommunicator
+    with QixServerProcess(rows=300) as server:
+        connection = EngineCommunicator(f'ws://127.0.0.1:{server.port}/app/bench-app')
+        try:
+            results = engine_helper.get_hypercube_data(
+                connection, 1, [{'id': 'measure_0', 'name': '# Measure 0'}], ['D.Date'],
+                {'D.Date': [43730]}, '2019-09-22')
+        finally:
+            connection.close_qvengine_connection(connection)
+    assert len(results) == 300
+    assert results[2]['dimensions'] == {'d.date': '2'}
+    assert results[2]['measure_value'] == 4
+
+
+@pytest.mark.unit
+def test_filesystem_s3_lists_written_objects(tmp_path, capsys):
+    """Test that objects written to filesystem S3 are listed with their sizes."""
+    s3 = FilesystemS3(tmp_path)
+    write_s3('DEV', 'bench', 'public', 'A', s3, 'bucket', 'x' * 100, '2019-09-22',
+             compress=False)
+    write_s3('DEV', 'bench', 'other', 'B', s3, 'bucket', 'y', '2019-09-22', compress=False)
+    assert list_s3_objects(s3, 'bucket', 'DEV/bench/public') == [
+        ('DEV/bench/public/A/2019-09-22/data-1.json', 100)]
+    assert s3.bytes_written == 101
+
+
+@pytest.mark.unit
+def test_fake_bq_client_keeps_datasets_and_jobs():
+    """Test that fake BigQuery client creates datasets once and records jobs."""
+    pytest.importorskip('google.cloud.bigquery')
+    bq_utils.metadata_cache.clear()
+    client = FakeBigQueryClient(query_latency=0.01)
+    assert bq_utils.create_dataset(client, 'bench', 'US')
+    bq_utils.metadata_cache.clear()
+    assert not bq_utils.create_dataset(client, 'bench', 'US')
+    job = client.query('SELECT 1').result()
+    assert (job.state, job.total_bytes_processed) == ('DONE', client.bytes_processed)
+    assert (client.external.calls, client.external.seconds) == (1, 0.01)
+    bq_utils.metadata_cache.clear()
+
+
+@pytest.mark.unit
+def test_bench_command(tmp_path, monkeypatch):
+    """Test that task lists run against fakes and results are reported."""
+    pytest.importorskip('google.cloud.bigquery')
+    # Benchmark keeps its own run ledger even when it is disabled in config
+    monkeypatch.setattr(generic_task, 'RUN_LEDGER', False)
+    output = tmp_path / 'bench.json'
+    result = CliRunner().invoke(luft, [
+        'bench', '-t', 'embulk-jdbc-load', '-t', 'bq-exec', '-n', '3', '-p', '1,2',
+        '--embulk-rows', '1000', '--embulk-startup', '0', '--bq-query-latency', '0',
+        '-o', str(output)])
+    assert result.exit_code == 0, result.output
+    assert 'Benchmark results' in result.output
+    results = json.loads(output.read_text())['results']
+    assert [(r['task_type'], r['parallelism'], r['status'], r['failed']) for r in results] == [
+        ('embulk-jdbc-load', 1, 'ok', 0), ('embulk-jdbc-load', 2, 'ok', 0),
+        ('bq-exec', 1, 'ok', 0), ('bq-exec', 2, 'ok', 0)]
+    assert all(r['tasks'] == 3 for r in results)
+    assert all(r['external_s'] > 0 for r in results[:2])  # Embulk runs are counted
+    assert results[2]['bq_jobs'] == 9  # three statements of every task
@@ -20,3 +20,71 @@ def bq_exec_task():
 def test_run(bq_exec_task):
     """Test if running of task succeed."""
     bq_exec_task.__call__('2019-01-01')
+
+
+@pytest.mark.unit
+def test_bq_client_is_created_lazily(monkeypatch):
+    """Test that BigQuery client is created on first use and released after run."""
+    clients = []
+
+    async def _run_bq_command_async(self, sql_folder, sql_files, env_vars):
+        self.get_bq_client()
+
+    monkeypatch.setattr(BQExecTask, '_init_bq_client', lambda self: clients.append(1) or object())
+    monkeypatch.setattr(BQExecTask, '_run_bq_command_async', _run_bq_command_async)
+    task = BQExecTask(name='Test', task_type='bq-exec', source_system='bq',
+                      source_subsystem='exec', project_id='project', location='US')
+    assert clients == []
+    task('2019-01-01')
+    assert len(clients) == 1
+    assert task._bq_client is None
+
+
+class FakeQueryJob:
+    """Query job running until it is cancelled."""
+
+    def __init__(self, query):
+        """Start job."""
+        self.job_id = f'job_{query}'
+        self.query = query
+        self.cancelled = False
+
+    def done(self):
+        """Check state of job."""
+        return self.cancelled
+
+    def cancel(self):
+        """Cancel job."""
+        self.cancelled = True
+        return True
+
+
+class FakeQueryClient:
+    """BigQuery client starting never ending query jobs."""
+
+    project = 'project'
+
+    def __init__(self):
+        """Create client."""
+        self.jobs = []
+
+    def query(self, query, **kwargs):
+        """Start query job."""
+        self.jobs.append(FakeQueryJob(query))
+        return self.jobs[-1]
+
+
+@pytest.mark.unit
+def test_timed_out_query_job_is_cancelled(tmp_path, monkeypatch):
+    """Test that timeout cancels running job and the next query is not started."""
+    (tmp_path / 'queries.sql').write_text('SELECT 1;\nSELECT 2;\n')
+    client = FakeQueryClient()
+    monkeypatch.setattr(BQExecTask, '_init_bq_client', lambda self: client)
+    task = BQExecTask(name='Test', task_type='bq-exec', source_system='bq',
+                      source_subsystem='exec', sql_folder=str(tmp_path),
+                      sql_files=['queries.sql'], project_id='project', location='US')
+    task.set_timeout(0.3)
+    with pytest.raises(TimeoutError):
+        task.execute('2019-01-01')
+    assert [job.query for job in client.jobs] == ['SELECT 1']
+    assert client.jobs[0].cancelled
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""Test BigQuery load task."""
+from luft.common.column import Column
+from luft.tasks.bq_load_task import BQLoadTask
+
+import pytest
+
+
+@pytest.fixture(scope='function')
+def bq_load_task():
+    """Generate BigQuery load task."""
+    return BQLoadTask(name='COUNTRY', task_type='bq-load', source_system='world',
+                      source_subsystem='public', project_id='project', location='US',
+                      columns=[Column(name='code', data_type='string(3)', pk=True,
+                                      mandatory=True),
+                               Column(name='population', data_type='int64')])
+
+
+@pytest.mark.unit
+def test_csv_load_job_config(bq_load_task):
+    """Test that csv is loaded with csv options and without schema."""
+    bigquery = pytest.importorskip('google.cloud.bigquery')
+    job_config = bq_load_task.get_load_job_config()
+    assert job_config.source_format == bigquery.SourceFormat.CSV
+    assert job_config.field_delimiter == '\t'
+    assert job_config.schema is None
+
+
+@pytest.mark.unit
+def test_parquet_load_job_config(bq_load_task):
+    """Test that parquet is loaded with explicit schema from columns."""
+    bigquery = pytest.importorskip('google.cloud.bigquery')
+    bq_load_task.output_format = 'parquet'
+    job_config = bq_load_task.get_load_job_config()
+    assert job_config.source_format == bigquery.SourceFormat.PARQUET
+    assert [(field.name, field.field_type, field.mode) for field in job_config.schema] == [
+        ('code', 'STRING', 'REQUIRED'), ('population', 'INT64', 'NULLABLE')]
+
+
+@pytest.mark.unit
+def test_load_csv_delegates_to_load_data(bq_load_task, monkeypatch):
+    """Test that former `load_csv` still loads data."""
+    calls = []
+    monkeypatch.setattr(bq_load_task, 'load_data', lambda: calls.append('load_data'))
+    bq_load_task.load_csv()
+    assert calls == ['load_data']
+
+
+@pytest.mark.unit
+def test_parquet_stage_table_has_written_types(bq_load_task):
+    """Test that date loaded from Parquet is string in stage table and date in history."""
+    bigquery = pytest.importorskip('google.cloud.bigquery')
+    task = BQLoadTask(name='ORDERS', task_type='bq-load', source_system='shop',
+                      source_subsystem='public', project_id='project', location='US',
+                      output_format='parquet',
+                      columns=[Column(name='id', data_type='int64', pk=True, mandatory=True),
+                               Column(name='created', data_type='date'),
+                               Column(name='ts', data_type='timestamp')])
+    job_config = task.get_load_job_config()
+    assert job_config.source_format == bigquery.SourceFormat.PARQUET
+    assert [(field.name, field.field_type) for field in job_config.schema] == [
+        ('id', 'INT64'), ('created', 'STRING'), ('ts', 'STRING')]
+    env_vars = task.get_env_vars('2019-01-01')
+    assert env_vars['STAGE_PK_DEFINITION_LIST'] == 'id INT64 NOT NULL'
+    assert env_vars['STAGE_COLUMN_DEFINITION_LIST'] == 'created STRING,\n    ts STRING'
+    assert env_vars['COLUMN_DEFINITION_LIST'] == 'created DATE,\n    ts TIMESTAMP'
+    assert env_vars['STAGE_PK'] == 'id'
+    assert env_vars['STAGE_COLUMNS'] == ('CAST(created AS DATE) AS created,\n'
+                                         'CAST(ts AS TIMESTAMP) AS ts')
+    bq_load_task.output_format = 'csv'
+    csv_vars = bq_load_task.get_env_vars('2019-01-01')
+    assert csv_vars['STAGE_COLUMN_DEFINITION_LIST'] == csv_vars['COLUMN_DEFINITION_LIST']
+    assert csv_vars['STAGE_COLUMNS'] == csv_vars['COLUMNS']
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+"""Test BigQuery utils."""
+import threading
+import time
+
+from google.cloud import bigquery
+from google.cloud.exceptions import NotFound
+from google.oauth2 import service_account
+
+from luft.common import bq_utils
+
+import pytest
+
+
+class FakeClient:
+    """BigQuery client counting API requests."""
+
+    project = 'project'
+
+    def __init__(self, datasets=None):
+        """Init client."""
+        self.datasets = set(datasets or [])
+        self.requests = 0
+
+    def get_dataset(self, dataset_id):
+        """Get dataset."""
+        self.requests += 1
+        if dataset_id not in self.datasets:
+            raise NotFound(dataset_id)
+        return dataset_id
+
+    def create_dataset(self, dataset):
+        """Create dataset."""
+        self.requests += 1
+        self.datasets.add(dataset.dataset_id)
+        return dataset
+
+
+@pytest.fixture(scope='function', autouse=True)
+def metadata_cache(monkeypatch):
+    """Use fresh metadata cache."""
+    cache = bq_utils.MetadataCache(ttl=60)
+    monkeypatch.setattr(bq_utils, 'metadata_cache', cache)
+    return cache
+
+
+@pytest.mark.unit
+def test_metadata_cache_expires():
+    """Test that items expire after TTL and TTL 0 disables the cache."""
+    cache = bq_utils.MetadataCache(ttl=0.05)
+    cache.set('key', 'value')
+    assert cache.get('key') == 'value'
+    time.sleep(0.06)
+    assert cache.get('key') is None
+    disabled = bq_utils.MetadataCache(ttl=0)
+    disabled.set('key', 'value')
+    assert disabled.get('key') is None
+
+
+@pytest.mark.unit
+def test_dataset_exists_is_cached():
+    """Test that existing datasets are cached and missing ones are not."""
+    client = FakeClient(datasets=['stage'])
+    assert bq_utils.dataset_exists(client, 'stage')
+    assert bq_utils.dataset_exists(client, 'stage')
+    assert not bq_utils.dataset_exists(client, 'hist')
+    assert not bq_utils.dataset_exists(client, 'hist')
+    assert client.requests == 3
+
+
+@pytest.mark.unit
+def test_create_dataset_once():
+    """Test that dataset is created only once and then known."""
+    client = FakeClient()
+    assert bq_utils.create_dataset(client, 'stage', 'US')
+    assert not bq_utils.create_dataset(client, 'stage', 'US')
+    assert client.datasets == {'stage'}
+    assert client.requests == 2
+
+
+@pytest.mark.unit
+def test_bq_client_is_shared(monkeypatch):
+    """Test that one client is created for project and location across threads."""
+    created = []
+    monkeypatch.setattr(bq_utils, '_bq_clients', {})
+    monkeypatch.setattr(service_account.Credentials, 'from_service_account_file',
+                        lambda path: 'credentials')
+    monkeypatch.setattr(bigquery, 'Client', lambda **kwargs: created.append(kwargs) or object())
+    clients = []
+    threads = [threading.Thread(target=lambda: clients.append(
+        bq_utils.get_bq_client('project', 'US', 'cred.json'))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(created) == 1
+    assert len({id(client) for client in clients}) == 1
+    assert bq_utils.get_bq_client('project', 'EU', 'cred.json') is not clients[0]
@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+"""Test yaml catalog."""
+import datetime
+import json
+import os
+
+from luft.common import catalog
+from luft.common.catalog import YamlCatalog
+from luft.common.task_list import TaskList
+
+import pytest
+
+
+@pytest.fixture(scope='function')
+def tasks_folder(tmp_path):
+    """Create folder with yml files."""
+    folder = tmp_path / 'tasks' / 'sys' / 'sub'
+    folder.mkdir(parents=True)
+    for name in ['A', 'B', 'C']:
+        (folder / f'{name}.yml').write_text(f'name: {name}\ncolumns:\n  - name: id\n')
+    return tmp_path / 'tasks'
+
+
+@pytest.fixture(scope='function')
+def parsed(monkeypatch):
+    """Record parsed yaml strings."""
+    calls = []
+    parse_yml = catalog.parse_yml
+
+    def _parse_yml(text):
+        calls.append(text)
+        return parse_yml(text)
+
+    monkeypatch.setattr(catalog, 'parse_yml', _parse_yml)
+    return calls
+
+
+@pytest.mark.unit
+def test_file_is_parsed_only_when_changed(tmp_path, tasks_folder, parsed):
+    """Test that unchanged files are taken from catalog file."""
+    yml_files = TaskList.get_yml_files(tasks_folder)
+    assert YamlCatalog(str(tmp_path / 'catalog')).compile(yml_files)['parsed'] == 3
+    yml_file = tasks_folder / 'sys' / 'sub' / 'B.yml'
+    yml_file.write_text('name: B\ncolumns: []\n')
+    os.utime(str(yml_file), ns=(0, 0))
+    cat = YamlCatalog(str(tmp_path / 'catalog'))
+    assert cat.load(yml_file) == {'name': 'B', 'columns': []}
+    assert cat.load(tasks_folder / 'sys' / 'sub' / 'A.yml')['name'] == 'A'
+    assert len(parsed) == 4
+
+
+@pytest.mark.unit
+def test_loaded_content_is_copy(tmp_path, tasks_folder):
+    """Test that modification of loaded content does not change catalog."""
+    cat = YamlCatalog(str(tmp_path / 'catalog'))
+    yml_file = tasks_folder / 'sys' / 'sub' / 'A.yml'
+    cat.load(yml_file)['columns'].append('x')
+    assert cat.load(yml_file)['columns'] == [{'name': 'id'}]
+
+
+@pytest.mark.unit
+def test_compile_removes_missing_files(tmp_path, tasks_folder):
+    """Test that entries of deleted files are removed."""
+    cat = YamlCatalog(str(tmp_path / 'catalog'))
+    cat.compile(TaskList.get_yml_files(tasks_folder))
+    (tasks_folder / 'sys' / 'sub' / 'C.yml').unlink()
+    stats = cat.compile(TaskList.get_yml_files(tasks_folder))
+    assert stats == {'files': 2, 'parsed': 0, 'removed': 1}
+
+
+@pytest.mark.unit
+def test_whitelist_loads_only_matching_files(tmp_path, tasks_folder, monkeypatch):
+    """Test that files without whitelisted task are not loaded."""
+    cat = YamlCatalog(str(tmp_path / 'catalog'))
+    monkeypatch.setattr(catalog._YamlCatalog, 'instance', cat)
+    loaded = []
+    load = cat.load
+
+    def _load(yml_file):
+        loaded.append(yml_file.stem)
+        return load(yml_file)
+
+    monkeypatch.setattr(cat, 'load', _load)
+    monkeypatch.setattr(TaskList, '_process_tasks',
+                        lambda self, task_list_def, *args: task_list_def)
+    task_list = TaskList()
+    task_list.read_yml_path(tasks_folder, task_type='embulk-jdbc-load', whitelist=['B'])
+    assert loaded == ['B']
+
+
+@pytest.mark.unit
+def test_parse_files_in_pool_keeps_order(tasks_folder):
+    """Test that files parsed in process pool are returned in original order."""
+    yml_files = TaskList.get_yml_files(tasks_folder)
+    result = catalog.parse_files(yml_files, processes=2, threshold=2)
+    assert [path for path, _, _ in result] == [str(yml_file) for yml_file in yml_files]
+    assert [content['name'] for _, _, content in result] == ['C', 'B', 'A']
+
+
+@pytest.mark.unit
+def test_parse_yml_python_tags():
+    """Test that yaml with python tags falls back to full loader."""
+    assert catalog.parse_yml('a: !!python/tuple [1, 2]') == {'a': (1, 2)}
+    content = catalog.parse_yml('name: A\ndate: 2019-01-01')
+    assert content == {'name': 'A', 'date': datetime.date(2019, 1, 1)}
+
+
+@pytest.mark.unit
+def test_catalog_file_is_json(tmp_path, tasks_folder, parsed):
+    """Test that catalog keeps dates, skips python objects and is written only when changed."""
+    folder = tasks_folder / 'sys' / 'sub'
+    (folder / 'A.yml').write_text('name: A\nstart: 2019-01-01\nat: 2019-01-01 10:00:00\n')
+    (folder / 'B.yml').write_text('name: B\npair: !!python/tuple [1, 2]\n')
+    yml_files = TaskList.get_yml_files(tasks_folder)
+    path = tmp_path / 'catalog.json'
+    YamlCatalog(str(path)).compile(yml_files)
+    assert sorted(json.loads(path.read_text())['files']) == sorted(
+        str(yml_file) for yml_file in yml_files if yml_file.name != 'B.yml')
+    parsed.clear()
+    cat = YamlCatalog(str(path))
+    assert cat.load(folder / 'A.yml') == {'name': 'A', 'start': datetime.date(2019, 1, 1),
+                                          'at': datetime.datetime(2019, 1, 1, 10)}
+    assert cat.get_names(folder / 'C.yml') == {'C'}
+    assert parsed == []
+    os.utime(str(path), ns=(0, 0))
+    cat.save()  # nothing changed, file is not written
+    assert path.stat().st_mtime_ns == 0
+    assert cat.load(folder / 'B.yml') == {'name': 'B', 'pair': (1, 2)}
+    assert len(parsed) == 1
+
+
+@pytest.mark.unit
+def test_broken_catalog_is_parsed_again(tmp_path, tasks_folder):
+    """Test that catalog file which is not JSON (e.g. pickle) is ignored."""
+    path = tmp_path / 'catalog.json'
+    path.write_bytes(b'\x80\x04cos\nsystem\n.')
+    cat = YamlCatalog(str(path))
+    assert cat.load(tasks_folder / 'sys' / 'sub' / 'A.yml')['name'] == 'A'
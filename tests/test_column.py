@@ -1,7 +1,7 @@
 # -*- coding: utf-8 -*-
 """Test Generic task."""
 
-from luft.common.column import Column
+from luft.common.column import Column, ColumnSet
 from luft.schemas.column_schema import ColumnSchema
 
 import pytest
@@ -310,3 +310,68 @@ def test_get_clean_data_type(columns):
     """Test if getting clean data type works."""
     assert columns[0]._get_clean_data_type() == 'string'
     assert columns[2]._get_clean_data_type() == 'number'
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize('col_type', ['all', 'pk', 'nonpk'])
+@pytest.mark.parametrize('filter_ignored', [True, False])
+@pytest.mark.parametrize('include_tech', [True, False])
+def test_column_set_projections(columns, col_type, filter_ignored, include_tech):
+    """Test that column set returns the same values as columns."""
+    column_set = ColumnSet(columns)
+    kwargs = {'col_type': col_type, 'filter_ignored': filter_ignored,
+              'include_tech': include_tech}
+    names = [col.get_name(**kwargs) for col in columns if col.get_name(**kwargs)]
+    assert list(column_set.get_names(**kwargs)) == names
+    joins = [col.get_join(**kwargs) for col in columns if col.get_join(**kwargs)]
+    assert list(column_set.get_joins(**kwargs)) == joins
+    aliased = [col.get_aliased_name(**kwargs) for col in columns if col.get_aliased_name(**kwargs)]
+    assert list(column_set.get_aliased_names(**kwargs)) == aliased
+    assert list(column_set.get_hash_diff(**kwargs)) == [
+        f"IFNULL(CAST({name} AS STRING), '')" for name in names]
+
+
+@pytest.mark.unit
+def test_column_set_is_computed_once(columns):
+    """Test that fragments are computed once and column set is immutable."""
+    column_set = ColumnSet(columns[:-1])
+    defs = column_set.get_defs('pk', supported_types=['STRING', 'NUMBER'])
+    assert defs == ('Primary_Key1 STRING NOT NULL', 'Primary_Key2 STRING NOT NULL',
+                    'Technical_PK NUMBER')
+    assert column_set.get_defs('pk', supported_types=['STRING', 'NUMBER']) is defs
+    with pytest.raises(AttributeError):
+        column_set.columns = ()
+    with pytest.raises(TypeError):
+        ColumnSet(columns).get_defs(supported_types=['STRING'])
+
+
+@pytest.mark.unit
+def test_avro_and_bq_schema():
+    """Test that Avro and BigQuery schemas follow column types and mandatory flag."""
+    column_set = ColumnSet([Column(name='id', data_type='int64', mandatory=True),
+                            Column(name='name', data_type='string(10)', rename='title')])
+    assert column_set.get_avro_fields() == (
+        {'name': 'id', 'type': 'long'}, {'name': 'title', 'type': ['null', 'string']})
+    assert column_set.get_bq_schema(supported_types=['INT64', 'STRING']) == (
+        ('id', 'INT64', 'REQUIRED'), ('title', 'STRING', 'NULLABLE'))
+
+
+@pytest.mark.unit
+def test_avro_and_bq_schema_of_formatted_columns():
+    """Test that date and time columns written by Embulk as formatted strings are strings."""
+    column_set = ColumnSet([Column(name='id', data_type='number', pk=True, mandatory=True),
+                            Column(name='created', data_type='date'),
+                            Column(name='at', data_type='time'),
+                            Column(name='ts', data_type='timestamp')])
+    assert column_set.get_avro_fields(filter_ignored=False) == (
+        {'name': 'id', 'type': 'long'}, {'name': 'created', 'type': ['null', 'string']},
+        {'name': 'at', 'type': ['null', 'string']}, {'name': 'ts', 'type': ['null', 'string']})
+    supported_types = ['NUMBER', 'DATE', 'TIME', 'TIMESTAMP']
+    assert column_set.get_bq_schema(supported_types=supported_types) == (
+        ('id', 'INT64', 'REQUIRED'), ('created', 'STRING', 'NULLABLE'),
+        ('at', 'STRING', 'NULLABLE'), ('ts', 'STRING', 'NULLABLE'))
+    assert column_set.get_stage_values(supported_types=supported_types) == (
+        'CAST(id AS NUMBER) AS id', 'CAST(created AS DATE) AS created',
+        'CAST(at AS TIME) AS at', 'CAST(ts AS TIMESTAMP) AS ts')
+    with pytest.raises(TypeError):
+        column_set.get_bq_schema(supported_types=['DATE'])
@@ -1,9 +1,17 @@
 # -*- coding: utf-8 -*-
 """Test Embulk JDBC task."""
+import asyncio
+import json
+import sqlite3
 from pathlib import Path
 
+from luft.common import jdbc_utils, state
 from luft.common.column import Column
 from luft.common.config import BLOB_STORAGE, EMBULK_COMMAND, EMBULK_DEFAULT_TEMPLATE
+from luft.common.embulk_result import EmbulkResult
+from luft.common.executor import get_backfill_chains, run_backfill
+from luft.common.state import StateStore
+from luft.tasks import embulk_jdbc_task as embulk_jdbc_task_module
 from luft.tasks.embulk_jdbc_task import EmbulkJdbcTask
 
 import pkg_resources
@@ -44,7 +52,7 @@ def test_get_command_args(embulk_jdbc_task):
     embulk_template = pkg_resources.resource_filename(
         'luft', EMBULK_DEFAULT_TEMPLATE[task_type]).format(blob_storage=BLOB_STORAGE)
     assert embulk_jdbc_task.get_command_args() == [
-        'run', embulk_template, '-l', 'debug']
+        'run', embulk_template, '-l', 'info']
 
 
 def test_set_embulk_template(embulk_jdbc_task):
@@ -59,3 +67,174 @@ def test_set_embulk_template(embulk_jdbc_task):
 def test_run(embulk_jdbc_task, postgres_db):
     """Tes if running of task succeed."""
     embulk_jdbc_task.__call__('2019-01-01')
+
+
+@pytest.mark.unit
+def test_plan_is_compiled_once(embulk_jdbc_task, tmp_path, monkeypatch):
+    """Test that static part of env is compiled once and again only when jdbc config changes."""
+    jdbc_config = tmp_path / 'jdbc.cfg'
+    jdbc_config.write_text('[WORLD]\ntype = postgresql\nuri = localhost\nport = 5432\n'
+                           'database = world\nuser = postgres\npassword = postgres\n')
+    monkeypatch.setattr(embulk_jdbc_task_module, 'JDBC_CONFIG', str(jdbc_config))
+    monkeypatch.setattr(embulk_jdbc_task, '_get_blob_storage_params',
+                        lambda: {'AWS_BUCKET': 'bucket'})
+    env_vars = embulk_jdbc_task.get_env_vars('2019-01-01')
+    plan = embulk_jdbc_task.get_plan()
+    assert env_vars['DATE_VALID'] == '2019-01-01'
+    assert env_vars['PORT'] == '5432'
+    env_vars = embulk_jdbc_task.get_env_vars('2019-01-02')
+    assert embulk_jdbc_task.get_plan() is plan
+    assert env_vars['DATE_VALID'] == '2019-01-02'
+    assert '2019-01-02' in env_vars['PATH_PREFIX']
+    jdbc_config.write_text(jdbc_config.read_text().replace('5432', '15432'))
+    assert embulk_jdbc_task.get_env_vars('2019-01-02')['PORT'] == '15432'
+    assert embulk_jdbc_task.get_plan() is not plan
+
+
+@pytest.mark.unit
+def test_partitions_run_concurrently(embulk_jdbc_task, monkeypatch):
+    """Test that every partition gets own where clause and path prefix."""
+    embulk_jdbc_task.partition_column = 'countrycode'
+    embulk_jdbc_task.partitions = 2
+    embulk_jdbc_task.where_clause = 'isofficial'
+    monkeypatch.setattr(embulk_jdbc_task, 'get_env_vars',
+                        lambda ts, env=None: {'PATH_PREFIX': 'data', 'WHERE_CLAUSE': 'isofficial'})
+    monkeypatch.setattr(embulk_jdbc_task, '_get_partition_predicates',
+                        lambda where_clause: ["countrycode < 'M'", "countrycode >= 'M'"])
+    runs = []
+
+    async def _run_embulk(job_id, env_vars):
+        runs.append((job_id, env_vars))
+        return EmbulkResult(job_id).finish()
+
+    monkeypatch.setattr(embulk_jdbc_task, '_run_embulk', _run_embulk)
+    assert embulk_jdbc_task('2019-01-01').job_id == 'COUNTRYLANGUAGE'
+    assert sorted(runs, key=lambda run: run[0]) == [
+        ('COUNTRYLANGUAGE_p000', {'PATH_PREFIX': 'data_p000',
+                                  'WHERE_CLAUSE': "(isofficial) AND (countrycode < 'M')"}),
+        ('COUNTRYLANGUAGE_p001', {'PATH_PREFIX': 'data_p001',
+                                  'WHERE_CLAUSE': "(isofficial) AND (countrycode >= 'M')"})]
+
+
+@pytest.mark.unit
+def test_incremental_watermark_advances_after_success(embulk_jdbc_task, tmp_path, monkeypatch):
+    """Test that only new rows are extracted and watermark is stored only after success."""
+    db_path = str(tmp_path / 'source.db')
+    with sqlite3.connect(db_path) as conn:
+        conn.execute('CREATE TABLE t (id INTEGER)')
+        conn.executemany('INSERT INTO t VALUES (?)', [(1,), (2,)])
+    monkeypatch.setattr(jdbc_utils, 'get_db_connection', lambda params: sqlite3.connect(db_path))
+    monkeypatch.setattr(state._StateStore, 'instance', StateStore(str(tmp_path / 'state.db')))
+    monkeypatch.setattr(embulk_jdbc_task, '_get_jdbc_params', lambda: {})
+    monkeypatch.setattr(embulk_jdbc_task, '_get_db_table', lambda: 't')
+    monkeypatch.setattr(embulk_jdbc_task, 'get_env_vars',
+                        lambda ts, env=None: {'PATH_PREFIX': 'data'})
+    embulk_jdbc_task.incremental_column = 'id'
+    where_clauses = []
+
+    async def _run_embulk(job_id, env_vars):
+        where_clauses.append(env_vars['WHERE_CLAUSE'])
+        if len(where_clauses) == 2:
+            raise ValueError('Task failed!')
+        return EmbulkResult(job_id).finish()
+
+    monkeypatch.setattr(embulk_jdbc_task, '_run_embulk', _run_embulk)
+    embulk_jdbc_task('2019-01-01')
+    with sqlite3.connect(db_path) as conn:
+        conn.execute('INSERT INTO t VALUES (3)')
+    with pytest.raises(ValueError):
+        embulk_jdbc_task('2019-01-01')
+    embulk_jdbc_task('2019-01-01')
+    embulk_jdbc_task('2019-01-01')
+    assert where_clauses == ['id <= 2', 'id > 2 AND id <= 3', 'id > 2 AND id <= 3',
+                             'id > 3 AND id <= 3']
+
+
+@pytest.mark.unit
+def test_incremental_dates_run_in_order_in_backfill(embulk_jdbc_task, tmp_path, monkeypatch):
+    """Test that backfill runs dates of incremental task sequentially, watermark never goes back."""
+    db_path = str(tmp_path / 'source.db')
+    with sqlite3.connect(db_path) as conn:
+        conn.execute('CREATE TABLE t (id INTEGER)')
+        conn.executemany('INSERT INTO t VALUES (?)', [(1,), (2,)])
+    store = StateStore(str(tmp_path / 'state.db'))
+    monkeypatch.setattr(jdbc_utils, 'get_db_connection', lambda params: sqlite3.connect(db_path))
+    monkeypatch.setattr(state._StateStore, 'instance', store)
+    monkeypatch.setattr(embulk_jdbc_task, '_get_jdbc_params', lambda: {})
+    monkeypatch.setattr(embulk_jdbc_task, '_get_db_table', lambda: 't')
+    monkeypatch.setattr(embulk_jdbc_task, 'get_env_vars',
+                        lambda ts, env=None: {'PATH_PREFIX': 'data'})
+    assert embulk_jdbc_task.date_independent
+    incremental_task = EmbulkJdbcTask(name='T', task_type='embulk-jdbc-load', source_system='s',
+                                      source_subsystem='p', columns=[], incremental_column='id')
+    assert not incremental_task.date_independent
+    embulk_jdbc_task.incremental_column = 'id'
+    embulk_jdbc_task.date_independent = incremental_task.date_independent
+    where_clauses = []
+
+    async def _run_embulk(job_id, env_vars):
+        where_clauses.append(env_vars['WHERE_CLAUSE'])
+        if len(where_clauses) == 1:  # row added while the first date is extracted
+            await asyncio.sleep(0.1)
+            with sqlite3.connect(db_path) as conn:
+                conn.execute('INSERT INTO t VALUES (3)')
+        return EmbulkResult(job_id).finish()
+
+    monkeypatch.setattr(embulk_jdbc_task, '_run_embulk', _run_embulk)
+    dates = ['2019-01-01', '2019-01-02']
+    assert len(get_backfill_chains([embulk_jdbc_task], dates)) == 1
+    run_backfill([embulk_jdbc_task], dates, parallelism=2)
+    assert where_clauses == ['id <= 2', 'id > 2 AND id <= 3']
+    assert store.get_watermark(embulk_jdbc_task.get_task_id()) == '3'
+
+
+@pytest.mark.unit
+def test_avro_output(embulk_jdbc_task, tmp_path, monkeypatch):
+    """Test that avro template is used with schema generated from columns."""
+    monkeypatch.setattr(embulk_jdbc_task_module, 'EMBULK_AVRO_SCHEMA_DIR', str(tmp_path))
+    monkeypatch.setattr(embulk_jdbc_task, '_get_jdbc_params', lambda: {})
+    monkeypatch.setattr(embulk_jdbc_task, '_get_blob_storage_params', lambda: {})
+    embulk_jdbc_task.output_format = 'avro'
+    template = Path(embulk_jdbc_task._resolve_embulk_template()).name
+    assert template == f'jdbc_{BLOB_STORAGE}_avro.yml.liquid'
+    schema_file = Path(embulk_jdbc_task.get_plan()['env']['AVRO_SCHEMA_FILE'])
+    schema = json.loads(schema_file.read_text())
+    assert [field['name'] for field in schema['fields']] == [
+        'countrycode', 'language', 'percentage', 'isofficial']
+
+
+@pytest.mark.unit
+def test_output_tasks_from_previous_run(embulk_jdbc_task, tmp_path, monkeypatch):
+    """Test that produced files are reported and their size sets number of output tasks."""
+    from luft.common import blob_utils
+    monkeypatch.setattr(state._StateStore, 'instance', StateStore(str(tmp_path / 'state.db')))
+    monkeypatch.setattr(blob_utils, 'list_blob_files', lambda prefix: [
+        (f's3://bucket/{prefix}.000.00.tsv.gz', 90 * 1024 * 1024),
+        (f's3://bucket/{prefix}.001.00.tsv.gz', 10 * 1024 * 1024)])
+    embulk_jdbc_task.output_file_size = 32
+    embulk_jdbc_task.max_threads = 2
+    assert embulk_jdbc_task._get_exec_options(embulk_jdbc_task.get_output_tasks()) == \
+        'exec: {max_threads: 2}'
+    report = embulk_jdbc_task.report_files('data')
+    assert report == {'files': 2, 'bytes': 100 * 1024 * 1024,
+                      'min_bytes': 10 * 1024 * 1024, 'max_bytes': 90 * 1024 * 1024}
+    assert embulk_jdbc_task.get_output_tasks() == 4
+    assert embulk_jdbc_task._get_exec_options(4) == 'exec: {max_threads: 2, min_output_tasks: 4}'
+
+
+@pytest.mark.unit
+def test_partition_column_is_validated():
+    """Test that partition column must be one of columns and splittable by partition method."""
+    from luft.schemas.embulk_jdbc_task_schema import EmbulkJdbcTaskSchema
+    from marshmallow import ValidationError
+    task_def = {'name': 'T', 'source_system': 's', 'source_subsystem': 'p',
+                'task_type': 'embulk-jdbc-load',
+                'columns': [{'name': 'id', 'type': 'int64'}, {'name': 'code', 'type': 'string'}]}
+    assert EmbulkJdbcTaskSchema().load(dict(task_def, partition_column='id')).partition_column
+    for partition_column in ['missing', 'code']:
+        with pytest.raises(ValidationError) as error:
+            EmbulkJdbcTaskSchema().load(dict(task_def, partition_column=partition_column))
+        assert 'partition_column' in error.value.messages
+    task = EmbulkJdbcTaskSchema().load(dict(task_def, partition_column='code',
+                                            partition_method='quantile'))
+    assert task.partition_column == 'code'
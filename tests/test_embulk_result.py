@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+"""Test parsing of Embulk log."""
+from luft.common.embulk_result import EmbulkResult
+
+import pytest
+
+LOG = """2019-10-01 10:00:00.000 +0000 [INFO] (main): Loaded plugin embulk-input-postgresql
+2019-10-01 10:00:01.000 +0000 [INFO] (0001:transaction): {done:  0 / 1, running: 1}
+2019-10-01 10:00:02.000 +0000 [INFO] (0014:task-0000): Fetched 500 rows.
+2019-10-01 10:00:03.000 +0000 [INFO] (0014:task-0000): Fetched 1,000 rows.
+2019-10-01 10:00:04.000 +0000 [INFO] (0014:task-0000): 1,200 records uploaded, 4,096 bytes
+2019-10-01 10:00:05.000 +0000 [INFO] (0001:transaction): {done:  1 / 1, running: 0}
+2019-10-01 10:00:05.000 +0000 [INFO] (main): Committed.
+"""
+
+
+@pytest.mark.unit
+def test_feed_embulk_log():
+    """Test that counters are parsed from streamed lines."""
+    result = EmbulkResult('A')
+    recognized = [result.feed(line) for line in LOG.splitlines()]
+    assert recognized == [False, True, True, True, True, True, True]
+    assert (result.rows_read, result.rows_written, result.bytes) == (1000, 1200, 4096)
+    assert (result.tasks_done, result.tasks_total, result.committed) == (1, 1, True)
+
+
+@pytest.mark.unit
+def test_unrelated_lines_are_not_counted():
+    """Test that only summary lines of output tasks count rows and bytes, each once."""
+    result = EmbulkResult('A')
+    lines = ['(main): Using local buffer of 33,554,432 bytes',
+             '(0014:task-0000): Retrying upload of 8,388,608 bytes (attempt 2)',
+             '(0014:task-0000): Flushed 10,000 rows to buffer',
+             '(main): 7 rows written by JVM warmup',
+             '(0014:task-0000): 1,200 records uploaded, 4,096 bytes',
+             '(0014:task-0000): 1,200 records uploaded, 4,096 bytes',
+             '(0015:task-0001): 800 records uploaded, 1,024 bytes']
+    recognized = [result.feed(line) for line in lines]
+    assert recognized == [False, False, False, False, True, True, True]
+    assert (result.rows_written, result.bytes) == (2000, 5120)
+
+
+@pytest.mark.unit
+def test_merge_results():
+    """Test that results of partitions are summed."""
+    first, second = EmbulkResult('A_p000'), EmbulkResult('A_p001')
+    first.feed('Fetched 10 rows.')
+    second.feed('Fetched 5 rows.')
+    first.feed('Committed.')
+    merged = EmbulkResult.merge('A', [first.finish(), second.finish()])
+    assert merged.as_dict()['rows_read'] == 15
+    assert merged.committed is False
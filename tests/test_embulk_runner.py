@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+"""Test Embulk batch runner."""
+import sys
+import threading
+
+from luft.common.embulk_runner import EmbulkBatchRunner, render_embulk_template
+
+import pkg_resources
+
+import pytest
+
+FAKE_RUNNER = """
+import json, os, sys, time
+for line in sys.stdin:
+    job = json.loads(line)
+    config = open(job['config']).read()
+    if 'hang' in config:
+        print('hanging')
+        sys.stdout.flush()
+        time.sleep(30)
+    print('embulk log', os.getpid())
+    status = 'error' if 'fail' in config else 'ok'
+    print('LUFT_RESULT ' + json.dumps({'id': job['id'], 'status': status, 'error': 'boom'}))
+    sys.stdout.flush()
+"""
+
+
+@pytest.fixture(scope='function')
+def runner(tmp_path):
+    """Batch runner with fake Embulk implementing the same protocol."""
+    script = tmp_path / 'fake_runner.py'
+    script.write_text(FAKE_RUNNER)
+    batch_runner = EmbulkBatchRunner([sys.executable, str(script)])
+    yield batch_runner
+    batch_runner.close()
+
+
+@pytest.mark.unit
+def test_runner_process_is_reused(runner):
+    """Test that many jobs run in one process."""
+    lines = []
+    assert runner.run('A', 'in: a', line_callback=lines.append)['status'] == 'ok'
+    assert lines[0].startswith('embulk log')
+    pid = runner._process.pid
+    assert runner.run('B', 'in: b')['status'] == 'ok'
+    assert runner._process.pid == pid
+
+
+@pytest.mark.unit
+def test_failed_job_raises(runner):
+    """Test that failed job raises and runner stays usable."""
+    with pytest.raises(ChildProcessError):
+        runner.run('A', 'fail')
+    assert runner.run('B', 'in: b')['status'] == 'ok'
+
+
+@pytest.mark.unit
+def test_killed_runner_fails_job_and_restarts(runner):
+    """Test that killed runner fails its running job and next job starts new runner."""
+    assert runner.run('A', 'in: a')['status'] == 'ok'
+    pid = runner._process.pid
+    errors = []
+    hanging = threading.Event()
+
+    def _run():
+        try:
+            runner.run('B', 'hang', line_callback=lambda line: hanging.set())
+        except ChildProcessError as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=_run)
+    thread.start()
+    assert hanging.wait(timeout=5)
+    runner.kill()
+    thread.join(timeout=5)
+    assert len(errors) == 1
+    assert runner.run('C', 'in: c')['status'] == 'ok'
+    assert runner._process.pid != pid
+
+
+@pytest.mark.unit
+def test_render_embulk_template():
+    """Test that default template is rendered with include and missing variables."""
+    template = pkg_resources.resource_filename('luft', 'templates/embulk/jdbc_aws.yml.liquid')
+    config = render_embulk_template(template, {'TYPE': 'postgresql', 'AWS_BUCKET': 'bucket'})
+    assert '   type: postgresql\n' in config
+    assert '   bucket: bucket\n' in config
+    assert '   where: \n' in config
+
+
+@pytest.mark.unit
+def test_render_exec_options():
+    """Test that exec section is rendered only when set."""
+    template = pkg_resources.resource_filename('luft', 'templates/embulk/jdbc_aws.yml.liquid')
+    config = render_embulk_template(template, {'EXEC_OPTIONS': 'exec: {min_output_tasks: 4}'})
+    assert config.startswith('exec: {min_output_tasks: 4}\nin:\n')
+    assert render_embulk_template(template, {}).startswith('\nin:\n')
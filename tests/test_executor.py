@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+"""Test task executor."""
+import threading
+import time
+
+from luft.common.executor import get_backfill_chains, group_by_thread, run_backfill, run_tasks
+from luft.tasks.generic_task import GenericTask
+
+import pytest
+
+
+class SleepTask(GenericTask):
+    """Task that only records its calls."""
+
+    def __init__(self, calls, fail=False, **kwargs):
+        """Init task."""
+        self.calls = calls
+        self.fail = fail
+        super().__init__(**kwargs)
+
+    def __call__(self, ts, env=None):
+        """Record call."""
+        time.sleep(0.05)
+        if self.fail:
+            raise ValueError('Task failed!')
+        self.calls.append((self.get_name(), ts, threading.current_thread().name))
+
+
+class IndependentSleepTask(SleepTask):
+    """Date independent task."""
+
+    date_independent = True
+
+
+def _task(calls, name, thread_name, fail=False, task_class=SleepTask):
+    return task_class(calls, fail=fail, name=name, task_type='test', source_system='sys',
+                      source_subsystem='sub', thread_name=thread_name)
+
+
+@pytest.fixture(scope='function')
+def calls():
+    """Return list for recording calls."""
+    return []
+
+
+@pytest.mark.unit
+def test_group_by_thread(calls):
+    """Test that tasks are grouped into lanes in original order."""
+    tasks = [_task(calls, 'A', 't-0'), _task(calls, 'B', 't-1'), _task(calls, 'C', 't-0')]
+    lanes = group_by_thread(tasks)
+    assert list(lanes.keys()) == ['t-0', 't-1']
+    assert [t.get_name() for t in lanes['t-0']] == ['A', 'C']
+
+
+@pytest.mark.unit
+def test_run_tasks_sequential(calls):
+    """Test that without parallelism tasks run in original order date by date."""
+    tasks = [_task(calls, 'A', 't-0'), _task(calls, 'B', 't-1')]
+    run_tasks(tasks, ['2019-01-01', '2019-01-02'])
+    assert [(c[0], c[1]) for c in calls] == [('A', '2019-01-01'), ('B', '2019-01-01'),
+                                             ('A', '2019-01-02'), ('B', '2019-01-02')]
+
+
+@pytest.mark.unit
+def test_run_tasks_parallel_keeps_lane_order(calls):
+    """Test that lanes run concurrently and every lane stays sequential."""
+    tasks = [_task(calls, str(i), f't-{i % 3}') for i in range(9)]
+    start = time.time()
+    run_tasks(tasks, ['2019-01-01'], parallelism=3)
+    assert time.time() - start < 0.05 * 9
+    assert len(calls) == 9
+    for lane in range(3):
+        lane_calls = [int(c[0]) for c in calls if int(c[0]) % 3 == lane]
+        assert lane_calls == sorted(lane_calls)
+        assert len({c[2] for c in calls if int(c[0]) % 3 == lane}) == 1
+
+
+@pytest.mark.unit
+def test_run_tasks_parallel_failure(calls):
+    """Test that failure of one lane is raised after the other lanes finish."""
+    tasks = [_task(calls, 'A', 't-0', fail=True), _task(calls, 'B', 't-1')]
+    with pytest.raises(ValueError):
+        run_tasks(tasks, ['2019-01-01'], parallelism=2)
+    assert [c[0] for c in calls] == ['B']
+
+
+@pytest.mark.unit
+def test_backfill_chains(calls):
+    """Test that only date independent tasks are split by date."""
+    dates = ['2019-01-01', '2019-01-02', '2019-01-03']
+    ordered = _task(calls, 'A', 't-0')
+    independent = _task(calls, 'B', 't-0', task_class=IndependentSleepTask)
+    chains = get_backfill_chains([ordered, independent], dates)
+    assert len(chains) == 4
+    assert [(t, d) for t, d in chains[0]] == [(ordered, d) for d in dates]
+    assert [[d for _, d in chain] for chain in chains[1:]] == [[d] for d in dates]
+    assert all(chain[0][0] is not independent for chain in chains[1:])
+    assert len(get_backfill_chains([ordered, independent], dates, keep_date_order=True)) == 2
+
+
+@pytest.mark.unit
+def test_run_backfill_keeps_date_order(calls):
+    """Test that order sensitive task runs dates in order while others are fanned out."""
+    dates = [f'2019-01-0{i}' for i in range(1, 7)]
+    tasks = [_task(calls, 'A', 't-0'), _task(calls, 'B', 't-0', task_class=IndependentSleepTask)]
+    start = time.time()
+    run_backfill(tasks, dates, parallelism=7)
+    assert time.time() - start < 0.05 * 12
+    assert [c[1] for c in calls if c[0] == 'A'] == dates
+    assert sorted(c[1] for c in calls if c[0] == 'B') == dates
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize('parallelism', [1, 2])
+def test_run_tasks_skip(calls, parallelism):
+    """Test that finished units are skipped."""
+    tasks = [_task(calls, 'A', 't-0'), _task(calls, 'B', 't-1')]
+    skip = {(tasks[0].get_task_id(), '2019-01-01'), (tasks[1].get_task_id(), '2019-01-02')}
+    run_tasks(tasks, ['2019-01-01', '2019-01-02'], parallelism=parallelism, skip=skip)
+    assert sorted((c[0], c[1]) for c in calls) == [('A', '2019-01-02'), ('B', '2019-01-01')]
+
+
+@pytest.mark.unit
+def test_run_backfill_skip(calls):
+    """Test that finished units are skipped in backfill."""
+    tasks = [_task(calls, 'A', 't-0', task_class=IndependentSleepTask)]
+    skip = {(tasks[0].get_task_id(), '2019-01-01')}
+    run_backfill(tasks, ['2019-01-01', '2019-01-02'], parallelism=2, skip=skip)
+    assert [(c[0], c[1]) for c in calls] == [('A', '2019-01-02')]
@@ -1,6 +1,11 @@
 # -*- coding: utf-8 -*-
 """Test Generic task."""
-from luft.tasks.generic_task import GenericTask
+import asyncio
+import time
+
+from luft.common import processes
+from luft.tasks import generic_task as generic_task_module
+from luft.tasks.generic_task import GenericTask, run_coroutine
 
 import pytest
 
@@ -137,3 +142,77 @@ def test_task_id_change(generic_task):
     """Test if changing task id works."""
     generic_task.set_task_id('Puf')
     assert generic_task.get_task_id() == 'Puf'
+
+
+def _is_alive(pid):
+    """Check that process exists and is not zombie."""
+    try:
+        with open(f'/proc/{pid}/stat') as stat:
+            return stat.read().split(')')[-1].split()[0] != 'Z'
+    except FileNotFoundError:
+        return False
+
+
+@pytest.mark.unit
+def test_timeout_terminates_process_group(monkeypatch):
+    """Test that timed out subprocess is terminated with its children."""
+    monkeypatch.setattr(generic_task_module, 'KILL_GRACE_PERIOD', 1)
+    pids = []
+    coroutine = GenericTask._run_subprocess_async(
+        ['sh', '-c'], ["'sleep 30 & echo $!; wait'"], line_callback=lambda line: pids.append(line))
+    start = time.time()
+    with pytest.raises(asyncio.TimeoutError):
+        run_coroutine(asyncio.wait_for(coroutine, 1))
+    assert time.time() - start < 5
+    assert len(pids) == 1
+    assert not _is_alive(int(pids[0]))
+    assert not processes._ProcessGroups.groups
+
+
+@pytest.mark.unit
+def test_task_timeout(generic_task):
+    """Test that task exceeding its timeout raises and the rest of task runs without it."""
+    generic_task.__class__.__call__ = lambda self, ts, env=None: time.sleep(0.5) or ts
+    assert generic_task.execute('2019-01-01') == '2019-01-01'
+    generic_task.set_timeout(0.1)
+    with pytest.raises(TimeoutError):
+        generic_task.execute('2019-01-01')
+    generic_task.set_timeout(2)
+    assert generic_task.execute('2019-01-01') == '2019-01-01'
+
+
+@pytest.mark.unit
+def test_run_ledger_is_opt_in(generic_task, isolated_state, monkeypatch):
+    """Test that task runs are recorded into run ledger only when it is enabled."""
+    generic_task.__class__.__call__ = lambda self, ts, env=None: ts
+    monkeypatch.setattr(generic_task_module, 'RUN_LEDGER', False)
+    generic_task.execute('2019-01-01')
+    assert isolated_state.get_runs() == []
+    monkeypatch.setattr(generic_task_module, 'RUN_LEDGER', True)
+    generic_task.execute('2019-01-02')
+    assert [(run['task_id'], run['status']) for run in isolated_state.get_runs()] == [
+        (generic_task.get_task_id(), 'ok')]
+
+
+@pytest.mark.unit
+def test_timed_out_blocking_call_is_cancelled(generic_task):
+    """Test that timeout of blocking call sets cancelled and closes resources of task."""
+    import threading
+    closed = threading.Event()
+
+    def _call(self, ts, env=None):
+        closed.wait(5)  # blocked call fails when its resources are closed
+        return self.cancelled
+
+    generic_task.__class__.__call__ = _call
+    generic_task.__class__.cancel = lambda self: closed.set()
+    generic_task.set_timeout(0.1)
+    start = time.time()
+    with pytest.raises(TimeoutError):
+        generic_task.execute('2019-01-01')
+    assert closed.wait(1)
+    assert generic_task.cancelled
+    assert time.time() - start < 2
+    closed.clear()
+    generic_task.__class__.__call__ = lambda self, ts, env=None: self.cancelled
+    assert generic_task.execute('2019-01-01') is False
@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+"""Test direct database access helpers."""
+import datetime
+import sqlite3
+
+from luft.common.jdbc_utils import get_partition_bounds, get_partition_predicates, sql_literal
+
+import pytest
+
+
+@pytest.fixture(scope='function')
+def connection():
+    """Create in memory database with skewed table."""
+    conn = sqlite3.connect(':memory:')
+    conn.execute('CREATE TABLE orders (id INTEGER, created TEXT)')
+    ids = list(range(1, 91)) + list(range(901, 911)) + [None]
+    conn.executemany('INSERT INTO orders VALUES (?, ?)', [(i, None) for i in ids])
+    yield conn
+    conn.close()
+
+
+@pytest.mark.unit
+def test_minmax_bounds(connection):
+    """Test that min/max bounds split range into parts of the same width."""
+    assert get_partition_bounds(connection, 'main.orders', 'id', 4) == [228, 455, 682]
+
+
+@pytest.mark.unit
+def test_quantile_bounds(connection):
+    """Test that quantile bounds split rows into parts of the same size."""
+    assert get_partition_bounds(connection, 'main.orders', 'id', 4, 'quantile',
+                                'id > 10') == [34, 57, 79]
+
+
+@pytest.mark.unit
+def test_bounds_of_empty_table(connection):
+    """Test that empty table is not partitioned."""
+    assert get_partition_bounds(connection, 'main.orders', 'id', 4, where_clause='id < 0') == []
+
+
+@pytest.mark.unit
+def test_partition_predicates():
+    """Test that predicates cover all values including NULL."""
+    assert get_partition_predicates('d', [datetime.date(2019, 1, 1), 10]) == [
+        "(d < '2019-01-01' OR d IS NULL)", "d >= '2019-01-01' AND d < 10", 'd >= 10']
+    assert sql_literal("it's") == "'it''s'"
+
+
+@pytest.mark.unit
+def test_minmax_bounds_of_string_column(connection):
+    """Test that string column is split only by quantile method."""
+    connection.executemany('UPDATE orders SET created = ? WHERE id = ?',
+                           [(f'k{i:03d}', i) for i in range(1, 91)])
+    with pytest.raises(TypeError, match='quantile'):
+        get_partition_bounds(connection, 'main.orders', 'created', 2)
+    assert get_partition_bounds(connection, 'main.orders', 'created', 2, 'quantile') == ['k046']
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""Test logging pipeline."""
+import io
+import json
+import logging
+import threading
+
+from luft.common import logger as logger_module
+from luft.common.logger import (ContextFilter, JsonFormatter, RateLimitFilter, log_context,
+                                summarize_query)
+
+import pytest
+
+
+def _record(msg, source=None, level=logging.INFO):
+    record = logging.LogRecord('common', level, __file__, 1, msg, None, None)
+    if source:
+        record.source = source
+    return record
+
+
+@pytest.mark.unit
+def test_rate_limit_per_source():
+    """Test that only subprocess lines over the limit of their source are dropped."""
+    rate_filter = RateLimitFilter(rate=0.001, burst=2)
+    assert [rate_filter.filter(_record(str(i), 'A')) for i in range(4)] == [
+        True, True, False, False]
+    assert rate_filter.filter(_record('B', 'B'))
+    assert rate_filter.filter(_record('no source'))
+    assert rate_filter.filter(_record('error', 'A', logging.ERROR))
+    rate_filter._buckets['A'][0] = 1  # refill
+    record = _record('next', 'A')
+    assert rate_filter.filter(record)
+    assert record.getMessage() == 'next [2 lines of A suppressed]'
+
+
+@pytest.mark.unit
+def test_sampling():
+    """Test that every n-th line of source is kept."""
+    rate_filter = RateLimitFilter(sample=3)
+    assert [rate_filter.filter(_record(str(i), 'A')) for i in range(7)] == [
+        True, False, False, True, False, False, True]
+
+
+@pytest.mark.unit
+def test_json_record_has_context():
+    """Test that json record contains context of task logging it."""
+    record = _record('hello', 'JOB')
+    with log_context(task_id='embulk-jdbc-load_a.b.T', date_valid='2019-01-01'):
+        ContextFilter().filter(record)
+    message = json.loads(JsonFormatter().format(record))
+    assert message['message'] == 'hello'
+    assert message['task_id'] == 'embulk-jdbc-load_a.b.T'
+    assert message['date_valid'] == '2019-01-01'
+    assert message['source'] == 'JOB'
+
+
+@pytest.mark.unit
+def test_summarize_query():
+    """Test that query is shortened to one line."""
+    assert summarize_query('SELECT a\nFROM   t') == 'SELECT a FROM t (2 lines, 17 chars)'
+    assert summarize_query('SELECT ' + 'a' * 300, 10) == 'SELECT aaa... (1 lines, 307 chars)'
+
+
+@pytest.mark.unit
+def test_queue_writes_in_background(monkeypatch):
+    """Test that records are written by background thread with context of logging thread."""
+    stream = io.StringIO()
+    output_handler = logging.StreamHandler(stream)
+    threads = []
+    output_handler.emit = lambda record: threads.append(threading.current_thread()) or \
+        logging.StreamHandler.emit(output_handler, record)
+    monkeypatch.setattr(logger_module._LogPipeline, 'output_handler', output_handler)
+    monkeypatch.setattr(logger_module._LogPipeline, 'queue_handler', None)
+    monkeypatch.setattr(logger_module._LogPipeline, 'listener', None)
+    monkeypatch.setattr(logger_module._LogPipeline, 'filters', [])
+    test_logger = logging.getLogger('luft-test-queue')
+    monkeypatch.setattr(logger_module._LogPipeline, 'loggers', [test_logger])
+    test_logger.addHandler(output_handler)
+    test_logger.propagate = False
+    try:
+        logger_module.configure_logging(use_queue=True, json_format=True)
+        with log_context(task_id='T'):
+            test_logger.warning('queued')
+        logger_module.stop_log_listener()
+    finally:
+        for handler in list(test_logger.handlers):
+            test_logger.removeHandler(handler)
+    assert json.loads(stream.getvalue())['task_id'] == 'T'
+    assert threads and threads[0] is not threading.current_thread()
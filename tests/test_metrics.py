@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+"""Test metrics of task runs."""
+import time
+
+from luft.common import metrics as metrics_module
+from luft.common.metrics import MetricsRegistry, write_metrics
+from luft.tasks.generic_task import GenericTask
+
+import pytest
+
+
+class PhaseTask(GenericTask):
+    """Task with two phases."""
+
+    def __call__(self, ts, env=None):
+        """Run phases, the second one fails for `fail` date."""
+        with self.span('extract'):
+            time.sleep(0.01)
+        self.record_rows(10, 'read')
+        with self.span('load'):
+            if ts == 'fail':
+                raise ValueError('Task failed!')
+
+
+@pytest.fixture(scope='function')
+def registry(monkeypatch):
+    """Empty metrics registry."""
+    registry = MetricsRegistry()
+    monkeypatch.setattr(metrics_module._Metrics, 'instance', registry)
+    return registry
+
+
+@pytest.mark.unit
+def test_render_prometheus_format(registry):
+    """Test that metrics are rendered in Prometheus text format."""
+    registry.observe('task_phase_seconds', 1.5, task_id='a"b', phase='load')
+    registry.observe('task_phase_seconds', 0.5, task_id='a"b', phase='load')
+    registry.inc('task_bytes_total', 1024, task_id='t')
+    assert registry.render() == (
+        '# HELP luft_task_phase_seconds Duration of phase of task run.\n'
+        '# TYPE luft_task_phase_seconds summary\n'
+        'luft_task_phase_seconds_sum{phase="load",task_id="a\\"b"} 2\n'
+        'luft_task_phase_seconds_count{phase="load",task_id="a\\"b"} 2\n'
+        '# HELP luft_task_bytes_total Bytes produced by task.\n'
+        '# TYPE luft_task_bytes_total counter\n'
+        'luft_task_bytes_total{task_id="t"} 1024\n')
+    with pytest.raises(ValueError):
+        registry.inc('unknown')
+
+
+@pytest.mark.unit
+def test_task_phases_and_runs(registry, tmp_path):
+    """Test that task phases, rows and run status are recorded also for failed run."""
+    task = PhaseTask(name='T', task_type='test', source_system='sys', source_subsystem='sub')
+    task.execute('2019-01-01')
+    with pytest.raises(ValueError):
+        task.execute('fail')
+    labels = {'task_id': task.get_task_id(), 'task_type': 'test'}
+    extract = registry.get('task_phase_seconds', phase='extract', **labels)
+    assert extract[1] == 2 and extract[0] >= 0.02
+    assert registry.get('task_phase_seconds', phase='load', **labels)[1] == 2
+    assert registry.get('task_phase_seconds', phase='total', **labels)[1] == 2
+    assert registry.get('task_rows_total', kind='read', **labels) == [20]
+    assert registry.get('task_runs_total', status='ok', **labels) == [1]
+    assert registry.get('task_runs_total', status='failed', **labels) == [1]
+    path = tmp_path / 'metrics' / 'luft.prom'
+    write_metrics(str(path))
+    assert 'luft_task_last_success_timestamp_seconds{' in path.read_text()
+    assert [p.name for p in path.parent.iterdir()] == ['luft.prom']
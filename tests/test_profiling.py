@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""Test profiling of task runs."""
+import cProfile
+import pstats
+import tracemalloc
+
+from luft.common.profiling import (disable_profiling, enable_profiling, profile,
+                                   profiling_enabled)
+from luft.tasks.generic_task import GenericTask
+
+import pytest
+
+
+class AllocatingTask(GenericTask):
+    """Task building big string."""
+
+    def __call__(self, ts, env=None):
+        """Build string."""
+        self.data = ''.join(str(i) for i in range(100000))
+
+
+@pytest.fixture(scope='function')
+def profile_dir(tmp_path):
+    """Enable profiling into temporary folder."""
+    enable_profiling(str(tmp_path / 'profile'))
+    yield tmp_path / 'profile'
+    disable_profiling()
+
+
+@pytest.mark.unit
+def test_task_run_is_profiled(profile_dir):
+    """Test that task run writes cProfile stats and memory snapshot."""
+    task = AllocatingTask(name='T', task_type='test', source_system='sys', source_subsystem='sub')
+    task.execute('2019-01-01')
+    base = profile_dir / 'test_sys.sub.T_2019-01-01'
+    stats = pstats.Stats(f'{base}.prof')
+    assert any(func[2] == '__call__' for func in stats.stats)
+    snapshot = tracemalloc.Snapshot.load(f'{base}.tracemalloc')
+    assert snapshot.statistics('filename')
+
+
+@pytest.mark.unit
+def test_profiling_disabled(tmp_path):
+    """Test that nothing is written without profiling."""
+    assert not profiling_enabled()
+    task = AllocatingTask(name='T', task_type='test', source_system='sys', source_subsystem='sub')
+    task.execute('2019-01-01')
+    assert not tracemalloc.is_tracing()
+
+
+@pytest.mark.unit
+def test_task_run_with_timeout_is_profiled(profile_dir):
+    """Test that profile contains task run in executor thread when task has timeout."""
+    task = AllocatingTask(name='T', task_type='test', source_system='sys', source_subsystem='sub')
+    task.set_timeout(30)
+    task.execute('2019-01-01')
+    stats = pstats.Stats(str(profile_dir / 'test_sys.sub.T_2019-01-01.prof'))
+    assert any(func[0] == __file__ and func[2] == '__call__' for func in stats.stats)
+
+
+@pytest.mark.unit
+def test_task_run_under_another_profiler(profile_dir):
+    """Test that task runs unprofiled inside profiled block or under another profiler."""
+    task = AllocatingTask(name='T', task_type='test', source_system='sys', source_subsystem='sub')
+    with profile('outer'):
+        task.execute('2019-01-01')
+    assert (profile_dir / 'outer.prof').exists()
+    assert not (profile_dir / 'test_sys.sub.T_2019-01-01.prof').exists()
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        task.execute('2019-01-02')
+    finally:
+        profiler.disable()
+    assert not (profile_dir / 'test_sys.sub.T_2019-01-02.prof').exists()
@@ -56,6 +56,46 @@ def test_get_templating_dates(qlik_metric_task):
     }
 
 
+class FakeEngine:
+    """Engine recording connection state."""
+
+    def __init__(self):
+        """Init engine."""
+        self.connected = True
+        self.ega = self
+
+    def open_app(self, app_id):
+        """Open app."""
+        return {'qHandle': 1}
+
+    def get_handle(self, app):
+        """Get handle of app."""
+        return app['qHandle']
+
+    def disconnect(self):
+        """Disconnect engine."""
+        self.connected = False
+
+
+@pytest.mark.unit
+def test_engine_is_opened_lazily(qlik_metric_task, monkeypatch):
+    """Test that engine is opened on first use and closed after run."""
+    engines = []
+
+    def _login():
+        engines.append(FakeEngine())
+        return engines[-1]
+
+    monkeypatch.setattr(qlik_metric_task, 'qlik_login', _login)
+    monkeypatch.setattr(qlik_metric_task, 'get_qlik_data',
+                        lambda ts_tz: [{'app_handle': qlik_metric_task.app_handle}])
+    monkeypatch.setattr(qlik_metric_task, 'write_blob_storage', lambda json_list: None)
+    assert engines == []
+    qlik_metric_task('2019-09-22')
+    assert len(engines) == 1
+    assert not engines[0].connected
+
+
 @pytest.mark.integration
 def test_get_measures_id_map(qlik_metric_task):
     """Test if templating returns all dates."""
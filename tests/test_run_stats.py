@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+"""Test statistics of run ledger."""
+from cli.luft import luft
+
+from click.testing import CliRunner
+
+from luft.common import state
+from luft.common.run_stats import (daily_trend, find_regressions, format_table, percentile,
+                                   task_stats)
+from luft.common.state import StateStore
+
+import pytest
+
+
+def _runs(task_id, durations, status='ok', start=1546300800):
+    return [{'task_id': task_id, 'task_type': 'bq-load', 'started_at': start + i * 86400,
+             'finished_at': start + i * 86400 + duration, 'status': status, 'rows': 10,
+             'bytes': None, 'bq_bytes_processed': 100}
+            for i, duration in enumerate(durations)]
+
+
+@pytest.mark.unit
+def test_percentile():
+    """Test nearest rank percentile."""
+    assert percentile([], 50) is None
+    assert percentile([3, 1, 2], 50) == 2
+    assert percentile(list(range(1, 101)), 95) == 95
+    assert percentile([5], 95) == 5
+
+
+@pytest.mark.unit
+def test_task_stats_slowest_first():
+    """Test that tasks are ordered by p95 and failed runs are not in durations."""
+    runs = _runs('fast', [1, 2, 3]) + _runs('slow', [10, 20]) + _runs('slow', [1000], 'failed')
+    stats = task_stats(runs)
+    assert [row['task_id'] for row in stats] == ['slow', 'fast']
+    assert (stats[0]['runs'], stats[0]['failed'], stats[0]['p95']) == (3, 1, 20)
+    assert stats[1]['rows'] == 30 and stats[1]['bq_bytes_processed'] == 300
+
+
+@pytest.mark.unit
+def test_daily_trend():
+    """Test that runs are grouped by day of start."""
+    trend = daily_trend(_runs('a', [1, 2]) + _runs('b', [3]))
+    assert [(row['runs'], row['total']) for row in trend] == [(2, 4), (1, 2)]
+
+
+@pytest.mark.unit
+def test_find_regressions():
+    """Test that only tasks with slower recent runs are reported."""
+    runs = _runs('stable', [10] * 10) + _runs('slower', [10] * 5 + [20] * 5) + _runs('new', [50])
+    regressions = find_regressions(runs)
+    assert [(row['task_id'], row['ratio']) for row in regressions] == [('slower', 2)]
+
+
+@pytest.mark.unit
+def test_format_table():
+    """Test that columns are aligned."""
+    assert format_table([{'a': 'x', 'b': 1.25}, {'a': 'long', 'b': None}], ['a', 'b']) == (
+        'a     b\n----  ---\nx     1.2\nlong  -')
+
+
+@pytest.mark.unit
+def test_stats_command(tmp_path, monkeypatch):
+    """Test that stats command reports recorded runs."""
+    store = StateStore(str(tmp_path / 'state.db'))
+    monkeypatch.setattr(state._StateStore, 'instance', store)
+    runner = CliRunner()
+    assert 'No runs recorded' in runner.invoke(luft, ['stats']).output
+    for run in _runs('a', [10] * 5 + [30] * 5, start=1e10):
+        store.record_run(run)
+    result = runner.invoke(luft, ['stats', '--days', '100000'])
+    assert result.exit_code == 0
+    assert 'Slowest tasks' in result.output
+    assert 'a        10    0       10.0  30.0  30.0' in result.output
+    assert 'a        10.0    30.0    3.0' in result.output
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""Test Luft worker."""
+import threading
+
+from cli.server import LuftServer, submit
+
+from luft.common import state
+from luft.common.logger import setup_logger
+from luft.common.state import StateStore
+from luft.tasks.generic_task import GenericTask
+
+import pytest
+
+logger = setup_logger('common', 'INFO')
+
+
+class LogTask(GenericTask):
+    """Task that only logs."""
+
+    def __call__(self, ts, env=None):
+        """Log date or fail."""
+        if self.get_name() == 'FAIL':
+            raise ValueError('Task failed!')
+        logger.info(f'Running {self.get_name()} for {ts}.')
+
+
+@pytest.fixture(scope='function')
+def worker(tmp_path, monkeypatch):
+    """Run worker with fake task lists in background thread."""
+    monkeypatch.setattr(state._StateStore, 'instance', StateStore(str(tmp_path / 'state.db')))
+    server = LuftServer(str(tmp_path / 'luft.sock'))
+
+    def _get(job):
+        task = LogTask(name=job['yml_path'], task_type='test', source_system='sys',
+                       source_subsystem='sub', thread_name='t-0')
+        if job['yml_path'] == 'TIMED':  # runs in executor thread of event loop
+            task.set_timeout(30)
+        return [task], threading.Lock()
+
+    monkeypatch.setattr(server.catalog, 'get', _get)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield str(tmp_path / 'luft.sock')
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.mark.unit
+def test_submit_streams_logs(worker):
+    """Test that logs of job are streamed back to client."""
+    lines = []
+    ok = submit({'task_type': 'test', 'yml_path': 'OK', 'start_date': '2019-01-01',
+                 'end_date': '2019-01-03', 'parallelism': 2}, worker, echo=lines.append)
+    assert ok is True
+    assert any('Running OK for 2019-01-01.' in line for line in lines)
+    assert any('Running OK for 2019-01-02.' in line for line in lines)
+
+
+@pytest.mark.unit
+def test_submit_streams_logs_of_executor_threads(worker):
+    """Test that logs of task run in executor thread reach client, others do not."""
+    lines = []
+    logger.info('Log of another job.')
+    ok = submit({'task_type': 'test', 'yml_path': 'TIMED', 'start_date': '2019-01-01'}, worker,
+                echo=lines.append)
+    assert ok is True
+    assert any('Running TIMED for 2019-01-01.' in line for line in lines)
+    assert not any('Log of another job.' in line for line in lines)
+
+
+@pytest.mark.unit
+def test_submit_failure(worker):
+    """Test that failed job is reported to client."""
+    lines = []
+    ok = submit({'task_type': 'test', 'yml_path': 'FAIL', 'start_date': '2019-01-01'}, worker,
+                echo=lines.append)
+    assert ok is False
+    assert 'Task failed!' in lines[-1]
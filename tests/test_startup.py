@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+"""Test startup time of Luft cli."""
+import os
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict
+
+import pytest
+
+ROOT = Path(__file__).parent.parent
+
+# Cumulative import time of `cli.luft` in microseconds. Wall clock time depends on load of
+# machine, so budget is checked only when it is set (e.g. LUFT_STARTUP_BUDGET_US=500000).
+STARTUP_BUDGET_US = os.getenv('LUFT_STARTUP_BUDGET_US')
+
+# Modules that have to be imported only when task of their type runs
+HEAVY_MODULES = ['google', 'boto3', 'botocore', 'selenium', 'websocket', 'pkg_resources',
+                 'pendulum', 'dateutil', 'ruamel', 'marshmallow', 'jinja2']
+
+
+def _import_times(module: str) -> Dict[str, int]:
+    """Import module in new interpreter and return cumulative import times by module."""
+    env = dict(os.environ)
+    env.setdefault('LUFT_CONFIG', str(ROOT / 'example' / 'config' / 'luft.cfg'))
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            cwd=str(ROOT), env=env, stdout=subprocess.PIPE,
+                            stderr=subprocess.PIPE, check=True)
+    times = {}
+    for line in result.stderr.decode('utf-8').splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+@pytest.mark.unit
+def test_cli_does_not_import_heavy_modules():
+    """Test that cli import does not load SDKs of task types."""
+    imported = {name.split('.')[0] for name in _import_times('cli.luft')}
+    assert sorted(imported.intersection(HEAVY_MODULES)) == []
+
+
+@pytest.mark.unit
+@pytest.mark.skipif(not STARTUP_BUDGET_US, reason='LUFT_STARTUP_BUDGET_US is not set')
+def test_cli_startup_budget():
+    """Test that cold start of cli stays within budget."""
+    assert _import_times('cli.luft')['cli.luft'] < int(STARTUP_BUDGET_US)
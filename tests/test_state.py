@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""Test state store."""
+from luft.common.state import StateStore
+
+import pytest
+
+
+@pytest.fixture(scope='function')
+def store(tmp_path):
+    """Generate state store in temporary folder."""
+    store = StateStore(str(tmp_path / 'state' / 'state.db'))
+    yield store
+    store.close()
+
+
+@pytest.mark.unit
+def test_get_durations_without_db(store):
+    """Test that reading does not create database."""
+    assert store.get_durations(['a']) == {}
+    assert not store.path.exists()
+
+
+@pytest.mark.unit
+def test_get_durations_average_of_last_runs(store):
+    """Test that duration is average of last successful runs in ledger only."""
+    for started_at, duration in enumerate([100, 10, 20, 30]):
+        store.record_run({'task_id': 'a', 'started_at': started_at,
+                          'finished_at': started_at + duration, 'status': 'ok'})
+    store.record_run({'task_id': 'a', 'started_at': 10, 'finished_at': 11, 'status': 'failed'})
+    store.record_run({'task_id': 'b', 'started_at': 0, 'finished_at': 5, 'status': 'ok'})
+    assert store.get_durations(['a', 'b', 'c'], history=3) == {'a': 20, 'b': 5}
+
+
+@pytest.mark.unit
+def test_checkpoints(store):
+    """Test that finished units are returned only for their run."""
+    store.mark_done('run1', 'a', '2019-01-01')
+    store.mark_done('run1', 'a', '2019-01-01')
+    store.mark_done('run1', 'b', '2019-01-02')
+    store.mark_done('run2', 'c', '2019-01-01')
+    assert store.get_done('run1') == {('a', '2019-01-01'), ('b', '2019-01-02')}
+    assert store.get_done('run3') == set()
+
+
+@pytest.mark.unit
+def test_watermarks(store):
+    """Test that watermark is replaced and missing one is None."""
+    assert store.get_watermark('a') is None
+    store.set_watermark('a', '10')
+    store.set_watermark('a', "'2019-01-02'")
+    assert store.get_watermark('a') == "'2019-01-02'"
+    assert store.get_watermark('b') is None
+
+
+@pytest.mark.unit
+def test_run_ledger(store):
+    """Test that runs are appended to ledger and filtered."""
+    assert store.get_runs() == []
+    store.record_run({'task_id': 'a', 'task_type': 'bq-load', 'source_system': 'x',
+                      'started_at': 20, 'finished_at': 25, 'status': 'ok', 'rows': 3})
+    store.record_run({'task_id': 'b', 'task_type': 'embulk-jdbc-load', 'source_system': 'x',
+                      'started_at': 10, 'finished_at': 12, 'status': 'failed'})
+    assert [run['task_id'] for run in store.get_runs()] == ['b', 'a']
+    assert [run['task_id'] for run in store.get_runs(since=15)] == ['a']
+    assert store.get_runs(task_type='bq-load')[0]['rows'] == 3
+    assert store.get_runs(source_system='y') == []
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+"""Test task list."""
+from luft.common import state
+from luft.common.config import THREAD_NAME_PREFIX
+from luft.common.state import StateStore
+from luft.common.task_list import TaskList
+from luft.tasks.generic_task import GenericTask
+
+import pytest
+
+
+class DummyTask(GenericTask):
+    """Task doing nothing."""
+
+    def __call__(self, ts, env=None):
+        """Do nothing."""
+        pass
+
+
+def _thread(i):
+    return THREAD_NAME_PREFIX + str(i)
+
+
+@pytest.fixture(scope='function')
+def store(tmp_path, monkeypatch):
+    """Replace state store singleton with temporary one."""
+    store = StateStore(str(tmp_path / 'state.db'))
+    monkeypatch.setattr(state._StateStore, 'instance', store)
+    yield store
+    store.close()
+
+
+@pytest.fixture(scope='function')
+def tasks():
+    """Generate tasks assigned by `ID mod thread_count`."""
+    return [DummyTask(name=f'T{i}', task_type='test', source_system='sys',
+                      source_subsystem='sub', thread_name=_thread(i % 2)) for i in range(1, 6)]
+
+
+@pytest.mark.unit
+def test_balance_threads_without_history(store, tasks):
+    """Test that threads from schema are kept without history."""
+    TaskList._balance_threads(tasks, [False] * 5, 2)
+    assert [t.get_thread_name() for t in tasks] == [_thread(i % 2) for i in range(1, 6)]
+
+
+@pytest.mark.unit
+def test_balance_threads_longest_first(store, tasks):
+    """Test that longest task gets its own thread."""
+    for task, duration in zip(tasks, [15, 70, 15, 51, 10]):
+        store.record_run({'task_id': task.get_task_id(), 'started_at': 0,
+                          'finished_at': duration, 'status': 'ok'})
+    TaskList._balance_threads(tasks, [False] * 5, 2)
+    threads = [t.get_thread_name() for t in tasks]
+    assert threads == [_thread(1), _thread(0), _thread(1), _thread(1), _thread(0)]
+
+
+@pytest.mark.unit
+def test_balance_threads_keeps_explicit(store, tasks):
+    """Test that thread from yaml wins and counts into thread load."""
+    tasks[4].set_thread_name(_thread(0))
+    for task, duration in zip(tasks, [15, 70, 15, 51, 100]):
+        store.record_run({'task_id': task.get_task_id(), 'started_at': 0,
+                          'finished_at': duration, 'status': 'ok'})
+    TaskList._balance_threads(tasks, [False, False, False, False, True], 2)
+    threads = [t.get_thread_name() for t in tasks]
+    assert threads == [_thread(0), _thread(1), _thread(0), _thread(1), _thread(0)]